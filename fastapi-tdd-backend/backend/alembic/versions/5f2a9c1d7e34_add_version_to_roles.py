@@ -0,0 +1,27 @@
+"""add version to roles
+
+Revision ID: 5f2a9c1d7e34
+Revises: 0b7148e5718e
+Create Date: 2026-10-18 09:12:41.318254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5f2a9c1d7e34"
+down_revision = "0b7148e5718e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "roles",
+        sa.Column("version", sa.Integer, nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("roles", "version")
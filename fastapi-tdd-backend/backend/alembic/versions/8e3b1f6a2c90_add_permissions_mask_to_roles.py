@@ -0,0 +1,28 @@
+"""add permissions mask to roles
+
+Revision ID: 8e3b1f6a2c90
+Revises: 5f2a9c1d7e34
+Create Date: 2026-10-18 11:02:17.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8e3b1f6a2c90"
+down_revision = "5f2a9c1d7e34"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # filled from roles.permissions at startup, see RoleRepository.sync_permissions_masks
+    op.add_column(
+        "roles",
+        sa.Column("permissions_mask", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("roles", "permissions_mask")
@@ -0,0 +1,29 @@
+"""add gin index to roles permissions
+
+Revision ID: a41d7c93e5b2
+Revises: 8e3b1f6a2c90
+Create Date: 2026-10-18 12:20:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a41d7c93e5b2"
+down_revision = "8e3b1f6a2c90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_roles_permissions_gin",
+        "roles",
+        ["permissions"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_roles_permissions_gin", table_name="roles")
@@ -0,0 +1,50 @@
+"""add trigram search indexes
+
+Revision ID: c7e2d4f81a06
+Revises: a41d7c93e5b2
+Create Date: 2026-10-18 13:41:26.903517
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c7e2d4f81a06"
+down_revision = "a41d7c93e5b2"
+branch_labels = None
+depends_on = None
+
+# columns filtered with ILIKE '%search%' by the list endpoints
+SEARCH_COLUMNS = {
+    "inventory": ["inventory_name"],
+    "orders": ["orders_name"],
+    "product": ["product_name"],
+    "raw_material": ["raw_material_name"],
+    "roles": ["role"],
+    "users": ["fullname", "username", "email"],
+}
+
+
+def _index_name(table: str, column: str) -> str:
+    return f"ix_{table}_{column}_trgm"
+
+
+def upgrade() -> None:
+    # required, the search of the list endpoints relies on these indexes.
+    # Fails when the server does not ship the contrib extensions.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.create_index(
+                _index_name(table, column),
+                table,
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+
+
+def downgrade() -> None:
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.drop_index(_index_name(table, column), table_name=table)
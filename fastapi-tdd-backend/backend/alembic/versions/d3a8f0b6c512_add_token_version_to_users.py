@@ -0,0 +1,29 @@
+"""add token version to users
+
+Revision ID: d3a8f0b6c512
+Revises: c7e2d4f81a06
+Create Date: 2026-10-18 19:05:12.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d3a8f0b6c512"
+down_revision = "c7e2d4f81a06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # incremented on every change of the user, stateless tokens carry the
+    # version they were issued with
+    op.add_column(
+        "users",
+        sa.Column("token_version", sa.Integer, nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
@@ -0,0 +1,26 @@
+"""add permissions catalog to roles
+
+Revision ID: e5c1a7d9b304
+Revises: d3a8f0b6c512
+Create Date: 2026-10-18 19:48:03.915402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e5c1a7d9b304"
+down_revision = "d3a8f0b6c512"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # fingerprint of the permission catalog permissions_mask was built with,
+    # a mask of another catalog is not used, see shared.utils.verify_auth
+    op.add_column("roles", sa.Column("permissions_catalog", sa.String(12), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("roles", "permissions_catalog")
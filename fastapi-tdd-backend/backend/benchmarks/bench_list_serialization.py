@@ -0,0 +1,107 @@
+"""
+Serialization cost of one page of the list endpoints, before and after the
+orjson fast path. No database is needed, the rows are built in memory like
+the repositories build them.
+
+    python -m benchmarks.bench_list_serialization --rows 100 --repeat 200
+
+before: the route returns the page to FastAPI, response_model=Dict is
+validated, walked by jsonable_encoder and rendered with json.dumps, and the
+users service rebuilt every row as UserOut(**item.dict()).
+after: handle_json_result renders the page once with ORJSONResponse.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from modules.orders.orders_schemas import OrdersInDB
+from modules.users.users.user_schemas import UserOut
+from shared.utils.orjson_response import ORJSONResponse
+from shared.utils.short_pagination import sql_pagination
+
+DICT_FIELD = create_response_field(name="Response_list", type_=Dict)
+
+
+def orders_rows(rows: int) -> List[OrdersInDB]:
+    now = datetime.now(timezone.utc)
+    return [
+        OrdersInDB(
+            id=uuid.uuid4(),
+            orders_name=f"pedido {i}",
+            state="pendiente",
+            is_active=True,
+            created_at=now,
+            updated_at=now,
+            created_by="Usuario de prueba",
+            updated_by="Usuario de prueba",
+        )
+        for i in range(rows)
+    ]
+
+
+def users_rows(rows: int) -> List[UserOut]:
+    return [
+        UserOut(
+            id=uuid.uuid4(),
+            fullname=f"Usuario {i}",
+            username=f"usuario_{i}",
+            email=f"usuario{i}@example.com",
+            role="ADMINISTRADOR",
+            role_id=uuid.uuid4(),
+            is_active=True,
+            created_by="Usuario de prueba",
+            updated_by="Usuario de prueba",
+        )
+        for i in range(rows)
+    ]
+
+
+def page(data: List) -> Dict:
+    return sql_pagination(page_num=1, page_size=len(data), data_list=data, total=len(data), route="/bench")
+
+
+async def before(data: List, rebuild: Callable | None = None) -> bytes:
+    if rebuild:
+        data = [rebuild(**item.dict()) for item in data]
+    content = await serialize_response(field=DICT_FIELD, response_content=page(data))
+    return JSONResponse(content).body
+
+
+async def after(data: List, rebuild: Callable | None = None) -> bytes:
+    return ORJSONResponse(page(data)).body
+
+
+async def timeit(label: str, render, data: List, repeat: int, **kwargs) -> float:
+    await render(data, **kwargs)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await render(data, **kwargs)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {label:<7} {elapsed:8.3f} ms/page")
+    return elapsed
+
+
+async def main(rows: int, repeat: int) -> None:
+    for name, data, rebuild in (
+        ("orders", orders_rows(rows), None),
+        ("users", users_rows(rows), UserOut),
+    ):
+        print(f"{name}: {rows} rows per page")
+        old = await timeit("before", before, data, repeat, rebuild=rebuild)
+        new = await timeit("after", after, data, repeat, rebuild=rebuild)
+        print(f"  speedup {old / new:6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,73 @@
+"""
+Latency of the get by id and auth lookups on one connection, through
+databases (before) and through shared.core.db.db_statements (after). Needs
+the database of DATABASE_URL with the migrations applied.
+
+    python -m benchmarks.bench_prepared_statements --repeat 5000
+
+before: db.fetch_one compiles the query with SQLAlchemy on every call.
+after: the query is turned into $1..$n once and runs on asyncpg with the
+statement the pool prepared when the connection was opened.
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+from uuid import uuid4
+
+from databases import Database
+
+from modules.product.product_sqlstatements import GET_PRODUCT_BY_ID, PRODUCT_COLUMNS
+from modules.users.roles.role_sqlsentences import GET_ROLE_BY_ID
+from modules.users.users.user_sqlstaments import GET_USER_BY_USERNAME
+from shared.core.config import DATABASE_URL, SUPER_ADMIN
+from shared.core.db import db_statements
+from shared.core.db.db_pool import pool_options
+from shared.core.db.db_tasks import hot_statements
+from shared.utils.repository_utils import projection
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def timeit(label: str, call: Callable[[], Awaitable], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - start) * 1000)
+    p50, p99 = percentile(samples, 0.5), percentile(samples, 0.99)
+    print(f"  {label:<7} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms")
+    return p50
+
+
+async def main(repeat: int) -> None:
+    db_statements.statement_warmer.register(hot_statements())
+    db = Database(DATABASE_URL, **pool_options())
+    await db.connect()
+    try:
+        async with db.connection():
+            product_id = await db.fetch_val("SELECT id FROM product LIMIT 1") or uuid4()
+            role_id = await db.fetch_val("SELECT id FROM roles LIMIT 1") or uuid4()
+
+            lookups: Dict[str, tuple] = {
+                "product by id": (GET_PRODUCT_BY_ID.format(**projection(PRODUCT_COLUMNS)), {"id": product_id}),
+                "role by id": (GET_ROLE_BY_ID, {"id": role_id}),
+                "user by username": (GET_USER_BY_USERNAME, {"username": SUPER_ADMIN}),
+            }
+            for name, (query, values) in lookups.items():
+                print(name)
+                old = await timeit("before", lambda: db.fetch_one(query=query, values=values), repeat)
+                new = await timeit("after", lambda: db_statements.fetch_one(db, query, values), repeat)
+                print(f"  speedup {old / new:6.1f}x")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
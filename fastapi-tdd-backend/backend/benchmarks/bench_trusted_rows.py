@@ -0,0 +1,82 @@
+"""
+Cost of mapping database rows to schemas, validating them with the schema
+constructor (before) or with the trusted path ru.from_record (after).
+
+    python -m benchmarks.bench_trusted_rows --rows 1000 --repeat 50
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import shared.utils.repository_utils as ru
+from modules.orders.orders_schemas import OrdersInDB
+from modules.users.users.user_schemas import UserInDB
+from shared.utils.record_to_dict import record_to_dict
+
+
+def orders_rows(rows: int) -> List[Dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": uuid.uuid4(),
+            "orders_name": f"pedido {i}",
+            "state": "pendiente",
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+            "created_by": uuid.uuid4(),
+            "updated_by": uuid.uuid4(),
+        }
+        for i in range(rows)
+    ]
+
+
+def users_rows(rows: int) -> List[Dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "fullname": f"Usuario {i}",
+            "username": f"usuario_{i}",
+            "email": f"usuario{i}@example.com",
+            "password": "x" * 60,
+            "salt": "y" * 29,
+            "is_active": True,
+            "is_superadmin": False,
+            "role_id": uuid.uuid4(),
+            "role": "ADMINISTRADOR",
+            "permissions": ["users:users_list", "orders:get_orders_list"],
+            "role_version": 1,
+            "permissions_mask": 3,
+        }
+        for i in range(rows)
+    ]
+
+
+def timeit(label: str, build: Callable, rows: List[Dict], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        [build(row) for row in rows]
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {label:<7} {elapsed:8.3f} ms/{len(rows)} rows")
+    return elapsed
+
+
+def main(rows: int, repeat: int) -> None:
+    for name, schema, data in (
+        ("orders", OrdersInDB, orders_rows(rows)),
+        ("users", UserInDB, users_rows(rows)),
+    ):
+        print(name)
+        old = timeit("before", lambda row: schema(**record_to_dict(row)), data, repeat)
+        new = timeit("after", lambda row: ru.from_record(schema, row), data, repeat)
+        print(f"  speedup {old / new:6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -1,12 +1,19 @@
+from datetime import datetime
 from databases import Database
 from loguru import logger
-from typing import List
+from typing import AsyncGenerator, Dict, List, Set, Tuple
 from uuid import UUID
 
 from modules.inventory.inventory_exceptions import InventoryExceptions
 from modules.inventory.inventory_schemas import InventoryInDB, InventoryToSave, InventoryToUpdate
+from shared.core.config import BULK_CHUNK_SIZE, EXPORT_BATCH_ROWS
 from shared.utils.record_to_dict import record_to_dict
 import shared.utils.repository_utils as ru
+from shared.core.db import db_statements
+from shared.core.db.db_replicas import primary_database
+from shared.utils.entity_cache import entity_cache
+
+inventory_cache = entity_cache("inventory", InventoryInDB)
 
 class InventoryRepository:
     def __init__(self, db: Database):
@@ -17,10 +24,19 @@ class InventoryRepository:
         
         values = ru.preprocess_create(inventory.dict())
         record = await self.db.fetch_one(query=CREATE_INVENTORY_ITEM, values=values)
+        await inventory_cache.invalidate(record["id"], db=self.db)
         
-        result = record_to_dict(record)
-        
-        return InventoryInDB(**result)
+        return ru.from_record(InventoryInDB, record)
+
+    async def create_inventory_bulk(self, inventory_items: List[InventoryToSave]) -> Tuple[Set[str], Dict[int, str]]:
+        from modules.inventory.inventory_sqlstatements import CREATE_INVENTORY_BULK, INVENTORY_BULK_COLUMNS
+
+        rows = [ru.preprocess_create(inventory.dict()) for inventory in inventory_items]
+        records, failed = await ru.bulk_insert(
+            self.db, CREATE_INVENTORY_BULK, rows, INVENTORY_BULK_COLUMNS, chunk_size=BULK_CHUNK_SIZE
+        )
+
+        return {record["inventory_name"] for record in records}, failed
     
     
     
@@ -30,9 +46,21 @@ class InventoryRepository:
         search: str | None,
         order: str | None,
         direction: str | None,
-    ) -> List:
-        from modules.inventory.inventory_sqlstatements import GET_INVENTORY_LIST, inventory_list_complements, inventory_list_search
-        
+        page_num: int = 1,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[InventoryInDB] | List[Dict], int]:
+        from modules.inventory.inventory_sqlstatements import (
+            GET_INVENTORY_LIST,
+            INVENTORY_LIST_COLUMNS,
+            INVENTORY_LIST_JOINS,
+            inventory_list_complements,
+            inventory_list_search,
+        )
+
+        # only the asked fields are read, with no fields every column is
+        selected = ru.parse_fields(fields, INVENTORY_LIST_COLUMNS)
+        sql_list = GET_INVENTORY_LIST.format(**ru.projection(INVENTORY_LIST_COLUMNS, selected, INVENTORY_LIST_JOINS))
 
         order = order.lower() if order != None else None
         direction = direction.upper() if order != None else None
@@ -41,32 +69,125 @@ class InventoryRepository:
         sql_search = inventory_list_search()
 
         if not search:
-            sql_sentence = GET_INVENTORY_LIST + sql_sentence
+            sql_sentence = sql_list + sql_sentence
         else:
-            sql_sentence = GET_INVENTORY_LIST + sql_search + sql_sentence
+            sql_sentence = sql_list + sql_search + sql_sentence
             values["search"] = "%" + search + "%"
 
-        records = await self.db.fetch_all(query=sql_sentence, values=values)
+        records, total = await ru.fetch_page(
+            self.db, query=sql_sentence, values=values, page_num=page_num, page_size=page_size
+        )
 
-        if len(records) == 0 or not records:
-            return []
-        
-        return [InventoryInDB(**dict(record)) for record in records] 
+        if selected is not None:
+            return records, total
+        return [ru.from_record(InventoryInDB, record) for record in records], total
     
     
     
     
     
-    async def get_inventory_by_id(self, id: UUID) -> InventoryInDB | dict:
-        from modules.inventory.inventory_sqlstatements import GET_INVENTORY_BY_ID
+    async def get_inventory_list_after(
+        self,
+        search: str | None,
+        order: str | None,
+        direction: str | None,
+        cursor: str | None,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[InventoryInDB] | List[Dict], str | None]:
+        from modules.inventory.inventory_sqlstatements import (
+            GET_INVENTORY_LIST_KEYSET,
+            INVENTORY_LIST_COLUMNS,
+            INVENTORY_LIST_JOINS,
+            inventory_list_complements,
+            inventory_list_search,
+            inventory_list_sort_key,
+        )
+
+        order = order.lower() if order != None else None
+        direction = direction.upper() if order != None else None
+        sort_column, sort_direction = inventory_list_sort_key(order, direction)
+        sort_field = sort_column.split(".")[-1]
+        selected = ru.parse_fields(fields, INVENTORY_LIST_COLUMNS)
+        # the next cursor is built from the sort field, it is read even if not asked for
+        columns = selected
+        if selected is not None and sort_field not in selected:
+            columns = [*selected, sort_field]
+        values = {}
+        sql_sentence = GET_INVENTORY_LIST_KEYSET.format(
+            **ru.projection(INVENTORY_LIST_COLUMNS, columns, INVENTORY_LIST_JOINS)
+        )
+
+        if search:
+            sql_sentence += inventory_list_search()
+            values["search"] = "%" + search + "%"
+
+        if cursor:
+            key_type = bool if sort_field == "is_active" else str
+            values["cursor_key"], values["cursor_id"] = ru.decode_cursor(
+                cursor, sort_column, sort_direction, key_type
+            )
+            sql_sentence += " AND" if search else " WHERE"
+            sql_sentence += ru.keyset_predicate(sort_column, "t.id", sort_direction)
+
+        sql_sentence += inventory_list_complements(order, direction)
+        records, next_cursor = await ru.fetch_keyset_page(
+            self.db,
+            query=sql_sentence,
+            values=values,
+            sort_field=sort_field,
+            page_size=page_size,
+            sort_column=sort_column,
+            direction=sort_direction,
+        )
 
+        if selected is not None:
+            return [{field: record[field] for field in selected} for record in records], next_cursor
+        return [ru.from_record(InventoryInDB, record) for record in records], next_cursor
+
+    def iterate_inventory_export(self) -> AsyncGenerator[Dict, None]:
+        from modules.inventory.inventory_sqlstatements import EXPORT_INVENTORY
+
+        return ru.iterate_records(self.db, EXPORT_INVENTORY, prefetch=EXPORT_BATCH_ROWS)
+
+    async def get_inventory_by_id(self, id: UUID, fields: str | None = None) -> InventoryInDB | dict:
+        from modules.inventory.inventory_sqlstatements import GET_INVENTORY_BY_ID, INVENTORY_COLUMNS
+
+        selected = ru.parse_fields(fields, INVENTORY_COLUMNS)
+        sql_sentence = GET_INVENTORY_BY_ID.format(**ru.projection(INVENTORY_COLUMNS, selected))
         values = {"id": id}
-        record = await self.db.fetch_one(query=GET_INVENTORY_BY_ID, values=values)
+        if selected is None:
+            # from the primary, a lagging replica would cache an old row
+            return await inventory_cache.get_or_load(
+                id, lambda: db_statements.fetch_one(primary_database(self.db), sql_sentence, values)
+            )
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
         if not record:
             return {}
 
-        inventory = record_to_dict(record)
-        return InventoryInDB(**inventory)
+        return record_to_dict(record)
+    
+    
+    async def get_inventory_version(self, id: UUID) -> Dict:
+        # the cached row, the answer usually needs it right after
+        inventory = await self.get_inventory_by_id(id=id)
+        if not inventory:
+            return {}
+
+        return {"updated_at": inventory.updated_at}
+
+    async def get_inventory_list_version(self, search: str | None) -> Tuple[int, datetime | None]:
+        from modules.inventory.inventory_sqlstatements import GET_INVENTORY_LIST_VERSION, inventory_list_search
+
+        values = {}
+        sql_sentence = GET_INVENTORY_LIST_VERSION
+        if search:
+            sql_sentence += inventory_list_search()
+            values["search"] = "%" + search + "%"
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
+        return record["total"], record["last_updated"]
     
     
     async def update_inventory(
@@ -77,23 +198,25 @@ class InventoryRepository:
     ) -> InventoryInDB | dict:
         from modules.inventory.inventory_sqlstatements import UPDATE_INVENTORY_BY_ID
 
-        inventory = await self.get_inventory_by_id(id=id)
-        if not inventory:
-            return {}
-
-        inventory_update_params = inventory.copy(update=inventory_update.dict(exclude_unset=True))
-
-        inventory_params_dict = inventory_update_params.dict()
+        inventory_params_dict = inventory_update.dict(exclude_unset=True)
         inventory_params_dict["updated_by"] = updated_by_id
         inventory_params_dict["updated_at"] = ru._preprocess_date()
-        
+        sql_sentence = UPDATE_INVENTORY_BY_ID.format(
+            set_clause=ru.update_set_clause(inventory_params_dict)
+        )
+        inventory_params_dict["id"] = id
+
         try:
-            record = await self.db.fetch_one(query=UPDATE_INVENTORY_BY_ID, values=inventory_params_dict)
-            inventory_updated = record_to_dict(record)
-            return await self.get_inventory_by_id(id=inventory_updated.get("id"))
+            record = await self.db.fetch_one(query=sql_sentence, values=inventory_params_dict)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar una tarea: {e}")
-            raise InventoryExceptions.InventoryInvalidUpdateParamsException()    
+            raise InventoryExceptions.InventoryInvalidUpdateParamsException()
+
+        if not record:
+            return {}
+
+        await inventory_cache.invalidate(id, db=self.db)
+        return ru.from_record(InventoryInDB, record)
         
         
     async def delete_inventory_by_id(
@@ -102,12 +225,9 @@ class InventoryRepository:
     ) -> UUID | dict:
         from modules.inventory.inventory_sqlstatements import DELETE_INVENTORY_BY_ID
 
-        inventory = await self.get_inventory_by_id(id=id)
-
-        if not inventory:
+        record = await self.db.fetch_one(query=DELETE_INVENTORY_BY_ID, values={"id": id})
+        if not record:
             return {}
-        
-        record = await self.db.fetch_one(query= DELETE_INVENTORY_BY_ID, values = {"id": id})
-        inventory_id_delete = dict(record)        
 
-        return inventory_id_delete
\ No newline at end of file
+        await inventory_cache.invalidate(id, db=self.db)
+        return dict(record)
\ No newline at end of file
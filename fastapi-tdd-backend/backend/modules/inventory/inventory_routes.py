@@ -1,8 +1,9 @@
-from typing import Dict
+from typing import Dict, List
 from uuid import UUID
 
 from databases import Database
-from fastapi import APIRouter, Body, Depends, Path, status
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from fastapi.responses import StreamingResponse
 from loguru import logger 
 
 # from modules.inventory.inventory_services import InventoryService
@@ -13,8 +14,10 @@ from modules.inventory.inventory_schemas import InventoryCreate, InventoryInDB,
 from modules.users.users.user_schemas import UserInDB
 from modules.users.auths.auth_dependencies import get_current_active_user
 from modules.users.auths.auth_exceptions import AuthExceptions
-from shared.core.db.db_dependencies import get_database
-from shared.utils.service_result import ServiceResult, handle_result
+from shared.core.db.db_dependencies import UnitOfWorkRoute, get_database, get_read_database
+from shared.utils.conditional_get import Preconditions, get_preconditions
+from shared.utils.schemas_base import BulkResult, CursorPage, IDModelMixin, Page
+from shared.utils.service_result import ServiceResult, handle_json_result, handle_result
 from shared.utils.verify_auth import is_authorized
 
 #Esto que está aquí es para manejar la documentación con el Swagger
@@ -22,6 +25,7 @@ inventory_router = APIRouter(
     prefix="/inventory",
     tags=["inventory"],
     responses={404: {"description": "Not found"}},
+    route_class=UnitOfWorkRoute,
 )
 
 
@@ -47,27 +51,58 @@ async def create_inventory(
 
 
 
+#Inventory: Bulk create
+@inventory_router.post(
+    "/bulk",
+    response_model=BulkResult,
+    name="inventory:create-inventory-bulk",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_inventory_bulk(
+    items: List[Dict] = Body(..., embed=True),
+    db: Database = Depends(get_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> ServiceResult:
+    if not is_authorized(current_user, "inventory:create-inventory-bulk"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await InventoryService(db).create_inventory_bulk(items, current_user)
+    return handle_result(result)
+
+
+
 @inventory_router.get(
     "/",
-    name="inventory:inventory_list",
+    response_model=Page[InventoryInDB] | CursorPage[InventoryInDB],
+    name="inventory:get_inventory_list",
     status_code=status.HTTP_200_OK
 )
 async def get_inventory_list(
     search: str | None = None,
-    page_number: int =1,
-    page_size: int = 10,
+    page_number: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1),
     order: str = "",
     direction: str = "",
-    db: Database = Depends(get_database),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    preconditions: Preconditions = Depends(get_preconditions),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "inventory:get_inventory_list"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
     
     result = await InventoryService(db).get_inventory_list(
-        search, page_num=page_number, page_size=page_size, order=order, direction=direction
+        search,
+        page_num=page_number,
+        page_size=page_size,
+        order=order,
+        direction=direction,
+        cursor=cursor,
+        fields=fields,
+        preconditions=preconditions,
     )
-    return handle_result(result)
+    return handle_json_result(result)
 
 
 
@@ -75,26 +110,49 @@ async def get_inventory_list(
 
 
 
+@inventory_router.get(
+    "/export",
+    response_class=StreamingResponse,
+    name="inventory:export-inventory",
+    status_code=status.HTTP_200_OK,
+)
+async def export_inventory(
+    file_format: str = Query("csv", alias="format"),
+    db: Database = Depends(get_read_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    if not is_authorized(current_user, "inventory:export-inventory"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await InventoryService(db).export_inventory(file_format)
+    return handle_result(result)
+
+
+
 @inventory_router.get(
     "/{id}", 
-    response_model=Dict, 
+    response_model=InventoryInDB, 
     name="inventory:get-inventory-by-id")
 async def get_inventory_by_id(
     id: UUID = Path(..., title="The id of the inventory to get"),
-    db: Database = Depends(get_database),
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    preconditions: Preconditions = Depends(get_preconditions),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
-    if not is_authorized(current_user, "users:get-inventory-by-id"):
+    if not is_authorized(current_user, "inventory:get-inventory-by-id"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
 
-    result = await InventoryService(db).get_inventory_by_id(id=id)
-    return handle_result(result)
+    result = await InventoryService(db).get_inventory_by_id(
+        id=id, fields=fields, preconditions=preconditions
+    )
+    return handle_json_result(result)
 
 
 
 @inventory_router.put(
     "/{id}", 
-    response_model=Dict, 
+    response_model=InventoryInDB, 
     name="inventory:update-inventory-by-id"
 )
 async def update_inventory_by_id(
@@ -117,7 +175,7 @@ async def update_inventory_by_id(
 
 @inventory_router.delete(
     "/{id}", 
-    response_model=Dict, 
+    response_model=IDModelMixin, 
     name="inventory:delete-inventory-by-id"
 )
 async def delete_inventory_by_id(
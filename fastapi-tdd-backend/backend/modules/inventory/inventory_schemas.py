@@ -2,12 +2,12 @@ from typing import List
 from uuid import UUID
 from pydantic import validator
 
-from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin 
+from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin, Varchar255 
 
 
 class InventoryBase(BaseSchema):
-    inventory_name: str | None
-    location_stock: str | None
+    inventory_name: Varchar255 | None
+    location_stock: Varchar255 | None
     
     @validator("inventory_name")
     def inventory_name_must_have_more_than_three_characters(cls, v) -> str:
@@ -16,8 +16,8 @@ class InventoryBase(BaseSchema):
         return v
     
 class InventoryCreate(InventoryBase):
-    inventory_name: str 
-    location_stock: str 
+    inventory_name: Varchar255 
+    location_stock: Varchar255 
     
     
 class InventoryToSave(InventoryCreate):
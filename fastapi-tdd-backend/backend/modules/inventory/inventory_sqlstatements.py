@@ -1,53 +1,117 @@
+from typing import Tuple
+
 CREATE_INVENTORY_ITEM = """
     INSERT INTO inventory (id, inventory_name, location_stock, is_active, created_by, created_at, updated_by, updated_at)
     VALUES (:id, :inventory_name, :location_stock, :is_active,  :created_by, :created_at, :updated_by, :updated_at)
     RETURNING id, inventory_name, location_stock, is_active, created_by, created_at, updated_by, updated_at;
 """
 
+INVENTORY_BULK_COLUMNS = ("id", "inventory_name", "location_stock", "is_active", "created_by", "created_at", "updated_by", "updated_at")
+
+# one row per position of the arrays, names that already exist are skipped
+CREATE_INVENTORY_BULK = """
+    INSERT INTO inventory (id, inventory_name, location_stock, is_active, created_by, created_at, updated_by, updated_at)
+    SELECT * FROM UNNEST(
+        CAST(:id AS UUID[]),
+        CAST(:inventory_name AS VARCHAR[]),
+        CAST(:location_stock AS VARCHAR[]),
+        CAST(:is_active AS BOOLEAN[]),
+        CAST(:created_by AS UUID[]),
+        CAST(:created_at AS TIMESTAMPTZ[]),
+        CAST(:updated_by AS UUID[]),
+        CAST(:updated_at AS TIMESTAMPTZ[])
+    )
+    ON CONFLICT (inventory_name) DO NOTHING
+    RETURNING inventory_name;
+"""
+
+# field -> column of the list queries, the fields ?fields= can ask for
+INVENTORY_LIST_COLUMNS = {
+    "id": "t.id",
+    "inventory_name": "t.inventory_name",
+    "location_stock": "t.location_stock",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "us1.fullname AS created_by",
+    "updated_by": "us2.fullname AS updated_by",
+}
+
+# joins of the list queries, only added when their field is selected
+INVENTORY_LIST_JOINS = {
+    "created_by": "LEFT JOIN users AS us1 ON us1.id = t.created_by",
+    "updated_by": "LEFT JOIN users AS us2 ON us2.id = t.updated_by",
+}
+
+# select and joins are built with ru.projection
 GET_INVENTORY_LIST = """
+    SELECT {select},
+        COUNT(*) OVER() AS total_count
+    FROM inventory AS t
+    {joins}
+"""
+
+# keyset pages do not count the whole list
+GET_INVENTORY_LIST_KEYSET = """
+    SELECT {select}
+    FROM inventory AS t
+    {joins}
+"""
+
+# the whole table, read with a server side cursor
+EXPORT_INVENTORY = """
     SELECT t.id, t.inventory_name, t.location_stock, t.is_active, t.created_at, t.updated_at, 
         us1.fullname AS created_by, us2.fullname AS updated_by
     FROM inventory AS t
     LEFT JOIN users AS us1 ON us1.id = t.created_by
     LEFT JOIN users AS us2 ON us2.id = t.updated_by
 """
+# csv header of EXPORT_INVENTORY, in the order of its SELECT
+EXPORT_INVENTORY_COLUMNS = ("id", "inventory_name", "location_stock", "is_active", "created_at", "updated_at", "created_by", "updated_by")
+
 
 
 def inventory_list_search():
-    return """ WHERE (t.inventory_name LIKE :search) """
+    return """ WHERE (t.inventory_name ILIKE :search) """
+
+def inventory_list_sort_key(order: str | None, direction: str | None) -> Tuple[str, str]:
+    column = "t.is_active" if order == "status" else "t.inventory_name"
+    return column, "DESC" if direction == "DESC" else "ASC"
 
 def inventory_list_complements(order: str | None, direction: str | None):
-    sql_sentence = ""
-    if not order and not direction:
-        sql_sentence = " ORDER BY t.inventory_name ASC;"
-    elif order == "inventory_name" and direction == "DESC":
-        sql_sentence = " ORDER BY t.inventory_name DESC;"
-    elif order == "inventory_name" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.inventory_name ASC;"
-    elif order == "status" and direction == "DESC":
-        sql_sentence = " ORDER BY t.is_active DESC;"
-    elif order == "status" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.is_active ASC;"
+    # t.id breaks ties so pages and cursors are stable
+    column, direction = inventory_list_sort_key(order, direction)
+    return f" ORDER BY {column} {direction}, t.id {direction}"
 
-    return sql_sentence
 
+# field -> column of GET_INVENTORY_BY_ID
+INVENTORY_COLUMNS = {
+    "id": "t.id",
+    "inventory_name": "t.inventory_name",
+    "location_stock": "t.location_stock",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "t.created_by",
+    "updated_by": "t.updated_by",
+}
 
 GET_INVENTORY_BY_ID = """
-    SELECT t.id, t.inventory_name, t.location_stock, t.is_active, t.created_at, t.updated_at, 
-        t.created_by, t.updated_by
+    SELECT {select}
+    FROM inventory AS t
+    WHERE t.id = :id;
+"""
+
+# version of a list, see shared.utils.conditional_get
+GET_INVENTORY_LIST_VERSION = """
+    SELECT COUNT(*) AS total, MAX(t.updated_at) AS last_updated
     FROM inventory AS t
-    WHERE t.id = :id; 
 """
 
+# set_clause is built from the fields sent in the request, see ru.update_set_clause
 UPDATE_INVENTORY_BY_ID = """
     UPDATE inventory
-    SET inventory_name = :inventory_name,
-        location_stock = :location_stock,
-        is_active      = :is_active,
-        created_by     = :created_by,
-        created_at     = :created_at,
-        updated_by     = :updated_by,
-        updated_at     = :updated_at
+    SET {set_clause}
     WHERE id = :id
     RETURNING id, inventory_name, location_stock, is_active, created_by, created_at, updated_by, updated_at;
 """
@@ -1,4 +1,5 @@
 from typing import Any
+from shared.core.config import BULK_MAX_ITEMS
 from shared.utils.app_exceptions import AppExceptionCase
 
 
@@ -41,4 +42,44 @@ class OrdersExceptions:
             error = e
             status_code = 422
             msg = f"Parámetros de actualización inválidos: {str(error)}"
-            AppExceptionCase.__init__(self, status_code, msg)
\ No newline at end of file
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class OrdersInvalidCursorException(AppExceptionCase):
+        """_
+        Orders invalid pagination cursor
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = "Cursor de paginación inválido"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class OrdersBulkTooLargeException(AppExceptionCase):
+        """_
+        Orders bulk create with too many items
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 413
+            msg = f"La solicitud supera el máximo de {BULK_MAX_ITEMS} elementos"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class OrdersExportFormatException(AppExceptionCase):
+        """_
+        Orders export with an unsupported format
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = "Formato de exportación no soportado, use csv o ndjson"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class OrdersInvalidFieldsException(AppExceptionCase):
+        """_
+        Orders fields parameter with unknown fields
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = f"Campos desconocidos en fields: {msg}"
+            AppExceptionCase.__init__(self, status_code, msg)
@@ -1,12 +1,19 @@
+from datetime import datetime
 from databases import Database
 from loguru import logger
-from typing import List
+from typing import AsyncGenerator, Dict, List, Set, Tuple
 from uuid import UUID
 
 from modules.orders.orders_exceptions import OrdersExceptions
 from modules.orders.orders_schemas import OrdersInDB, OrdersToSave, OrdersToUpdate
+from shared.core.config import BULK_CHUNK_SIZE, EXPORT_BATCH_ROWS
 from shared.utils.record_to_dict import record_to_dict
 import shared.utils.repository_utils as ru
+from shared.core.db import db_statements
+from shared.core.db.db_replicas import primary_database
+from shared.utils.entity_cache import entity_cache
+
+orders_cache = entity_cache("orders", OrdersInDB)
 
 class OrdersRepository:
     def __init__(self, db: Database):
@@ -17,10 +24,19 @@ class OrdersRepository:
         
         values = ru.preprocess_create(orders.dict())
         record = await self.db.fetch_one(query=CREATE_ORDERS_ITEM, values=values)
+        await orders_cache.invalidate(record["id"], db=self.db)
         
-        result = record_to_dict(record)
-        
-        return OrdersInDB(**result)
+        return ru.from_record(OrdersInDB, record)
+
+    async def create_orders_bulk(self, orders_items: List[OrdersToSave]) -> Tuple[Set[str], Dict[int, str]]:
+        from modules.orders.orders_sqlstatements import CREATE_ORDERS_BULK, ORDERS_BULK_COLUMNS
+
+        rows = [ru.preprocess_create(orders.dict()) for orders in orders_items]
+        records, failed = await ru.bulk_insert(
+            self.db, CREATE_ORDERS_BULK, rows, ORDERS_BULK_COLUMNS, chunk_size=BULK_CHUNK_SIZE
+        )
+
+        return {record["orders_name"] for record in records}, failed
     
     
     
@@ -30,9 +46,21 @@ class OrdersRepository:
         search: str | None,
         order: str | None,
         direction: str | None,
-    ) -> List:
-        from modules.orders.orders_sqlstatements import GET_ORDERS_LIST, orders_list_complements, orders_list_search
-        
+        page_num: int = 1,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[OrdersInDB] | List[Dict], int]:
+        from modules.orders.orders_sqlstatements import (
+            GET_ORDERS_LIST,
+            ORDERS_LIST_COLUMNS,
+            ORDERS_LIST_JOINS,
+            orders_list_complements,
+            orders_list_search,
+        )
+
+        # only the asked fields are read, with no fields every column is
+        selected = ru.parse_fields(fields, ORDERS_LIST_COLUMNS)
+        sql_list = GET_ORDERS_LIST.format(**ru.projection(ORDERS_LIST_COLUMNS, selected, ORDERS_LIST_JOINS))
 
         order = order.lower() if order != None else None
         direction = direction.upper() if order != None else None
@@ -41,32 +69,125 @@ class OrdersRepository:
         sql_search = orders_list_search()
 
         if not search:
-            sql_sentence = GET_ORDERS_LIST + sql_sentence
+            sql_sentence = sql_list + sql_sentence
         else:
-            sql_sentence = GET_ORDERS_LIST + sql_search + sql_sentence
+            sql_sentence = sql_list + sql_search + sql_sentence
             values["search"] = "%" + search + "%"
 
-        records = await self.db.fetch_all(query=sql_sentence, values=values)
+        records, total = await ru.fetch_page(
+            self.db, query=sql_sentence, values=values, page_num=page_num, page_size=page_size
+        )
 
-        if len(records) == 0 or not records:
-            return []
-        
-        return [OrdersInDB(**dict(record)) for record in records] 
+        if selected is not None:
+            return records, total
+        return [ru.from_record(OrdersInDB, record) for record in records], total
     
     
     
     
     
-    async def get_orders_by_id(self, id: UUID) -> OrdersInDB | dict:
-        from modules.orders.orders_sqlstatements import GET_ORDERS_BY_ID
+    async def get_orders_list_after(
+        self,
+        search: str | None,
+        order: str | None,
+        direction: str | None,
+        cursor: str | None,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[OrdersInDB] | List[Dict], str | None]:
+        from modules.orders.orders_sqlstatements import (
+            GET_ORDERS_LIST_KEYSET,
+            ORDERS_LIST_COLUMNS,
+            ORDERS_LIST_JOINS,
+            orders_list_complements,
+            orders_list_search,
+            orders_list_sort_key,
+        )
+
+        order = order.lower() if order != None else None
+        direction = direction.upper() if order != None else None
+        sort_column, sort_direction = orders_list_sort_key(order, direction)
+        sort_field = sort_column.split(".")[-1]
+        selected = ru.parse_fields(fields, ORDERS_LIST_COLUMNS)
+        # the next cursor is built from the sort field, it is read even if not asked for
+        columns = selected
+        if selected is not None and sort_field not in selected:
+            columns = [*selected, sort_field]
+        values = {}
+        sql_sentence = GET_ORDERS_LIST_KEYSET.format(
+            **ru.projection(ORDERS_LIST_COLUMNS, columns, ORDERS_LIST_JOINS)
+        )
+
+        if search:
+            sql_sentence += orders_list_search()
+            values["search"] = "%" + search + "%"
+
+        if cursor:
+            key_type = bool if sort_field == "is_active" else str
+            values["cursor_key"], values["cursor_id"] = ru.decode_cursor(
+                cursor, sort_column, sort_direction, key_type
+            )
+            sql_sentence += " AND" if search else " WHERE"
+            sql_sentence += ru.keyset_predicate(sort_column, "t.id", sort_direction)
+
+        sql_sentence += orders_list_complements(order, direction)
+        records, next_cursor = await ru.fetch_keyset_page(
+            self.db,
+            query=sql_sentence,
+            values=values,
+            sort_field=sort_field,
+            page_size=page_size,
+            sort_column=sort_column,
+            direction=sort_direction,
+        )
 
+        if selected is not None:
+            return [{field: record[field] for field in selected} for record in records], next_cursor
+        return [ru.from_record(OrdersInDB, record) for record in records], next_cursor
+
+    def iterate_orders_export(self) -> AsyncGenerator[Dict, None]:
+        from modules.orders.orders_sqlstatements import EXPORT_ORDERS
+
+        return ru.iterate_records(self.db, EXPORT_ORDERS, prefetch=EXPORT_BATCH_ROWS)
+
+    async def get_orders_by_id(self, id: UUID, fields: str | None = None) -> OrdersInDB | dict:
+        from modules.orders.orders_sqlstatements import GET_ORDERS_BY_ID, ORDERS_COLUMNS
+
+        selected = ru.parse_fields(fields, ORDERS_COLUMNS)
+        sql_sentence = GET_ORDERS_BY_ID.format(**ru.projection(ORDERS_COLUMNS, selected))
         values = {"id": id}
-        record = await self.db.fetch_one(query=GET_ORDERS_BY_ID, values=values)
+        if selected is None:
+            # from the primary, a lagging replica would cache an old row
+            return await orders_cache.get_or_load(
+                id, lambda: db_statements.fetch_one(primary_database(self.db), sql_sentence, values)
+            )
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
         if not record:
             return {}
 
-        orders = record_to_dict(record)
-        return OrdersInDB(**orders)
+        return record_to_dict(record)
+    
+    
+    async def get_orders_version(self, id: UUID) -> Dict:
+        # the cached row, the answer usually needs it right after
+        orders = await self.get_orders_by_id(id=id)
+        if not orders:
+            return {}
+
+        return {"updated_at": orders.updated_at}
+
+    async def get_orders_list_version(self, search: str | None) -> Tuple[int, datetime | None]:
+        from modules.orders.orders_sqlstatements import GET_ORDERS_LIST_VERSION, orders_list_search
+
+        values = {}
+        sql_sentence = GET_ORDERS_LIST_VERSION
+        if search:
+            sql_sentence += orders_list_search()
+            values["search"] = "%" + search + "%"
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
+        return record["total"], record["last_updated"]
     
     
     async def update_orders(
@@ -77,23 +198,25 @@ class OrdersRepository:
     ) -> OrdersInDB | dict:
         from modules.orders.orders_sqlstatements import UPDATE_ORDERS_BY_ID
 
-        orders = await self.get_orders_by_id(id=id)
-        if not orders:
-            return {}
-
-        orders_update_params = orders.copy(update=orders_update.dict(exclude_unset=True))
-
-        orders_params_dict = orders_update_params.dict()
+        orders_params_dict = orders_update.dict(exclude_unset=True)
         orders_params_dict["updated_by"] = updated_by_id
         orders_params_dict["updated_at"] = ru._preprocess_date()
-        
+        sql_sentence = UPDATE_ORDERS_BY_ID.format(
+            set_clause=ru.update_set_clause(orders_params_dict)
+        )
+        orders_params_dict["id"] = id
+
         try:
-            record = await self.db.fetch_one(query=UPDATE_ORDERS_BY_ID, values=orders_params_dict)
-            orders_updated = record_to_dict(record)
-            return await self.get_orders_by_id(id=orders_updated.get("id"))
+            record = await self.db.fetch_one(query=sql_sentence, values=orders_params_dict)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar una tarea: {e}")
-            raise OrdersExceptions.OrdersInvalidUpdateParamsException()    
+            raise OrdersExceptions.OrdersInvalidUpdateParamsException()
+
+        if not record:
+            return {}
+
+        await orders_cache.invalidate(id, db=self.db)
+        return ru.from_record(OrdersInDB, record)
         
         
     async def delete_orders_by_id(
@@ -102,12 +225,9 @@ class OrdersRepository:
     ) -> UUID | dict:
         from modules.orders.orders_sqlstatements import DELETE_ORDERS_BY_ID
 
-        orders = await self.get_orders_by_id(id=id)
-
-        if not orders:
+        record = await self.db.fetch_one(query=DELETE_ORDERS_BY_ID, values={"id": id})
+        if not record:
             return {}
-        
-        record = await self.db.fetch_one(query= DELETE_ORDERS_BY_ID, values = {"id": id})
-        orders_id_delete = dict(record)        
 
-        return orders_id_delete
\ No newline at end of file
+        await orders_cache.invalidate(id, db=self.db)
+        return dict(record)
\ No newline at end of file
@@ -2,12 +2,12 @@ from typing import List
 from uuid import UUID
 from pydantic import validator
 
-from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin 
+from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin, Varchar255 
 
 
 class OrdersBase(BaseSchema):
-    orders_name: str | None
-    state: str | None
+    orders_name: Varchar255 | None
+    state: Varchar255 | None
     
     @validator("orders_name")
     def orders_name_must_have_more_than_three_characters(cls, v) -> str:
@@ -16,8 +16,8 @@ class OrdersBase(BaseSchema):
         return v
     
 class OrdersCreate(OrdersBase):
-    orders_name: str 
-    state: str 
+    orders_name: Varchar255 
+    state: Varchar255 
     
     
 class OrdersToSave(OrdersCreate):
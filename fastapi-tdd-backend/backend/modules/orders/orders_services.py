@@ -1,17 +1,24 @@
+from typing import Dict, List
 from uuid import UUID
 
 from databases import Database
 from loguru import logger
+from starlette.concurrency import run_in_threadpool
 
 from shared.utils.verify_uuid import is_valid_uuid
 
+from shared.utils.bulk_items import validate_bulk_items
+from shared.utils.conditional_get import Preconditions, not_modified_response, with_validators
+from shared.utils.export_stream import EXPORT_MEDIA_TYPES, export_response
+from shared.utils.schemas_base import BulkItemError, BulkResult
+from shared.utils.repository_utils import UnknownFieldsError
 from shared.utils.service_result import ServiceResult
 from modules.orders.orders_exceptions import OrdersExceptions
 from modules.orders.orders_repositories import OrdersRepository
-from modules.orders.orders_schemas import OrdersCreate, OrdersInDB, OrdersToSave, OrdersToUpdate
+from modules.orders.orders_schemas import OrdersCreate, OrdersToSave, OrdersToUpdate
 from modules.users.users.user_schemas import UserInDB
-from shared.utils.short_pagination import short_pagination
-from shared.core.config import API_PREFIX
+from shared.utils.short_pagination import cursor_pagination, sql_pagination
+from shared.core.config import API_PREFIX, BULK_MAX_ITEMS
 
 class OrdersService:
     def __init__(self, db: Database):
@@ -29,6 +36,32 @@ class OrdersService:
             return ServiceResult(OrdersExceptions.OrdersCreateException())
         
         return ServiceResult(orders_item)
+
+    async def create_orders_bulk(self, items: List[Dict], current_user: UserInDB) -> ServiceResult:
+        if len(items) > BULK_MAX_ITEMS:
+            logger.error(f"Bulk create of {len(items)} orders items")
+            return ServiceResult(OrdersExceptions.OrdersBulkTooLargeException())
+
+        valid, errors = await run_in_threadpool(
+            validate_bulk_items,
+            items,
+            OrdersToSave,
+            key="orders_name",
+            created_by=current_user.id,
+            updated_by=current_user.id,
+        )
+        created, failed = await OrdersRepository(self.db).create_orders_bulk(
+            [orders for _, orders in valid]
+        )
+
+        for position, (index, orders) in enumerate(valid):
+            if position in failed:
+                errors.append(BulkItemError(index=index, msg=f"No se pudo guardar: {failed[position]}"))
+            elif orders.orders_name not in created:
+                errors.append(BulkItemError(index=index, msg="orders_name ya existe"))
+        errors.sort(key=lambda error: error.index)
+
+        return ServiceResult(BulkResult(created=len(created), errors=errors))
     
    
     async def get_orders_list(
@@ -38,37 +71,113 @@ class OrdersService:
         page_size: int = 10,
         order: str = None,
         direction: str = None,
+        cursor: str | None = None,
+        fields: str | None = None,
+        preconditions: Preconditions | None = None,
     ) -> ServiceResult:
-        orders = await OrdersRepository(self.db).get_orders_list(search, order, direction)
+        validators = None
+        if preconditions is not None:
+            total, last_updated = await OrdersRepository(self.db).get_orders_list_version(search)
+            validators = preconditions.list_validators(total, last_updated)
+            if preconditions.not_modified(validators):
+                return ServiceResult(not_modified_response(validators))
+
+        if cursor is not None:
+            result = await self.get_orders_list_after(search, cursor, page_size, order, direction, fields)
+            return with_validators(result, validators)
+
+        try:
+            orders, total = await OrdersRepository(self.db).get_orders_list(
+                search, order, direction, page_num=page_num, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(OrdersExceptions.OrdersInvalidFieldsException(str(e)))
         
         service_result = None
-        if len(orders) == 0:
-            service_Result = ServiceResult([])
+        if total == 0:
+            service_result = ServiceResult([])
             service_result.status_code = 204
         else:
-            response = short_pagination(
+            response = sql_pagination(
                 page_num=page_num,
                 page_size=page_size,
                 data_list=orders,
+                total=total,
                 route=f"{API_PREFIX}/orders",
             )
             service_result = ServiceResult(response)
             
-        return service_result
+        return with_validators(service_result, validators)
+
+    async def get_orders_list_after(
+        self,
+        search: str | None,
+        cursor: str,
+        page_size: int = 10,
+        order: str = None,
+        direction: str = None,
+        fields: str | None = None,
+    ) -> ServiceResult:
+        try:
+            orders, next_cursor = await OrdersRepository(self.db).get_orders_list_after(
+                search, order, direction, cursor=cursor, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(OrdersExceptions.OrdersInvalidFieldsException(str(e)))
+        except ValueError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(OrdersExceptions.OrdersInvalidCursorException())
+
+        response = cursor_pagination(
+            page_size=page_size,
+            data_list=orders,
+            next_cursor=next_cursor,
+            route=f"{API_PREFIX}/orders",
+            params={"search": search, "order": order, "direction": direction, "fields": fields},
+        )
+        return ServiceResult(response)
     
     
     
     
     
-    async def get_orders_by_id(self, id: UUID) -> ServiceResult:
-        orders_in_db = await OrdersRepository(self.db).get_orders_by_id(id=id)
+    async def export_orders(self, file_format: str) -> ServiceResult:
+        from modules.orders.orders_sqlstatements import EXPORT_ORDERS_COLUMNS
+
+        if file_format not in EXPORT_MEDIA_TYPES:
+            logger.error(f"Export of orders with an unsupported format: {file_format}")
+            return ServiceResult(OrdersExceptions.OrdersExportFormatException())
+
+        records = OrdersRepository(self.db).iterate_orders_export()
+        return ServiceResult(export_response(records, file_format, EXPORT_ORDERS_COLUMNS, filename="orders"))
+
+    async def get_orders_by_id(
+        self, id: UUID, fields: str | None = None, preconditions: Preconditions | None = None
+    ) -> ServiceResult:
+        validators = None
+        if preconditions is not None:
+            version = await OrdersRepository(self.db).get_orders_version(id)
+            if not version:
+                logger.info("La tarea solicitada no está en base de datos")
+                return ServiceResult(OrdersExceptions.OrdersNotFoundException())
+
+            validators = preconditions.entity_validators(id, version["updated_at"])
+            if preconditions.not_modified(validators):
+                return ServiceResult(not_modified_response(validators))
+
+        try:
+            orders_in_db = await OrdersRepository(self.db).get_orders_by_id(id=id, fields=fields)
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(OrdersExceptions.OrdersInvalidFieldsException(str(e)))
 
         if isinstance(orders_in_db, dict) and not orders_in_db.get("id"):
             logger.info("La tarea solicitada no está en base de datos")
             return ServiceResult(OrdersExceptions.OrdersNotFoundException())
 
-        orders = OrdersInDB(**orders_in_db.dict())
-        return ServiceResult(orders)
+        return with_validators(ServiceResult(orders_in_db), validators)
     
     
     async def update_orders(
@@ -88,7 +197,7 @@ class OrdersService:
                 logger.info("El ID de tarea a actualizar no está en base de datos")
                 return ServiceResult(OrdersExceptions.OrdersNotFoundException())
 
-            return ServiceResult(OrdersInDB(**orders.dict()))
+            return ServiceResult(orders)
 
         except Exception as e:
             logger.error(f"Se produjo un error: {e}")
@@ -1,53 +1,117 @@
+from typing import Tuple
+
 CREATE_ORDERS_ITEM = """
     INSERT INTO orders (id, orders_name, state, is_active, created_by, created_at, updated_by, updated_at)
     VALUES (:id, :orders_name, :state, :is_active,  :created_by, :created_at, :updated_by, :updated_at)
     RETURNING id, orders_name, state, is_active, created_by, created_at, updated_by, updated_at;
 """
 
+ORDERS_BULK_COLUMNS = ("id", "orders_name", "state", "is_active", "created_by", "created_at", "updated_by", "updated_at")
+
+# one row per position of the arrays, names that already exist are skipped
+CREATE_ORDERS_BULK = """
+    INSERT INTO orders (id, orders_name, state, is_active, created_by, created_at, updated_by, updated_at)
+    SELECT * FROM UNNEST(
+        CAST(:id AS UUID[]),
+        CAST(:orders_name AS VARCHAR[]),
+        CAST(:state AS VARCHAR[]),
+        CAST(:is_active AS BOOLEAN[]),
+        CAST(:created_by AS UUID[]),
+        CAST(:created_at AS TIMESTAMPTZ[]),
+        CAST(:updated_by AS UUID[]),
+        CAST(:updated_at AS TIMESTAMPTZ[])
+    )
+    ON CONFLICT (orders_name) DO NOTHING
+    RETURNING orders_name;
+"""
+
+# field -> column of the list queries, the fields ?fields= can ask for
+ORDERS_LIST_COLUMNS = {
+    "id": "t.id",
+    "orders_name": "t.orders_name",
+    "state": "t.state",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "us1.fullname AS created_by",
+    "updated_by": "us2.fullname AS updated_by",
+}
+
+# joins of the list queries, only added when their field is selected
+ORDERS_LIST_JOINS = {
+    "created_by": "LEFT JOIN users AS us1 ON us1.id = t.created_by",
+    "updated_by": "LEFT JOIN users AS us2 ON us2.id = t.updated_by",
+}
+
+# select and joins are built with ru.projection
 GET_ORDERS_LIST = """
+    SELECT {select},
+        COUNT(*) OVER() AS total_count
+    FROM orders AS t
+    {joins}
+"""
+
+# keyset pages do not count the whole list
+GET_ORDERS_LIST_KEYSET = """
+    SELECT {select}
+    FROM orders AS t
+    {joins}
+"""
+
+# the whole table, read with a server side cursor
+EXPORT_ORDERS = """
     SELECT t.id, t.orders_name, t.state, t.is_active, t.created_at, t.updated_at, 
         us1.fullname AS created_by, us2.fullname AS updated_by
     FROM orders AS t
     LEFT JOIN users AS us1 ON us1.id = t.created_by
     LEFT JOIN users AS us2 ON us2.id = t.updated_by
 """
+# csv header of EXPORT_ORDERS, in the order of its SELECT
+EXPORT_ORDERS_COLUMNS = ("id", "orders_name", "state", "is_active", "created_at", "updated_at", "created_by", "updated_by")
+
 
 
 def orders_list_search():
-    return """ WHERE (t.orders_name LIKE :search) """
+    return """ WHERE (t.orders_name ILIKE :search) """
+
+def orders_list_sort_key(order: str | None, direction: str | None) -> Tuple[str, str]:
+    column = "t.is_active" if order == "status" else "t.orders_name"
+    return column, "DESC" if direction == "DESC" else "ASC"
 
 def orders_list_complements(order: str | None, direction: str | None):
-    sql_sentence = ""
-    if not order and not direction:
-        sql_sentence = " ORDER BY t.orders_name ASC;"
-    elif order == "orders_name" and direction == "DESC":
-        sql_sentence = " ORDER BY t.orders_name DESC;"
-    elif order == "orders_name" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.orders_name ASC;"
-    elif order == "status" and direction == "DESC":
-        sql_sentence = " ORDER BY t.is_active DESC;"
-    elif order == "status" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.is_active ASC;"
+    # t.id breaks ties so pages and cursors are stable
+    column, direction = orders_list_sort_key(order, direction)
+    return f" ORDER BY {column} {direction}, t.id {direction}"
 
-    return sql_sentence
 
+# field -> column of GET_ORDERS_BY_ID
+ORDERS_COLUMNS = {
+    "id": "t.id",
+    "orders_name": "t.orders_name",
+    "state": "t.state",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "t.created_by",
+    "updated_by": "t.updated_by",
+}
 
 GET_ORDERS_BY_ID = """
-    SELECT t.id, t.orders_name, t.state, t.is_active, t.created_at, t.updated_at, 
-        t.created_by, t.updated_by
+    SELECT {select}
+    FROM orders AS t
+    WHERE t.id = :id;
+"""
+
+# version of a list, see shared.utils.conditional_get
+GET_ORDERS_LIST_VERSION = """
+    SELECT COUNT(*) AS total, MAX(t.updated_at) AS last_updated
     FROM orders AS t
-    WHERE t.id = :id; 
 """
 
+# set_clause is built from the fields sent in the request, see ru.update_set_clause
 UPDATE_ORDERS_BY_ID = """
     UPDATE orders
-    SET orders_name = :orders_name,
-        state          = :state,
-        is_active      = :is_active,
-        created_by     = :created_by,
-        created_at     = :created_at,
-        updated_by     = :updated_by,
-        updated_at     = :updated_at
+    SET {set_clause}
     WHERE id = :id
     RETURNING id, orders_name, state, is_active, created_by, created_at, updated_by, updated_at;
 """
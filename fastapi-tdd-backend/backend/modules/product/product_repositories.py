@@ -1,12 +1,19 @@
+from datetime import datetime
 from databases import Database
 from loguru import logger
-from typing import List
+from typing import AsyncIterator, Dict, List, Set, Tuple
 from uuid import UUID
 
 from modules.product.product_exceptions import ProductExceptions
 from modules.product.product_schemas import ProductInDB, ProductToSave, ProductToUpdate
+from shared.core.config import BULK_CHUNK_SIZE
 from shared.utils.record_to_dict import record_to_dict
 import shared.utils.repository_utils as ru
+from shared.core.db import db_statements
+from shared.core.db.db_replicas import primary_database
+from shared.utils.entity_cache import entity_cache
+
+product_cache = entity_cache("product", ProductInDB)
 
 class ProductRepository:
     def __init__(self, db: Database):
@@ -17,10 +24,46 @@ class ProductRepository:
         
         values = ru.preprocess_create(product.dict())
         record = await self.db.fetch_one(query=CREATE_PRODUCT_ITEM, values=values)
+        await product_cache.invalidate(record["id"], db=self.db)
         
-        result = record_to_dict(record)
-        
-        return ProductInDB(**result)
+        return ru.from_record(ProductInDB, record)
+
+    async def create_product_bulk(self, product_items: List[ProductToSave]) -> Tuple[Set[str], Dict[int, str]]:
+        from modules.product.product_sqlstatements import CREATE_PRODUCT_BULK, PRODUCT_BULK_COLUMNS
+
+        rows = [ru.preprocess_create(product.dict()) for product in product_items]
+        records, failed = await ru.bulk_insert(
+            self.db, CREATE_PRODUCT_BULK, rows, PRODUCT_BULK_COLUMNS, chunk_size=BULK_CHUNK_SIZE
+        )
+
+        return {record["product_name"] for record in records}, failed
+
+    async def import_product(self, chunks: AsyncIterator[List[Tuple]], user_id: UUID) -> Dict[str, int]:
+        """
+        Copies the chunks into a staging table and merges it into product,
+        all in one transaction. Returns the created and updated rows.
+        """
+        from modules.product.product_sqlstatements import (
+            CREATE_PRODUCT_STAGING,
+            MERGE_PRODUCT_STAGING,
+            PRODUCT_STAGING_COLUMNS,
+            PRODUCT_STAGING_TABLE,
+        )
+
+        async with self.db.connection() as connection:
+            async with connection.transaction():
+                await connection.execute(query=CREATE_PRODUCT_STAGING)
+                async for records in chunks:
+                    await connection.raw_connection.copy_records_to_table(
+                        PRODUCT_STAGING_TABLE, records=records, columns=PRODUCT_STAGING_COLUMNS
+                    )
+
+                values = {"user_id": user_id, "now": ru._preprocess_date()}
+                record = await connection.fetch_one(query=MERGE_PRODUCT_STAGING, values=values)
+
+        # the merge updates rows by name, their ids are not known here
+        await product_cache.clear(db=self.db)
+        return dict(record)
     
     
     
@@ -30,9 +73,21 @@ class ProductRepository:
         search: str | None,
         order: str | None,
         direction: str | None,
-    ) -> List:
-        from modules.product.product_sqlstatements import GET_PRODUCT_LIST, product_list_complements, product_list_search
-        
+        page_num: int = 1,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[ProductInDB] | List[Dict], int]:
+        from modules.product.product_sqlstatements import (
+            GET_PRODUCT_LIST,
+            PRODUCT_LIST_COLUMNS,
+            PRODUCT_LIST_JOINS,
+            product_list_complements,
+            product_list_search,
+        )
+
+        # only the asked fields are read, with no fields every column is
+        selected = ru.parse_fields(fields, PRODUCT_LIST_COLUMNS)
+        sql_list = GET_PRODUCT_LIST.format(**ru.projection(PRODUCT_LIST_COLUMNS, selected, PRODUCT_LIST_JOINS))
 
         order = order.lower() if order != None else None
         direction = direction.upper() if order != None else None
@@ -41,32 +96,120 @@ class ProductRepository:
         sql_search = product_list_search()
 
         if not search:
-            sql_sentence = GET_PRODUCT_LIST + sql_sentence
+            sql_sentence = sql_list + sql_sentence
         else:
-            sql_sentence = GET_PRODUCT_LIST + sql_search + sql_sentence
+            sql_sentence = sql_list + sql_search + sql_sentence
             values["search"] = "%" + search + "%"
 
-        records = await self.db.fetch_all(query=sql_sentence, values=values)
+        records, total = await ru.fetch_page(
+            self.db, query=sql_sentence, values=values, page_num=page_num, page_size=page_size
+        )
 
-        if len(records) == 0 or not records:
-            return []
-        
-        return [ProductInDB(**dict(record)) for record in records] 
+        if selected is not None:
+            return records, total
+        return [ru.from_record(ProductInDB, record) for record in records], total
     
     
     
     
     
-    async def get_product_by_id(self, id: UUID) -> ProductInDB | dict:
-        from modules.product.product_sqlstatements import GET_PRODUCT_BY_ID
+    async def get_product_list_after(
+        self,
+        search: str | None,
+        order: str | None,
+        direction: str | None,
+        cursor: str | None,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[ProductInDB] | List[Dict], str | None]:
+        from modules.product.product_sqlstatements import (
+            GET_PRODUCT_LIST_KEYSET,
+            PRODUCT_LIST_COLUMNS,
+            PRODUCT_LIST_JOINS,
+            product_list_complements,
+            product_list_search,
+            product_list_sort_key,
+        )
 
+        order = order.lower() if order != None else None
+        direction = direction.upper() if order != None else None
+        sort_column, sort_direction = product_list_sort_key(order, direction)
+        sort_field = sort_column.split(".")[-1]
+        selected = ru.parse_fields(fields, PRODUCT_LIST_COLUMNS)
+        # the next cursor is built from the sort field, it is read even if not asked for
+        columns = selected
+        if selected is not None and sort_field not in selected:
+            columns = [*selected, sort_field]
+        values = {}
+        sql_sentence = GET_PRODUCT_LIST_KEYSET.format(
+            **ru.projection(PRODUCT_LIST_COLUMNS, columns, PRODUCT_LIST_JOINS)
+        )
+
+        if search:
+            sql_sentence += product_list_search()
+            values["search"] = "%" + search + "%"
+
+        if cursor:
+            key_type = bool if sort_field == "is_active" else str
+            values["cursor_key"], values["cursor_id"] = ru.decode_cursor(
+                cursor, sort_column, sort_direction, key_type
+            )
+            sql_sentence += " AND" if search else " WHERE"
+            sql_sentence += ru.keyset_predicate(sort_column, "t.id", sort_direction)
+
+        sql_sentence += product_list_complements(order, direction)
+        records, next_cursor = await ru.fetch_keyset_page(
+            self.db,
+            query=sql_sentence,
+            values=values,
+            sort_field=sort_field,
+            page_size=page_size,
+            sort_column=sort_column,
+            direction=sort_direction,
+        )
+
+        if selected is not None:
+            return [{field: record[field] for field in selected} for record in records], next_cursor
+        return [ru.from_record(ProductInDB, record) for record in records], next_cursor
+
+    async def get_product_by_id(self, id: UUID, fields: str | None = None) -> ProductInDB | dict:
+        from modules.product.product_sqlstatements import GET_PRODUCT_BY_ID, PRODUCT_COLUMNS
+
+        selected = ru.parse_fields(fields, PRODUCT_COLUMNS)
+        sql_sentence = GET_PRODUCT_BY_ID.format(**ru.projection(PRODUCT_COLUMNS, selected))
         values = {"id": id}
-        record = await self.db.fetch_one(query=GET_PRODUCT_BY_ID, values=values)
+        if selected is None:
+            # from the primary, a lagging replica would cache an old row
+            return await product_cache.get_or_load(
+                id, lambda: db_statements.fetch_one(primary_database(self.db), sql_sentence, values)
+            )
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
         if not record:
             return {}
 
-        product = record_to_dict(record)
-        return ProductInDB(**product)
+        return record_to_dict(record)
+    
+    
+    async def get_product_version(self, id: UUID) -> Dict:
+        # the cached row, the answer usually needs it right after
+        product = await self.get_product_by_id(id=id)
+        if not product:
+            return {}
+
+        return {"updated_at": product.updated_at}
+
+    async def get_product_list_version(self, search: str | None) -> Tuple[int, datetime | None]:
+        from modules.product.product_sqlstatements import GET_PRODUCT_LIST_VERSION, product_list_search
+
+        values = {}
+        sql_sentence = GET_PRODUCT_LIST_VERSION
+        if search:
+            sql_sentence += product_list_search()
+            values["search"] = "%" + search + "%"
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
+        return record["total"], record["last_updated"]
     
     
     async def update_product(
@@ -77,23 +220,25 @@ class ProductRepository:
     ) -> ProductInDB | dict:
         from modules.product.product_sqlstatements import UPDATE_PRODUCT_BY_ID
 
-        product = await self.get_product_by_id(id=id)
-        if not product:
-            return {}
-
-        product_update_params = product.copy(update=product_update.dict(exclude_unset=True))
-
-        product_params_dict = product_update_params.dict()
+        product_params_dict = product_update.dict(exclude_unset=True)
         product_params_dict["updated_by"] = updated_by_id
         product_params_dict["updated_at"] = ru._preprocess_date()
-        
+        sql_sentence = UPDATE_PRODUCT_BY_ID.format(
+            set_clause=ru.update_set_clause(product_params_dict)
+        )
+        product_params_dict["id"] = id
+
         try:
-            record = await self.db.fetch_one(query=UPDATE_PRODUCT_BY_ID, values=product_params_dict)
-            product_updated = record_to_dict(record)
-            return await self.get_product_by_id(id=product_updated.get("id"))
+            record = await self.db.fetch_one(query=sql_sentence, values=product_params_dict)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar una tarea: {e}")
-            raise ProductExceptions.ProductInvalidUpdateParamsException()    
+            raise ProductExceptions.ProductInvalidUpdateParamsException()
+
+        if not record:
+            return {}
+
+        await product_cache.invalidate(id, db=self.db)
+        return ru.from_record(ProductInDB, record)
         
         
     async def delete_product_by_id(
@@ -102,12 +247,9 @@ class ProductRepository:
     ) -> UUID | dict:
         from modules.product.product_sqlstatements import DELETE_PRODUCT_BY_ID
 
-        product = await self.get_product_by_id(id=id)
-
-        if not product:
+        record = await self.db.fetch_one(query=DELETE_PRODUCT_BY_ID, values={"id": id})
+        if not record:
             return {}
-        
-        record = await self.db.fetch_one(query= DELETE_PRODUCT_BY_ID, values = {"id": id})
-        product_id_delete = dict(record)        
 
-        return product_id_delete
\ No newline at end of file
+        await product_cache.invalidate(id, db=self.db)
+        return dict(record)
\ No newline at end of file
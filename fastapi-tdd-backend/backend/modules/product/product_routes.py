@@ -1,8 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 from uuid import UUID
 
 from databases import Database
-from fastapi import APIRouter, Body, Depends, Path, status
+from fastapi import APIRouter, Body, Depends, File, Path, Query, UploadFile, status
 from loguru import logger 
 
 from modules.product.product_services import ProductService
@@ -12,8 +12,10 @@ from modules.product.product_schemas import ProductCreate, ProductInDB, ProductT
 from modules.users.users.user_schemas import UserInDB
 from modules.users.auths.auth_dependencies import get_current_active_user
 from modules.users.auths.auth_exceptions import AuthExceptions
-from shared.core.db.db_dependencies import get_database
-from shared.utils.service_result import ServiceResult, handle_result
+from shared.core.db.db_dependencies import UnitOfWorkRoute, get_database, get_read_database
+from shared.utils.conditional_get import Preconditions, get_preconditions
+from shared.utils.schemas_base import BulkResult, CursorPage, IDModelMixin, ImportResult, Page
+from shared.utils.service_result import ServiceResult, handle_json_result, handle_result
 from shared.utils.verify_auth import is_authorized
 
 #Esto que está aquí es para manejar la documentación con el Swagger
@@ -21,6 +23,7 @@ product_router = APIRouter(
     prefix="/product",
     tags=["product"],
     responses={404: {"description": "Not found"}},
+    route_class=UnitOfWorkRoute,
 )
 
 
@@ -46,27 +49,79 @@ async def create_product(
 
 
 
+#Product: Bulk create
+@product_router.post(
+    "/bulk",
+    response_model=BulkResult,
+    name="product:create-product-bulk",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_product_bulk(
+    items: List[Dict] = Body(..., embed=True),
+    db: Database = Depends(get_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> ServiceResult:
+    if not is_authorized(current_user, "product:create-product-bulk"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await ProductService(db).create_product_bulk(items, current_user)
+    return handle_result(result)
+
+
+
+#Product: Import a csv or ndjson file
+@product_router.post(
+    "/import",
+    response_model=ImportResult,
+    name="product:import-product",
+    status_code=status.HTTP_200_OK,
+)
+async def import_product(
+    file: UploadFile = File(...),
+    file_format: str | None = Query(None, alias="format"),
+    db: Database = Depends(get_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> ServiceResult:
+    if not is_authorized(current_user, "product:import-product"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await ProductService(db).import_product(file, file_format, current_user)
+    return handle_result(result)
+
+
+
 @product_router.get(
     "/",
-    name="product:product_list",
+    response_model=Page[ProductInDB] | CursorPage[ProductInDB],
+    name="product:get_product_list",
     status_code=status.HTTP_200_OK
 )
 async def get_product_list(
     search: str | None = None,
-    page_number: int =1,
-    page_size: int = 10,
+    page_number: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1),
     order: str = "",
     direction: str = "",
-    db: Database = Depends(get_database),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    preconditions: Preconditions = Depends(get_preconditions),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "product:get_product_list"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
     
     result = await ProductService(db).get_product_list(
-        search, page_num=page_number, page_size=page_size, order=order, direction=direction
+        search,
+        page_num=page_number,
+        page_size=page_size,
+        order=order,
+        direction=direction,
+        cursor=cursor,
+        fields=fields,
+        preconditions=preconditions,
     )
-    return handle_result(result)
+    return handle_json_result(result)
 
 
 
@@ -76,24 +131,28 @@ async def get_product_list(
 
 @product_router.get(
     "/{id}", 
-    response_model=Dict, 
+    response_model=ProductInDB, 
     name="product:get-product-by-id")
 async def get_product_by_id(
     id: UUID = Path(..., title="The id of the product to get"),
-    db: Database = Depends(get_database),
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    preconditions: Preconditions = Depends(get_preconditions),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
-    if not is_authorized(current_user, "users:get-product-by-id"):
+    if not is_authorized(current_user, "product:get-product-by-id"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
 
-    result = await ProductService(db).get_product_by_id(id=id)
-    return handle_result(result)
+    result = await ProductService(db).get_product_by_id(
+        id=id, fields=fields, preconditions=preconditions
+    )
+    return handle_json_result(result)
 
 
 
 @product_router.put(
     "/{id}", 
-    response_model=Dict, 
+    response_model=ProductInDB, 
     name="product:update-product-by-id"
 )
 async def update_product_by_id(
@@ -116,7 +175,7 @@ async def update_product_by_id(
 
 @product_router.delete(
     "/{id}", 
-    response_model=Dict, 
+    response_model=IDModelMixin, 
     name="product:delete-product-by-id"
 )
 async def delete_product_by_id(
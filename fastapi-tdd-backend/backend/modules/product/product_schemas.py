@@ -2,12 +2,12 @@ from typing import List
 from uuid import UUID
 from pydantic import validator
 
-from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin 
+from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin, Varchar255 
 
 
 class ProductBase(BaseSchema):
-    product_name: str | None
-    description: str | None
+    product_name: Varchar255 | None
+    description: Varchar255 | None
     price: float | None
     
     @validator("product_name")
@@ -17,8 +17,8 @@ class ProductBase(BaseSchema):
         return v
     
 class ProductCreate(ProductBase):
-    product_name: str 
-    description: str 
+    product_name: Varchar255 
+    description: Varchar255 
     price: float 
     
     
@@ -1,17 +1,25 @@
+from typing import Dict, List
 from uuid import UUID
 
 from databases import Database
+from fastapi import UploadFile
 from loguru import logger
+from starlette.concurrency import run_in_threadpool
 
 from shared.utils.verify_uuid import is_valid_uuid
 
+from shared.utils.bulk_items import validate_bulk_items
+from shared.utils.conditional_get import Preconditions, not_modified_response, with_validators
+from shared.utils.import_stream import RowImporter, detect_format
+from shared.utils.schemas_base import BulkItemError, BulkResult
+from shared.utils.repository_utils import UnknownFieldsError
 from shared.utils.service_result import ServiceResult
 from modules.product.product_exceptions import ProductExceptions
 from modules.product.product_repositories import ProductRepository
-from modules.product.product_schemas import ProductCreate, ProductInDB, ProductToSave, ProductToUpdate
+from modules.product.product_schemas import ProductCreate, ProductToSave, ProductToUpdate
 from modules.users.users.user_schemas import UserInDB
-from shared.utils.short_pagination import short_pagination
-from shared.core.config import API_PREFIX
+from shared.utils.short_pagination import cursor_pagination, sql_pagination
+from shared.core.config import API_PREFIX, BULK_MAX_ITEMS
 
 class ProductService:
     def __init__(self, db: Database):
@@ -29,6 +37,55 @@ class ProductService:
             return ServiceResult(ProductExceptions.ProductCreateException())
         
         return ServiceResult(product_item)
+
+    async def create_product_bulk(self, items: List[Dict], current_user: UserInDB) -> ServiceResult:
+        if len(items) > BULK_MAX_ITEMS:
+            logger.error(f"Bulk create of {len(items)} product items")
+            return ServiceResult(ProductExceptions.ProductBulkTooLargeException())
+
+        valid, errors = await run_in_threadpool(
+            validate_bulk_items,
+            items,
+            ProductToSave,
+            key="product_name",
+            created_by=current_user.id,
+            updated_by=current_user.id,
+        )
+        created, failed = await ProductRepository(self.db).create_product_bulk(
+            [product for _, product in valid]
+        )
+
+        for position, (index, product) in enumerate(valid):
+            if position in failed:
+                errors.append(BulkItemError(index=index, msg=f"No se pudo guardar: {failed[position]}"))
+            elif product.product_name not in created:
+                errors.append(BulkItemError(index=index, msg="product_name ya existe"))
+        errors.sort(key=lambda error: error.index)
+
+        return ServiceResult(BulkResult(created=len(created), errors=errors))
+
+    async def import_product(
+        self, file: UploadFile, file_format: str | None, current_user: UserInDB
+    ) -> ServiceResult:
+        from modules.product.product_sqlstatements import PRODUCT_IMPORT_COLUMNS
+
+        file_format = detect_format(file.filename, file.content_type, file_format)
+        if not file_format:
+            logger.error(f"Import of product with an unsupported file: {file.filename}")
+            return ServiceResult(ProductExceptions.ProductImportFormatException())
+
+        importer = RowImporter("product", ProductCreate, PRODUCT_IMPORT_COLUMNS)
+        importer.start()
+        try:
+            merged = await ProductRepository(self.db).import_product(
+                importer.chunks(file.file, file_format), user_id=current_user.id
+            )
+        except Exception:
+            importer.finish(failed=True)
+            raise
+
+        importer.finish()
+        return ServiceResult(importer.result(**merged))
     
    
     async def get_product_list(
@@ -38,37 +95,103 @@ class ProductService:
         page_size: int = 10,
         order: str = None,
         direction: str = None,
+        cursor: str | None = None,
+        fields: str | None = None,
+        preconditions: Preconditions | None = None,
     ) -> ServiceResult:
-        product = await ProductRepository(self.db).get_product_list(search, order, direction)
+        validators = None
+        if preconditions is not None:
+            total, last_updated = await ProductRepository(self.db).get_product_list_version(search)
+            validators = preconditions.list_validators(total, last_updated)
+            if preconditions.not_modified(validators):
+                return ServiceResult(not_modified_response(validators))
+
+        if cursor is not None:
+            result = await self.get_product_list_after(search, cursor, page_size, order, direction, fields)
+            return with_validators(result, validators)
+
+        try:
+            product, total = await ProductRepository(self.db).get_product_list(
+                search, order, direction, page_num=page_num, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(ProductExceptions.ProductInvalidFieldsException(str(e)))
         
         service_result = None
-        if len(product) == 0:
-            service_Result = ServiceResult([])
+        if total == 0:
+            service_result = ServiceResult([])
             service_result.status_code = 204
         else:
-            response = short_pagination(
+            response = sql_pagination(
                 page_num=page_num,
                 page_size=page_size,
                 data_list=product,
+                total=total,
                 route=f"{API_PREFIX}/product",
             )
             service_result = ServiceResult(response)
             
-        return service_result
+        return with_validators(service_result, validators)
+
+    async def get_product_list_after(
+        self,
+        search: str | None,
+        cursor: str,
+        page_size: int = 10,
+        order: str = None,
+        direction: str = None,
+        fields: str | None = None,
+    ) -> ServiceResult:
+        try:
+            product, next_cursor = await ProductRepository(self.db).get_product_list_after(
+                search, order, direction, cursor=cursor, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(ProductExceptions.ProductInvalidFieldsException(str(e)))
+        except ValueError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(ProductExceptions.ProductInvalidCursorException())
+
+        response = cursor_pagination(
+            page_size=page_size,
+            data_list=product,
+            next_cursor=next_cursor,
+            route=f"{API_PREFIX}/product",
+            params={"search": search, "order": order, "direction": direction, "fields": fields},
+        )
+        return ServiceResult(response)
     
     
     
     
     
-    async def get_product_by_id(self, id: UUID) -> ServiceResult:
-        product_in_db = await ProductRepository(self.db).get_product_by_id(id=id)
+    async def get_product_by_id(
+        self, id: UUID, fields: str | None = None, preconditions: Preconditions | None = None
+    ) -> ServiceResult:
+        validators = None
+        if preconditions is not None:
+            version = await ProductRepository(self.db).get_product_version(id)
+            if not version:
+                logger.info("La tarea solicitada no está en base de datos")
+                return ServiceResult(ProductExceptions.ProductNotFoundException())
+
+            validators = preconditions.entity_validators(id, version["updated_at"])
+            if preconditions.not_modified(validators):
+                return ServiceResult(not_modified_response(validators))
+
+        try:
+            product_in_db = await ProductRepository(self.db).get_product_by_id(id=id, fields=fields)
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(ProductExceptions.ProductInvalidFieldsException(str(e)))
 
         if isinstance(product_in_db, dict) and not product_in_db.get("id"):
             logger.info("La tarea solicitada no está en base de datos")
             return ServiceResult(ProductExceptions.ProductNotFoundException())
 
-        product = ProductInDB(**product_in_db.dict())
-        return ServiceResult(product)
+        return with_validators(ServiceResult(product_in_db), validators)
     
     
     async def update_product(
@@ -88,7 +211,7 @@ class ProductService:
                 logger.info("El ID del producto a actualizar no está en base de datos")
                 return ServiceResult(ProductExceptions.ProductNotFoundException())
 
-            return ServiceResult(ProductInDB(**product.dict()))
+            return ServiceResult(product)
 
         except Exception as e:
             logger.error(f"Se produjo un error: {e}")
@@ -1,55 +1,145 @@
+from typing import Tuple
+
 CREATE_PRODUCT_ITEM = """
     INSERT INTO product (id, product_name, type, description, price, is_active, created_by, created_at, updated_by, updated_at)
     VALUES (:id, :product_name, :type, :description, :price, :is_active,  :created_by, :created_at, :updated_by, :updated_at)
     RETURNING id, product_name, type, description, price, is_active, created_by, created_at, updated_by, updated_at;
 """
 
+PRODUCT_BULK_COLUMNS = ("id", "product_name", "description", "price", "is_active", "created_by", "created_at", "updated_by", "updated_at")
+
+# one row per position of the arrays, names that already exist are skipped
+CREATE_PRODUCT_BULK = """
+    INSERT INTO product (id, product_name, description, price, is_active, created_by, created_at, updated_by, updated_at)
+    SELECT * FROM UNNEST(
+        CAST(:id AS UUID[]),
+        CAST(:product_name AS VARCHAR[]),
+        CAST(:description AS VARCHAR[]),
+        CAST(:price AS DOUBLE PRECISION[]),
+        CAST(:is_active AS BOOLEAN[]),
+        CAST(:created_by AS UUID[]),
+        CAST(:created_at AS TIMESTAMPTZ[]),
+        CAST(:updated_by AS UUID[]),
+        CAST(:updated_at AS TIMESTAMPTZ[])
+    )
+    ON CONFLICT (product_name) DO NOTHING
+    RETURNING product_name;
+"""
+
+PRODUCT_IMPORT_COLUMNS = ("product_name", "description", "price")
+PRODUCT_STAGING_TABLE = "product_staging"
+PRODUCT_STAGING_COLUMNS = ("line", "id", *PRODUCT_IMPORT_COLUMNS)
+
+# filled with COPY, dropped when the import transaction ends
+CREATE_PRODUCT_STAGING = """
+    CREATE TEMP TABLE product_staging (
+        line INTEGER,
+        id UUID,
+        product_name VARCHAR(255),
+        description VARCHAR(255),
+        price DOUBLE PRECISION
+    ) ON COMMIT DROP;
+"""
+
+# the last line of a name wins, existing names are updated
+MERGE_PRODUCT_STAGING = """
+    WITH merged AS (
+        INSERT INTO product (id, product_name, description, price, is_active,
+            created_by, created_at, updated_by, updated_at)
+        SELECT DISTINCT ON (st.product_name) st.id, st.product_name, st.description, st.price, TRUE,
+            CAST(:user_id AS UUID), CAST(:now AS TIMESTAMPTZ),
+            CAST(:user_id AS UUID), CAST(:now AS TIMESTAMPTZ)
+        FROM product_staging AS st
+        ORDER BY st.product_name, st.line DESC
+        ON CONFLICT (product_name) DO UPDATE
+        SET description = EXCLUDED.description,
+            price       = EXCLUDED.price,
+            updated_by  = EXCLUDED.updated_by,
+            updated_at  = EXCLUDED.updated_at
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted) AS created,
+        COUNT(*) FILTER (WHERE NOT inserted) AS updated
+    FROM merged;
+"""
+
+# field -> column of the list queries, the fields ?fields= can ask for
+PRODUCT_LIST_COLUMNS = {
+    "id": "t.id",
+    "product_name": "t.product_name",
+    "description": "t.description",
+    "price": "t.price",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "us1.fullname AS created_by",
+    "updated_by": "us2.fullname AS updated_by",
+}
+
+# joins of the list queries, only added when their field is selected
+PRODUCT_LIST_JOINS = {
+    "created_by": "LEFT JOIN users AS us1 ON us1.id = t.created_by",
+    "updated_by": "LEFT JOIN users AS us2 ON us2.id = t.updated_by",
+}
+
+# select and joins are built with ru.projection
 GET_PRODUCT_LIST = """
-    SELECT t.id, t.product_name, t.type, t.description, t.price, t.is_active, t.created_at, t.updated_at, 
-        us1.fullname AS created_by, us2.fullname AS updated_by
+    SELECT {select},
+        COUNT(*) OVER() AS total_count
+    FROM product AS t
+    {joins}
+"""
+
+# keyset pages do not count the whole list
+GET_PRODUCT_LIST_KEYSET = """
+    SELECT {select}
     FROM product AS t
-    LEFT JOIN users AS us1 ON us1.id = t.created_by
-    LEFT JOIN users AS us2 ON us2.id = t.updated_by
+    {joins}
 """
 
 
 def product_list_search():
-    return """ WHERE (t.product_name LIKE :search) """
+    return """ WHERE (t.product_name ILIKE :search) """
+
+def product_list_sort_key(order: str | None, direction: str | None) -> Tuple[str, str]:
+    column = "t.is_active" if order == "status" else "t.product_name"
+    return column, "DESC" if direction == "DESC" else "ASC"
 
 def product_list_complements(order: str | None, direction: str | None):
-    sql_sentence = ""
-    if not order and not direction:
-        sql_sentence = " ORDER BY t.product_name ASC;"
-    elif order == "product_name" and direction == "DESC":
-        sql_sentence = " ORDER BY t.product_name DESC;"
-    elif order == "product_name" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.product_name ASC;"
-    elif order == "status" and direction == "DESC":
-        sql_sentence = " ORDER BY t.is_active DESC;"
-    elif order == "status" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.is_active ASC;"
+    # t.id breaks ties so pages and cursors are stable
+    column, direction = product_list_sort_key(order, direction)
+    return f" ORDER BY {column} {direction}, t.id {direction}"
 
-    return sql_sentence
 
+# field -> column of GET_PRODUCT_BY_ID
+PRODUCT_COLUMNS = {
+    "id": "t.id",
+    "product_name": "t.product_name",
+    "description": "t.description",
+    "price": "t.price",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "t.created_by",
+    "updated_by": "t.updated_by",
+}
 
 GET_PRODUCT_BY_ID = """
-    SELECT t.id, t.product_name, t.type, t.description, t.price, t.is_active, t.created_at, t.updated_at, 
-        t.created_by, t.updated_by
+    SELECT {select}
+    FROM product AS t
+    WHERE t.id = :id;
+"""
+
+# version of a list, see shared.utils.conditional_get
+GET_PRODUCT_LIST_VERSION = """
+    SELECT COUNT(*) AS total, MAX(t.updated_at) AS last_updated
     FROM product AS t
-    WHERE t.id = :id; 
 """
 
+# set_clause is built from the fields sent in the request, see ru.update_set_clause
 UPDATE_PRODUCT_BY_ID = """
     UPDATE product
-    SET product_name = :product_name,
-        type           = :type,
-        description    = :description,
-        price          = :price,
-        is_active      = :is_active,
-        created_by     = :created_by,
-        created_at     = :created_at,
-        updated_by     = :updated_by,
-        updated_at     = :updated_at
+    SET {set_clause}
     WHERE id = :id
     RETURNING id, product_name, type, description, price, is_active, created_by, created_at, updated_by, updated_at;
 """
@@ -1,4 +1,5 @@
 from typing import Any
+from shared.core.config import BULK_MAX_ITEMS
 from shared.utils.app_exceptions import AppExceptionCase
 
 
@@ -41,4 +42,44 @@ class Raw_materialExceptions:
             error = e
             status_code = 422
             msg = f"Parámetros de actualización inválidos: {str(error)}"
-            AppExceptionCase.__init__(self, status_code, msg)
\ No newline at end of file
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class Raw_materialInvalidCursorException(AppExceptionCase):
+        """_
+        Raw_material invalid pagination cursor
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = "Cursor de paginación inválido"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class Raw_materialBulkTooLargeException(AppExceptionCase):
+        """_
+        Raw_material bulk create with too many items
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 413
+            msg = f"La solicitud supera el máximo de {BULK_MAX_ITEMS} elementos"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class Raw_materialImportFormatException(AppExceptionCase):
+        """_
+        Raw_material import with an unsupported file format
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 415
+            msg = "Formato de archivo no soportado, use csv o ndjson"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class Raw_materialInvalidFieldsException(AppExceptionCase):
+        """_
+        Raw_material fields parameter with unknown fields
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = f"Campos desconocidos en fields: {msg}"
+            AppExceptionCase.__init__(self, status_code, msg)
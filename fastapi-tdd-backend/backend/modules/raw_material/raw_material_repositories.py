@@ -1,12 +1,19 @@
+from datetime import datetime
 from databases import Database
 from loguru import logger
-from typing import List
+from typing import AsyncIterator, Dict, List, Set, Tuple
 from uuid import UUID
 
 from modules.raw_material.raw_material_exceptions import Raw_materialExceptions
 from modules.raw_material.raw_material_schemas import Raw_materialInDB, Raw_materialToSave, Raw_materialToUpdate
+from shared.core.config import BULK_CHUNK_SIZE
 from shared.utils.record_to_dict import record_to_dict
 import shared.utils.repository_utils as ru
+from shared.core.db import db_statements
+from shared.core.db.db_replicas import primary_database
+from shared.utils.entity_cache import entity_cache
+
+raw_material_cache = entity_cache("raw_material", Raw_materialInDB)
 
 class Raw_materialRepository:
     def __init__(self, db: Database):
@@ -17,10 +24,46 @@ class Raw_materialRepository:
         
         values = ru.preprocess_create(raw_material.dict())
         record = await self.db.fetch_one(query=CREATE_RAW_MATERIAL_ITEM, values=values)
+        await raw_material_cache.invalidate(record["id"], db=self.db)
         
-        result = record_to_dict(record)
-        
-        return Raw_materialInDB(**result)
+        return ru.from_record(Raw_materialInDB, record)
+
+    async def create_raw_material_bulk(self, raw_material_items: List[Raw_materialToSave]) -> Tuple[Set[str], Dict[int, str]]:
+        from modules.raw_material.raw_material_sqlstatements import CREATE_RAW_MATERIAL_BULK, RAW_MATERIAL_BULK_COLUMNS
+
+        rows = [ru.preprocess_create(raw_material.dict()) for raw_material in raw_material_items]
+        records, failed = await ru.bulk_insert(
+            self.db, CREATE_RAW_MATERIAL_BULK, rows, RAW_MATERIAL_BULK_COLUMNS, chunk_size=BULK_CHUNK_SIZE
+        )
+
+        return {record["raw_material_name"] for record in records}, failed
+
+    async def import_raw_material(self, chunks: AsyncIterator[List[Tuple]], user_id: UUID) -> Dict[str, int]:
+        """
+        Copies the chunks into a staging table and merges it into raw_material,
+        all in one transaction. Returns the created and updated rows.
+        """
+        from modules.raw_material.raw_material_sqlstatements import (
+            CREATE_RAW_MATERIAL_STAGING,
+            MERGE_RAW_MATERIAL_STAGING,
+            RAW_MATERIAL_STAGING_COLUMNS,
+            RAW_MATERIAL_STAGING_TABLE,
+        )
+
+        async with self.db.connection() as connection:
+            async with connection.transaction():
+                await connection.execute(query=CREATE_RAW_MATERIAL_STAGING)
+                async for records in chunks:
+                    await connection.raw_connection.copy_records_to_table(
+                        RAW_MATERIAL_STAGING_TABLE, records=records, columns=RAW_MATERIAL_STAGING_COLUMNS
+                    )
+
+                values = {"user_id": user_id, "now": ru._preprocess_date()}
+                record = await connection.fetch_one(query=MERGE_RAW_MATERIAL_STAGING, values=values)
+
+        # the merge updates rows by name, their ids are not known here
+        await raw_material_cache.clear(db=self.db)
+        return dict(record)
     
     
     
@@ -30,9 +73,21 @@ class Raw_materialRepository:
         search: str | None,
         order: str | None,
         direction: str | None,
-    ) -> List:
-        from modules.raw_material.raw_material_sqlstatements import GET_RAW_MATERIAL_LIST, raw_material_list_complements, raw_material_list_search
-        
+        page_num: int = 1,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[Raw_materialInDB] | List[Dict], int]:
+        from modules.raw_material.raw_material_sqlstatements import (
+            GET_RAW_MATERIAL_LIST,
+            RAW_MATERIAL_LIST_COLUMNS,
+            RAW_MATERIAL_LIST_JOINS,
+            raw_material_list_complements,
+            raw_material_list_search,
+        )
+
+        # only the asked fields are read, with no fields every column is
+        selected = ru.parse_fields(fields, RAW_MATERIAL_LIST_COLUMNS)
+        sql_list = GET_RAW_MATERIAL_LIST.format(**ru.projection(RAW_MATERIAL_LIST_COLUMNS, selected, RAW_MATERIAL_LIST_JOINS))
 
         order = order.lower() if order != None else None
         direction = direction.upper() if order != None else None
@@ -41,32 +96,120 @@ class Raw_materialRepository:
         sql_search = raw_material_list_search()
 
         if not search:
-            sql_sentence = GET_RAW_MATERIAL_LIST + sql_sentence
+            sql_sentence = sql_list + sql_sentence
         else:
-            sql_sentence = GET_RAW_MATERIAL_LIST + sql_search + sql_sentence
+            sql_sentence = sql_list + sql_search + sql_sentence
             values["search"] = "%" + search + "%"
 
-        records = await self.db.fetch_all(query=sql_sentence, values=values)
+        records, total = await ru.fetch_page(
+            self.db, query=sql_sentence, values=values, page_num=page_num, page_size=page_size
+        )
 
-        if len(records) == 0 or not records:
-            return []
-        
-        return [Raw_materialInDB(**dict(record)) for record in records] 
+        if selected is not None:
+            return records, total
+        return [ru.from_record(Raw_materialInDB, record) for record in records], total
     
     
     
     
     
-    async def get_raw_material_by_id(self, id: UUID) -> Raw_materialInDB | dict:
-        from modules.raw_material.raw_material_sqlstatements import GET_RAW_MATERIAL_BY_ID
+    async def get_raw_material_list_after(
+        self,
+        search: str | None,
+        order: str | None,
+        direction: str | None,
+        cursor: str | None,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[Raw_materialInDB] | List[Dict], str | None]:
+        from modules.raw_material.raw_material_sqlstatements import (
+            GET_RAW_MATERIAL_LIST_KEYSET,
+            RAW_MATERIAL_LIST_COLUMNS,
+            RAW_MATERIAL_LIST_JOINS,
+            raw_material_list_complements,
+            raw_material_list_search,
+            raw_material_list_sort_key,
+        )
 
+        order = order.lower() if order != None else None
+        direction = direction.upper() if order != None else None
+        sort_column, sort_direction = raw_material_list_sort_key(order, direction)
+        sort_field = sort_column.split(".")[-1]
+        selected = ru.parse_fields(fields, RAW_MATERIAL_LIST_COLUMNS)
+        # the next cursor is built from the sort field, it is read even if not asked for
+        columns = selected
+        if selected is not None and sort_field not in selected:
+            columns = [*selected, sort_field]
+        values = {}
+        sql_sentence = GET_RAW_MATERIAL_LIST_KEYSET.format(
+            **ru.projection(RAW_MATERIAL_LIST_COLUMNS, columns, RAW_MATERIAL_LIST_JOINS)
+        )
+
+        if search:
+            sql_sentence += raw_material_list_search()
+            values["search"] = "%" + search + "%"
+
+        if cursor:
+            key_type = bool if sort_field == "is_active" else str
+            values["cursor_key"], values["cursor_id"] = ru.decode_cursor(
+                cursor, sort_column, sort_direction, key_type
+            )
+            sql_sentence += " AND" if search else " WHERE"
+            sql_sentence += ru.keyset_predicate(sort_column, "t.id", sort_direction)
+
+        sql_sentence += raw_material_list_complements(order, direction)
+        records, next_cursor = await ru.fetch_keyset_page(
+            self.db,
+            query=sql_sentence,
+            values=values,
+            sort_field=sort_field,
+            page_size=page_size,
+            sort_column=sort_column,
+            direction=sort_direction,
+        )
+
+        if selected is not None:
+            return [{field: record[field] for field in selected} for record in records], next_cursor
+        return [ru.from_record(Raw_materialInDB, record) for record in records], next_cursor
+
+    async def get_raw_material_by_id(self, id: UUID, fields: str | None = None) -> Raw_materialInDB | dict:
+        from modules.raw_material.raw_material_sqlstatements import GET_RAW_MATERIAL_BY_ID, RAW_MATERIAL_COLUMNS
+
+        selected = ru.parse_fields(fields, RAW_MATERIAL_COLUMNS)
+        sql_sentence = GET_RAW_MATERIAL_BY_ID.format(**ru.projection(RAW_MATERIAL_COLUMNS, selected))
         values = {"id": id}
-        record = await self.db.fetch_one(query=GET_RAW_MATERIAL_BY_ID, values=values)
+        if selected is None:
+            # from the primary, a lagging replica would cache an old row
+            return await raw_material_cache.get_or_load(
+                id, lambda: db_statements.fetch_one(primary_database(self.db), sql_sentence, values)
+            )
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
         if not record:
             return {}
 
-        raw_material = record_to_dict(record)
-        return Raw_materialInDB(**raw_material)
+        return record_to_dict(record)
+    
+    
+    async def get_raw_material_version(self, id: UUID) -> Dict:
+        # the cached row, the answer usually needs it right after
+        raw_material = await self.get_raw_material_by_id(id=id)
+        if not raw_material:
+            return {}
+
+        return {"updated_at": raw_material.updated_at}
+
+    async def get_raw_material_list_version(self, search: str | None) -> Tuple[int, datetime | None]:
+        from modules.raw_material.raw_material_sqlstatements import GET_RAW_MATERIAL_LIST_VERSION, raw_material_list_search
+
+        values = {}
+        sql_sentence = GET_RAW_MATERIAL_LIST_VERSION
+        if search:
+            sql_sentence += raw_material_list_search()
+            values["search"] = "%" + search + "%"
+
+        record = await self.db.fetch_one(query=sql_sentence, values=values)
+        return record["total"], record["last_updated"]
     
     
     async def update_raw_material(
@@ -77,23 +220,25 @@ class Raw_materialRepository:
     ) -> Raw_materialInDB | dict:
         from modules.raw_material.raw_material_sqlstatements import UPDATE_RAW_MATERIAL_BY_ID
 
-        raw_material = await self.get_raw_material_by_id(id=id)
-        if not raw_material:
-            return {}
-
-        raw_material_update_params = raw_material.copy(update=raw_material_update.dict(exclude_unset=True))
-
-        raw_material_params_dict = raw_material_update_params.dict()
+        raw_material_params_dict = raw_material_update.dict(exclude_unset=True)
         raw_material_params_dict["updated_by"] = updated_by_id
         raw_material_params_dict["updated_at"] = ru._preprocess_date()
-        
+        sql_sentence = UPDATE_RAW_MATERIAL_BY_ID.format(
+            set_clause=ru.update_set_clause(raw_material_params_dict)
+        )
+        raw_material_params_dict["id"] = id
+
         try:
-            record = await self.db.fetch_one(query=UPDATE_RAW_MATERIAL_BY_ID, values=raw_material_params_dict)
-            raw_material_updated = record_to_dict(record)
-            return await self.get_raw_material_by_id(id=raw_material_updated.get("id"))
+            record = await self.db.fetch_one(query=sql_sentence, values=raw_material_params_dict)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar una tarea: {e}")
-            raise Raw_materialExceptions.Raw_materialInvalidUpdateParamsException()    
+            raise Raw_materialExceptions.Raw_materialInvalidUpdateParamsException()
+
+        if not record:
+            return {}
+
+        await raw_material_cache.invalidate(id, db=self.db)
+        return ru.from_record(Raw_materialInDB, record)
         
         
     async def delete_raw_material_by_id(
@@ -102,12 +247,9 @@ class Raw_materialRepository:
     ) -> UUID | dict:
         from modules.raw_material.raw_material_sqlstatements import DELETE_RAW_MATERIAL_BY_ID
 
-        raw_material = await self.get_raw_material_by_id(id=id)
-
-        if not raw_material:
+        record = await self.db.fetch_one(query=DELETE_RAW_MATERIAL_BY_ID, values={"id": id})
+        if not record:
             return {}
-        
-        record = await self.db.fetch_one(query= DELETE_RAW_MATERIAL_BY_ID, values = {"id": id})
-        raw_material_id_delete = dict(record)        
 
-        return raw_material_id_delete
\ No newline at end of file
+        await raw_material_cache.invalidate(id, db=self.db)
+        return dict(record)
\ No newline at end of file
@@ -1,8 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 from uuid import UUID
 
 from databases import Database
-from fastapi import APIRouter, Body, Depends, Path, status
+from fastapi import APIRouter, Body, Depends, File, Path, Query, UploadFile, status
 from loguru import logger 
 
 from modules.raw_material.raw_material_services import Raw_materialService
@@ -12,8 +12,10 @@ from modules.raw_material.raw_material_schemas import Raw_materialCreate, Raw_ma
 from modules.users.users.user_schemas import UserInDB
 from modules.users.auths.auth_dependencies import get_current_active_user
 from modules.users.auths.auth_exceptions import AuthExceptions
-from shared.core.db.db_dependencies import get_database
-from shared.utils.service_result import ServiceResult, handle_result
+from shared.core.db.db_dependencies import UnitOfWorkRoute, get_database, get_read_database
+from shared.utils.conditional_get import Preconditions, get_preconditions
+from shared.utils.schemas_base import BulkResult, CursorPage, IDModelMixin, ImportResult, Page
+from shared.utils.service_result import ServiceResult, handle_json_result, handle_result
 from shared.utils.verify_auth import is_authorized
 
 #Esto que está aquí es para manejar la documentación con el Swagger
@@ -21,6 +23,7 @@ raw_material_router = APIRouter(
     prefix="/raw_material",
     tags=["raw_material"],
     responses={404: {"description": "Not found"}},
+    route_class=UnitOfWorkRoute,
 )
 
 
@@ -46,27 +49,79 @@ async def create_raw_material(
 
 
 
+#Raw_material: Bulk create
+@raw_material_router.post(
+    "/bulk",
+    response_model=BulkResult,
+    name="raw_material:create-raw_material-bulk",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_raw_material_bulk(
+    items: List[Dict] = Body(..., embed=True),
+    db: Database = Depends(get_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> ServiceResult:
+    if not is_authorized(current_user, "raw_material:create-raw_material-bulk"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await Raw_materialService(db).create_raw_material_bulk(items, current_user)
+    return handle_result(result)
+
+
+
+#Raw_material: Import a csv or ndjson file
+@raw_material_router.post(
+    "/import",
+    response_model=ImportResult,
+    name="raw_material:import-raw_material",
+    status_code=status.HTTP_200_OK,
+)
+async def import_raw_material(
+    file: UploadFile = File(...),
+    file_format: str | None = Query(None, alias="format"),
+    db: Database = Depends(get_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> ServiceResult:
+    if not is_authorized(current_user, "raw_material:import-raw_material"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await Raw_materialService(db).import_raw_material(file, file_format, current_user)
+    return handle_result(result)
+
+
+
 @raw_material_router.get(
     "/",
-    name="raw_material:raw_material_list",
+    response_model=Page[Raw_materialInDB] | CursorPage[Raw_materialInDB],
+    name="raw_material:get_raw_material_list",
     status_code=status.HTTP_200_OK
 )
 async def get_raw_material_list(
     search: str | None = None,
-    page_number: int =1,
-    page_size: int = 10,
+    page_number: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1),
     order: str = "",
     direction: str = "",
-    db: Database = Depends(get_database),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    preconditions: Preconditions = Depends(get_preconditions),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "raw_material:get_raw_material_list"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
     
     result = await Raw_materialService(db).get_raw_material_list(
-        search, page_num=page_number, page_size=page_size, order=order, direction=direction
+        search,
+        page_num=page_number,
+        page_size=page_size,
+        order=order,
+        direction=direction,
+        cursor=cursor,
+        fields=fields,
+        preconditions=preconditions,
     )
-    return handle_result(result)
+    return handle_json_result(result)
 
 
 
@@ -76,24 +131,28 @@ async def get_raw_material_list(
 
 @raw_material_router.get(
     "/{id}", 
-    response_model=Dict, 
+    response_model=Raw_materialInDB, 
     name="raw_material:get-raw_material-by-id")
 async def get_raw_material_by_id(
     id: UUID = Path(..., title="The id of the raw_material to get"),
-    db: Database = Depends(get_database),
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    preconditions: Preconditions = Depends(get_preconditions),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
-    if not is_authorized(current_user, "users:get-raw_material-by-id"):
+    if not is_authorized(current_user, "raw_material:get-raw_material-by-id"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
 
-    result = await Raw_materialService(db).get_raw_material_by_id(id=id)
-    return handle_result(result)
+    result = await Raw_materialService(db).get_raw_material_by_id(
+        id=id, fields=fields, preconditions=preconditions
+    )
+    return handle_json_result(result)
 
 
 
 @raw_material_router.put(
     "/{id}", 
-    response_model=Dict, 
+    response_model=Raw_materialInDB, 
     name="raw_material:update-raw_material-by-id"
 )
 async def update_raw_material_by_id(
@@ -116,7 +175,7 @@ async def update_raw_material_by_id(
 
 @raw_material_router.delete(
     "/{id}", 
-    response_model=Dict, 
+    response_model=IDModelMixin, 
     name="raw_material:delete-raw_material-by-id"
 )
 async def delete_raw_material_by_id(
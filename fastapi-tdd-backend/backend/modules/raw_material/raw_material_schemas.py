@@ -2,13 +2,13 @@ from typing import List
 from uuid import UUID
 from pydantic import validator
 
-from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin 
+from shared.utils.schemas_base import BaseSchema, DateTimeModelMixin, IDModelMixin, Integer, Varchar255 
 
 
 class Raw_materialBase(BaseSchema):
-    raw_material_name: str | None
-    provider: str | None
-    quantity: int | None
+    raw_material_name: Varchar255 | None
+    provider: Varchar255 | None
+    quantity: Integer | None
     
     @validator("raw_material_name")
     def raw_material_name_must_have_more_than_three_characters(cls, v) -> str:
@@ -17,9 +17,9 @@ class Raw_materialBase(BaseSchema):
         return v
     
 class Raw_materialCreate(Raw_materialBase):
-    raw_material_name: str 
-    provider: str 
-    quantity: int
+    raw_material_name: Varchar255 
+    provider: Varchar255 
+    quantity: Integer
     
     
 class Raw_materialToSave(Raw_materialCreate):
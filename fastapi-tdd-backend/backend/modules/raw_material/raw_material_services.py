@@ -1,17 +1,25 @@
+from typing import Dict, List
 from uuid import UUID
 
 from databases import Database
+from fastapi import UploadFile
 from loguru import logger
+from starlette.concurrency import run_in_threadpool
 
 from shared.utils.verify_uuid import is_valid_uuid
 
+from shared.utils.bulk_items import validate_bulk_items
+from shared.utils.conditional_get import Preconditions, not_modified_response, with_validators
+from shared.utils.import_stream import RowImporter, detect_format
+from shared.utils.schemas_base import BulkItemError, BulkResult
+from shared.utils.repository_utils import UnknownFieldsError
 from shared.utils.service_result import ServiceResult
 from modules.raw_material.raw_material_exceptions import Raw_materialExceptions
 from modules.raw_material.raw_material_repositories import Raw_materialRepository
-from modules.raw_material.raw_material_schemas import Raw_materialCreate, Raw_materialInDB, Raw_materialToSave, Raw_materialToUpdate
+from modules.raw_material.raw_material_schemas import Raw_materialCreate, Raw_materialToSave, Raw_materialToUpdate
 from modules.users.users.user_schemas import UserInDB
-from shared.utils.short_pagination import short_pagination
-from shared.core.config import API_PREFIX
+from shared.utils.short_pagination import cursor_pagination, sql_pagination
+from shared.core.config import API_PREFIX, BULK_MAX_ITEMS
 
 class Raw_materialService:
     def __init__(self, db: Database):
@@ -29,6 +37,55 @@ class Raw_materialService:
             return ServiceResult(Raw_materialExceptions.Raw_materialCreateException())
         
         return ServiceResult(raw_material_item)
+
+    async def create_raw_material_bulk(self, items: List[Dict], current_user: UserInDB) -> ServiceResult:
+        if len(items) > BULK_MAX_ITEMS:
+            logger.error(f"Bulk create of {len(items)} raw_material items")
+            return ServiceResult(Raw_materialExceptions.Raw_materialBulkTooLargeException())
+
+        valid, errors = await run_in_threadpool(
+            validate_bulk_items,
+            items,
+            Raw_materialToSave,
+            key="raw_material_name",
+            created_by=current_user.id,
+            updated_by=current_user.id,
+        )
+        created, failed = await Raw_materialRepository(self.db).create_raw_material_bulk(
+            [raw_material for _, raw_material in valid]
+        )
+
+        for position, (index, raw_material) in enumerate(valid):
+            if position in failed:
+                errors.append(BulkItemError(index=index, msg=f"No se pudo guardar: {failed[position]}"))
+            elif raw_material.raw_material_name not in created:
+                errors.append(BulkItemError(index=index, msg="raw_material_name ya existe"))
+        errors.sort(key=lambda error: error.index)
+
+        return ServiceResult(BulkResult(created=len(created), errors=errors))
+
+    async def import_raw_material(
+        self, file: UploadFile, file_format: str | None, current_user: UserInDB
+    ) -> ServiceResult:
+        from modules.raw_material.raw_material_sqlstatements import RAW_MATERIAL_IMPORT_COLUMNS
+
+        file_format = detect_format(file.filename, file.content_type, file_format)
+        if not file_format:
+            logger.error(f"Import of raw_material with an unsupported file: {file.filename}")
+            return ServiceResult(Raw_materialExceptions.Raw_materialImportFormatException())
+
+        importer = RowImporter("raw_material", Raw_materialCreate, RAW_MATERIAL_IMPORT_COLUMNS)
+        importer.start()
+        try:
+            merged = await Raw_materialRepository(self.db).import_raw_material(
+                importer.chunks(file.file, file_format), user_id=current_user.id
+            )
+        except Exception:
+            importer.finish(failed=True)
+            raise
+
+        importer.finish()
+        return ServiceResult(importer.result(**merged))
     
    
     async def get_raw_material_list(
@@ -38,37 +95,103 @@ class Raw_materialService:
         page_size: int = 10,
         order: str = None,
         direction: str = None,
+        cursor: str | None = None,
+        fields: str | None = None,
+        preconditions: Preconditions | None = None,
     ) -> ServiceResult:
-        raw_material = await Raw_materialRepository(self.db).get_raw_material_list(search, order, direction)
+        validators = None
+        if preconditions is not None:
+            total, last_updated = await Raw_materialRepository(self.db).get_raw_material_list_version(search)
+            validators = preconditions.list_validators(total, last_updated)
+            if preconditions.not_modified(validators):
+                return ServiceResult(not_modified_response(validators))
+
+        if cursor is not None:
+            result = await self.get_raw_material_list_after(search, cursor, page_size, order, direction, fields)
+            return with_validators(result, validators)
+
+        try:
+            raw_material, total = await Raw_materialRepository(self.db).get_raw_material_list(
+                search, order, direction, page_num=page_num, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(Raw_materialExceptions.Raw_materialInvalidFieldsException(str(e)))
         
         service_result = None
-        if len(raw_material) == 0:
-            service_Result = ServiceResult([])
+        if total == 0:
+            service_result = ServiceResult([])
             service_result.status_code = 204
         else:
-            response = short_pagination(
+            response = sql_pagination(
                 page_num=page_num,
                 page_size=page_size,
                 data_list=raw_material,
+                total=total,
                 route=f"{API_PREFIX}/raw_material",
             )
             service_result = ServiceResult(response)
             
-        return service_result
+        return with_validators(service_result, validators)
+
+    async def get_raw_material_list_after(
+        self,
+        search: str | None,
+        cursor: str,
+        page_size: int = 10,
+        order: str = None,
+        direction: str = None,
+        fields: str | None = None,
+    ) -> ServiceResult:
+        try:
+            raw_material, next_cursor = await Raw_materialRepository(self.db).get_raw_material_list_after(
+                search, order, direction, cursor=cursor, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(Raw_materialExceptions.Raw_materialInvalidFieldsException(str(e)))
+        except ValueError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(Raw_materialExceptions.Raw_materialInvalidCursorException())
+
+        response = cursor_pagination(
+            page_size=page_size,
+            data_list=raw_material,
+            next_cursor=next_cursor,
+            route=f"{API_PREFIX}/raw_material",
+            params={"search": search, "order": order, "direction": direction, "fields": fields},
+        )
+        return ServiceResult(response)
     
     
     
     
     
-    async def get_raw_material_by_id(self, id: UUID) -> ServiceResult:
-        raw_material_in_db = await Raw_materialRepository(self.db).get_raw_material_by_id(id=id)
+    async def get_raw_material_by_id(
+        self, id: UUID, fields: str | None = None, preconditions: Preconditions | None = None
+    ) -> ServiceResult:
+        validators = None
+        if preconditions is not None:
+            version = await Raw_materialRepository(self.db).get_raw_material_version(id)
+            if not version:
+                logger.info("La tarea solicitada no está en base de datos")
+                return ServiceResult(Raw_materialExceptions.Raw_materialNotFoundException())
+
+            validators = preconditions.entity_validators(id, version["updated_at"])
+            if preconditions.not_modified(validators):
+                return ServiceResult(not_modified_response(validators))
+
+        try:
+            raw_material_in_db = await Raw_materialRepository(self.db).get_raw_material_by_id(id=id, fields=fields)
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(Raw_materialExceptions.Raw_materialInvalidFieldsException(str(e)))
 
         if isinstance(raw_material_in_db, dict) and not raw_material_in_db.get("id"):
             logger.info("La tarea solicitada no está en base de datos")
             return ServiceResult(Raw_materialExceptions.Raw_materialNotFoundException())
 
-        raw_material = Raw_materialInDB(**raw_material_in_db.dict())
-        return ServiceResult(raw_material)
+        return with_validators(ServiceResult(raw_material_in_db), validators)
     
     
     async def update_raw_material(
@@ -88,7 +211,7 @@ class Raw_materialService:
                 logger.info("El ID de tarea a actualizar no está en base de datos")
                 return ServiceResult(Raw_materialExceptions.Raw_materialNotFoundException())
 
-            return ServiceResult(Raw_materialInDB(**raw_material.dict()))
+            return ServiceResult(raw_material)
 
         except Exception as e:
             logger.error(f"Se produjo un error: {e}")
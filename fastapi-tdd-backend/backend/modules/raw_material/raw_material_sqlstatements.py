@@ -1,56 +1,145 @@
+from typing import Tuple
+
 CREATE_RAW_MATERIAL_ITEM = """
     INSERT INTO raw_material (id, raw_material_name, type, provider, quantity, adquisition_date, is_active, created_by, created_at, updated_by, updated_at)
     VALUES (:id, :raw_material_name, :type, :provider, :quantity, :adquisition_date, :is_active,  :created_by, :created_at, :updated_by, :updated_at)
     RETURNING id, raw_material_name, type, provider, quantity, adquisition_date, is_active, created_by, created_at, updated_by, updated_at;
 """
 
+RAW_MATERIAL_BULK_COLUMNS = ("id", "raw_material_name", "provider", "quantity", "is_active", "created_by", "created_at", "updated_by", "updated_at")
+
+# one row per position of the arrays, names that already exist are skipped
+CREATE_RAW_MATERIAL_BULK = """
+    INSERT INTO raw_material (id, raw_material_name, provider, quantity, is_active, created_by, created_at, updated_by, updated_at)
+    SELECT * FROM UNNEST(
+        CAST(:id AS UUID[]),
+        CAST(:raw_material_name AS VARCHAR[]),
+        CAST(:provider AS VARCHAR[]),
+        CAST(:quantity AS INTEGER[]),
+        CAST(:is_active AS BOOLEAN[]),
+        CAST(:created_by AS UUID[]),
+        CAST(:created_at AS TIMESTAMPTZ[]),
+        CAST(:updated_by AS UUID[]),
+        CAST(:updated_at AS TIMESTAMPTZ[])
+    )
+    ON CONFLICT (raw_material_name) DO NOTHING
+    RETURNING raw_material_name;
+"""
+
+RAW_MATERIAL_IMPORT_COLUMNS = ("raw_material_name", "provider", "quantity")
+RAW_MATERIAL_STAGING_TABLE = "raw_material_staging"
+RAW_MATERIAL_STAGING_COLUMNS = ("line", "id", *RAW_MATERIAL_IMPORT_COLUMNS)
+
+# filled with COPY, dropped when the import transaction ends
+CREATE_RAW_MATERIAL_STAGING = """
+    CREATE TEMP TABLE raw_material_staging (
+        line INTEGER,
+        id UUID,
+        raw_material_name VARCHAR(255),
+        provider VARCHAR(255),
+        quantity INTEGER
+    ) ON COMMIT DROP;
+"""
+
+# the last line of a name wins, existing names are updated
+MERGE_RAW_MATERIAL_STAGING = """
+    WITH merged AS (
+        INSERT INTO raw_material (id, raw_material_name, provider, quantity, is_active,
+            created_by, created_at, updated_by, updated_at)
+        SELECT DISTINCT ON (st.raw_material_name) st.id, st.raw_material_name, st.provider, st.quantity, TRUE,
+            CAST(:user_id AS UUID), CAST(:now AS TIMESTAMPTZ),
+            CAST(:user_id AS UUID), CAST(:now AS TIMESTAMPTZ)
+        FROM raw_material_staging AS st
+        ORDER BY st.raw_material_name, st.line DESC
+        ON CONFLICT (raw_material_name) DO UPDATE
+        SET provider   = EXCLUDED.provider,
+            quantity   = EXCLUDED.quantity,
+            updated_by = EXCLUDED.updated_by,
+            updated_at = EXCLUDED.updated_at
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted) AS created,
+        COUNT(*) FILTER (WHERE NOT inserted) AS updated
+    FROM merged;
+"""
+
+# field -> column of the list queries, the fields ?fields= can ask for
+RAW_MATERIAL_LIST_COLUMNS = {
+    "id": "t.id",
+    "raw_material_name": "t.raw_material_name",
+    "provider": "t.provider",
+    "quantity": "t.quantity",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "us1.fullname AS created_by",
+    "updated_by": "us2.fullname AS updated_by",
+}
+
+# joins of the list queries, only added when their field is selected
+RAW_MATERIAL_LIST_JOINS = {
+    "created_by": "LEFT JOIN users AS us1 ON us1.id = t.created_by",
+    "updated_by": "LEFT JOIN users AS us2 ON us2.id = t.updated_by",
+}
+
+# select and joins are built with ru.projection
 GET_RAW_MATERIAL_LIST = """
-    SELECT t.id, t.raw_material_name, t.type, t.provider, t.quantity, t.adquisition_date, t.is_active, t.created_at, t.updated_at, 
-        us1.fullname AS created_by, us2.fullname AS updated_by
+    SELECT {select},
+        COUNT(*) OVER() AS total_count
+    FROM raw_material AS t
+    {joins}
+"""
+
+# keyset pages do not count the whole list
+GET_RAW_MATERIAL_LIST_KEYSET = """
+    SELECT {select}
     FROM raw_material AS t
-    LEFT JOIN users AS us1 ON us1.id = t.created_by
-    LEFT JOIN users AS us2 ON us2.id = t.updated_by
+    {joins}
 """
 
 
 def raw_material_list_search():
-    return """ WHERE (t.raw_material_name LIKE :search) """
+    return """ WHERE (t.raw_material_name ILIKE :search) """
+
+def raw_material_list_sort_key(order: str | None, direction: str | None) -> Tuple[str, str]:
+    column = "t.is_active" if order == "status" else "t.raw_material_name"
+    return column, "DESC" if direction == "DESC" else "ASC"
 
 def raw_material_list_complements(order: str | None, direction: str | None):
-    sql_sentence = ""
-    if not order and not direction:
-        sql_sentence = " ORDER BY t.raw_material_name ASC;"
-    elif order == "raw_material_name" and direction == "DESC":
-        sql_sentence = " ORDER BY t.raw_material_name DESC;"
-    elif order == "raw_material_name" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.raw_material_name ASC;"
-    elif order == "status" and direction == "DESC":
-        sql_sentence = " ORDER BY t.is_active DESC;"
-    elif order == "status" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY t.is_active ASC;"
+    # t.id breaks ties so pages and cursors are stable
+    column, direction = raw_material_list_sort_key(order, direction)
+    return f" ORDER BY {column} {direction}, t.id {direction}"
 
-    return sql_sentence
 
+# field -> column of GET_RAW_MATERIAL_BY_ID
+RAW_MATERIAL_COLUMNS = {
+    "id": "t.id",
+    "raw_material_name": "t.raw_material_name",
+    "provider": "t.provider",
+    "quantity": "t.quantity",
+    "is_active": "t.is_active",
+    "created_at": "t.created_at",
+    "updated_at": "t.updated_at",
+    "created_by": "t.created_by",
+    "updated_by": "t.updated_by",
+}
 
 GET_RAW_MATERIAL_BY_ID = """
-    SELECT t.id, t.raw_material_name, t.type, t.provider, t.quantity, t.adquisition_date, t.is_active, t.created_at, t.updated_at, 
-        t.created_by, t.updated_by
+    SELECT {select}
+    FROM raw_material AS t
+    WHERE t.id = :id;
+"""
+
+# version of a list, see shared.utils.conditional_get
+GET_RAW_MATERIAL_LIST_VERSION = """
+    SELECT COUNT(*) AS total, MAX(t.updated_at) AS last_updated
     FROM raw_material AS t
-    WHERE t.id = :id; 
 """
 
+# set_clause is built from the fields sent in the request, see ru.update_set_clause
 UPDATE_RAW_MATERIAL_BY_ID = """
     UPDATE raw_material
-    SET raw_material_name = :raw_material_name,
-        type           = :type,
-        provider       = :provider,
-        quantity       = :quantity,
-        adquisition_date = :adquisition_date,
-        is_active      = :is_active,
-        created_by     = :created_by,
-        created_at     = :created_at,
-        updated_by     = :updated_by,
-        updated_at     = :updated_at
+    SET {set_clause}
     WHERE id = :id
     RETURNING id, raw_material_name, type, provider, quantity, adquisition_date, is_active, created_by, created_at, updated_by, updated_at;
 """
@@ -0,0 +1,66 @@
+from typing import Dict
+from uuid import UUID
+
+from modules.users.users.user_schemas import UserInDB
+from shared.core.config import PRINCIPAL_CACHE_MAX_SIZE, PRINCIPAL_CACHE_TTL_SECONDS
+from shared.core.metrics import register_metrics
+from shared.utils.entity_cache import on_remote_change
+from shared.utils.ttl_cache import TTLCache
+
+# authenticated principals (UserInDB) keyed by username
+principal_cache = TTLCache(max_size=PRINCIPAL_CACHE_MAX_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+# last known version of every role, used to validate the role claims of stateless tokens
+role_versions: Dict[str, int] = {}
+
+register_metrics("principal_cache", principal_cache.stats)
+
+
+def get_cached_principal(username: str) -> UserInDB | None:
+    return principal_cache.get(username)
+
+
+def cache_principal(user: UserInDB) -> None:
+    principal_cache.set(user.username, user)
+    if user.role_version is not None:
+        set_role_version(user.role_id, user.role_version)
+
+
+def invalidate_principal(user_id: UUID) -> None:
+    principal_cache.evict_where(lambda user: str(user.id) == str(user_id))
+
+
+def invalidate_principals_by_role(role_id: UUID, version: int | None = None) -> None:
+    principal_cache.evict_where(lambda user: str(user.role_id) == str(role_id))
+    if version is None:
+        role_versions.pop(str(role_id), None)
+    else:
+        set_role_version(role_id, version)
+
+
+def get_role_version(role_id: UUID) -> int | None:
+    return role_versions.get(str(role_id))
+
+
+def set_role_version(role_id: UUID, version: int) -> None:
+    role_versions[str(role_id)] = version
+
+
+def _on_remote_user_change(user_id: str) -> None:
+    if user_id == "*":
+        principal_cache.clear()
+    else:
+        invalidate_principal(user_id)
+
+
+def _on_remote_role_change(role_id: str) -> None:
+    if role_id == "*":
+        principal_cache.clear()
+        role_versions.clear()
+    else:
+        invalidate_principals_by_role(role_id)
+
+
+# users and roles changed by other workers
+on_remote_change("users", _on_remote_user_change)
+on_remote_change("roles", _on_remote_role_change)
@@ -2,27 +2,36 @@ from databases import Database
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from modules.users.auths.auth_cache import cache_principal, get_cached_principal
 from modules.users.auths.auth_services import AuthService
 from modules.users.auths.auth_exceptions import AuthExceptions
 from modules.users.users.user_repositories import UserRepository
 from modules.users.users.user_schemas import UserInDB
 from shared.core.config import SECRET_KEY, API_PREFIX
-from shared.core.db.db_dependencies import get_database
+from shared.core.db.db_dependencies import get_database_unpinned
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{API_PREFIX}/users/login/")
 
 
 async def get_user_from_token(
-    *, token: str = Depends(oauth2_scheme), db: Database = Depends(get_database)
+    *, token: str = Depends(oauth2_scheme), db: Database = Depends(get_database_unpinned)
 ) -> UserInDB | None:
+    # always the primary, unpinned: most requests are served by the principal cache
+    # and the route pins its own connection, of the primary or of a replica
     user_repo = UserRepository(db)
     user = None
     try:
-        username = AuthService().get_username_from_token(
-            token=token, secret_key=str(SECRET_KEY)
-        )
-        user = await user_repo.get_user_by_username(username=username)
+        auth_service = AuthService()
+        payload = auth_service.get_payload_from_token(token=token, secret_key=str(SECRET_KEY))
+
+        user = await auth_service.get_user_from_claims(payload, db)
+        if not user:
+            user = get_cached_principal(payload.username)
+        if not user:
+            user = await user_repo.get_user_by_username(username=payload.username)
+            if user:
+                cache_principal(user)
     except Exception as e:
         raise e
 
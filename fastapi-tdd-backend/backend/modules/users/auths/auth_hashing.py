@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+from shared.core.config import PASSWORD_HASH_MAX_CONCURRENCY, PASSWORD_HASH_MAX_WORKERS
+from shared.core.metrics import register_metrics
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a dedicated thread pool so the
+    event loop keeps serving other requests while a password is processed.
+    A semaphore caps the calls running at once, the rest wait in queue.
+    """
+
+    def __init__(self, max_workers: int, max_concurrency: int):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor: ThreadPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hasher"
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # created lazily so it is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore()
+
+        self.queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        try:
+            future = self._get_executor().submit(partial(func, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+
+        self.running += 1
+        # the permit is held until the thread ends, a cancelled caller does not stop it
+        future.add_done_callback(lambda _: self._call_in_loop(loop, self._finished, semaphore))
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable, *args: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # the loop was closed while the thread ran
+            pass
+
+    def _finished(self, semaphore: asyncio.Semaphore) -> None:
+        self.running -= 1
+        self.completed += 1
+        semaphore.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._semaphore = None
+
+    def stats(self) -> Dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=PASSWORD_HASH_MAX_WORKERS, max_concurrency=PASSWORD_HASH_MAX_CONCURRENCY
+)
+
+register_metrics("password_hasher", password_hasher.stats)
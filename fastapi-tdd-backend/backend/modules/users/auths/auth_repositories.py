@@ -26,7 +26,7 @@ class AuthRepository(BaseRepository):
         if not user:
             return None
 
-        return UserInDB(**user.dict())
+        return user
 
     async def save_token_used(self, token: str) -> dict:
         from modules.users.auths.auth_sqlstaments import SAVE_TOKEN
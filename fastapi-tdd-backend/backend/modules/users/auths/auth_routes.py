@@ -12,7 +12,7 @@ from modules.users.auths.auth_schemas import (
     AuthResponse,
 )
 from modules.users.auths.auth_services import AuthService
-from shared.core.db.db_dependencies import get_database
+from shared.core.db.db_dependencies import get_database, get_database_unpinned
 from shared.utils.service_result import ServiceResult, handle_result
 
 router = APIRouter(
@@ -23,7 +23,8 @@ router = APIRouter(
 @router.post("/login", response_model=AuthResponse, name="auth:login")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(OAuth2PasswordRequestForm),
-    db: Database = Depends(get_database),
+    # the password check runs in a thread, no connection is held meanwhile
+    db: Database = Depends(get_database_unpinned),
 ) -> ServiceResult:
     result = await AuthService().authenticate_user(
         username=form_data.username, password=form_data.password, db=db
@@ -23,9 +23,24 @@ class JWTCreds(BaseSchema):
     username: str
 
 
-class JWTPayload(JWTMeta, JWTCreds):
+class JWTClaims(BaseSchema):
+    """Authorization claims carried by stateless tokens"""
+
+    uid: str | None
+    role_id: str | None
+    role: str | None
+    rv: int | None
+    perms: List[str] | None
+    pm: int | None
+    pf: str | None
+    sa: bool | None
+    act: bool | None
+    tv: int | None
+
+
+class JWTPayload(JWTMeta, JWTCreds, JWTClaims):
     """
-    JWT Payload right before it's encoded - combine meta and username
+    JWT Payload right before it's encoded - combine meta, username and claims
     """
 
     pass
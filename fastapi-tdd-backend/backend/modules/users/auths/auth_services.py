@@ -7,13 +7,16 @@ import jwt
 from databases import Database
 from icecream import ic
 from loguru import logger
+from modules.users.auths.auth_cache import get_role_version
 from modules.users.auths.auth_exceptions import AuthExceptions
+from modules.users.auths.auth_hashing import password_hasher
 from modules.users.auths.auth_repositories import AuthRepository
 from modules.users.auths.auth_schemas import (
     AccessToken,
     AuthEmailRecoverPsw,
     AuthResetPsw,
     AuthResponse,
+    JWTClaims,
     JWTCreds,
     JWTMeta,
     JWTPayload,
@@ -25,6 +28,7 @@ from shared.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     JWT_ALGORITHM,
     JWT_AUDIENCE,
+    JWT_STATELESS_AUTH,
     SECRET_KEY,
 )
 from shared.utils.service_result import ServiceResult
@@ -48,6 +52,18 @@ class AuthService:
     def verify_password(self, password: str, salt: str, hashed_pw: str) -> bool:
         return pwd_context.verify(password + salt, hashed_pw)
 
+    async def create_salt_and_hashedpassword_async(
+        self, plaintext_password: str
+    ) -> UserPasswordUpdate:
+        return await password_hasher.run(
+            self.create_salt_and_hashedpassword, plaintext_password=plaintext_password
+        )
+
+    async def verify_password_async(self, password: str, salt: str, hashed_pw: str) -> bool:
+        return await password_hasher.run(
+            self.verify_password, password=password, salt=salt, hashed_pw=hashed_pw
+        )
+
     def create_access_token_for_user(
         self,
         *,
@@ -55,6 +71,7 @@ class AuthService:
         secret_key: str = str(SECRET_KEY),
         audience: str = JWT_AUDIENCE,
         expires_in: int = ACCESS_TOKEN_EXPIRE_MINUTES,
+        stateless: bool = JWT_STATELESS_AUTH,
     ) -> str:
         if not user or not isinstance(user, UserInDB):
             return None
@@ -69,14 +86,69 @@ class AuthService:
         )
 
         jwt_creds = JWTCreds(sub=user.email, username=user.username)
+        jwt_claims = self._create_claims_for_user(user) if stateless else JWTClaims()
         token_payload = JWTPayload(
             **jwt_meta.dict(),
             **jwt_creds.dict(),
+            **jwt_claims.dict(),
+        )
+        access_token = jwt.encode(
+            token_payload.dict(exclude_none=True), secret_key, algorithm=JWT_ALGORITHM
         )
-        access_token = jwt.encode(token_payload.dict(), secret_key, algorithm=JWT_ALGORITHM)
 
         return access_token
 
+    def _create_claims_for_user(self, user: UserInDB) -> JWTClaims:
+        return JWTClaims(
+            uid=str(user.id),
+            role_id=str(user.role_id),
+            role=user.role,
+            rv=user.role_version,
+            perms=user.permissions,
+            pm=user.permissions_mask,
+            pf=user.permissions_catalog,
+            sa=user.is_superadmin,
+            act=user.is_active,
+            tv=user.token_version,
+        )
+
+    async def get_user_from_claims(self, payload: JWTPayload, db: Database) -> UserInDB | None:
+        """
+        Builds the current user from the claims of a stateless token without
+        reading the user. Returns None when the token has no claims or they
+        must be validated against the database: the role changed, or the
+        user changed, was deactivated or deleted after the token was issued.
+        The token version is read through user_token_cache, which every
+        worker evicts on a change and loads again from the database.
+        """
+        from modules.users.users.user_repositories import UserRepository
+
+        if payload.uid is None or payload.rv is None or payload.tv is None:
+            return None
+
+        if get_role_version(payload.role_id) != payload.rv:
+            return None
+
+        state = await UserRepository(db).get_user_token_state(payload.uid)
+        if not state or not state.is_active or state.token_version != payload.tv:
+            return None
+
+        return UserInDB.construct(
+            id=uuid.UUID(payload.uid),
+            username=payload.username,
+            email=payload.sub,
+            is_active=payload.act,
+            is_superadmin=payload.sa,
+            role_id=uuid.UUID(payload.role_id),
+            role=payload.role,
+            permissions=payload.perms,
+            # only read with the catalog it was built with, see is_authorized
+            permissions_mask=payload.pm,
+            permissions_catalog=payload.pf,
+            role_version=payload.rv,
+            token_version=payload.tv,
+        )
+
     async def authenticate_user(self, username: str, password: str, db: Database) -> ServiceResult:
         from shared.utils.crypto_credentials import CryptoAES
 
@@ -94,7 +166,9 @@ class AuthService:
             logger.error(f"Trying to login with invalid credentials, username: {username}")
             return ServiceResult(AuthExceptions.AuthNoValidCredencialsException())
 
-        if not self.verify_password(password=password, salt=user.salt, hashed_pw=user.password):
+        if not await self.verify_password_async(
+            password=password, salt=user.salt, hashed_pw=user.password
+        ):
             logger.error(f"Trying to login with invalid credentials, username: {username}")
             return ServiceResult(AuthExceptions.AuthNoValidCredencialsException())
 
@@ -111,6 +185,10 @@ class AuthService:
         return ServiceResult(user_autenticated)
 
     def get_username_from_token(self, token: str, secret_key: str) -> str | None:
+        payload = self.get_payload_from_token(token=token, secret_key=secret_key)
+        return payload.username
+
+    def get_payload_from_token(self, token: str, secret_key: str) -> JWTPayload:
         try:
             decoded_token = jwt.decode(
                 token,
@@ -126,7 +204,7 @@ class AuthService:
         except jwt.ExpiredSignatureError:
             raise AuthExceptions.AuthTokenExpiredException()
 
-        return payload.username
+        return payload
 
 
     async def verify_token(self, token: str, db: Database) -> ServiceResult:
@@ -1,101 +1,196 @@
-from typing import List
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Tuple
 
 from loguru import logger
 
+# functionality that groups the routes of every router tag
+FUNCTIONALITIES_BY_TAG: Dict[str, str] = {
+    "users": "USUARIOS",
+    "inventory": "INVENTARIO",
+    "raw_material": "RAW_MATERIAL",
+    "product": "PRODUCT",
+    "orders": "ORDERS",
+}
 
-async def get_permissions() -> List:
-    """_
-        function that configurates and returns permissions to access
-        all routes defined in the system
+# permission masks are stored in a BIGINT column, the sign bit is not used.
+# The permissions after the first MAX_MASK_PERMISSIONS have no bit and are
+# checked against the permission names of the user.
+MAX_MASK_PERMISSIONS = 63
 
-    Returns:
-        a List[Dict[key: "funtionality_name" : route[List[Dict]]]]
-        List: _description_
+# routes that do not require a permission
+PUBLIC_ROUTES: FrozenSet[str] = frozenset({"auth:login", "auth:verify_token"})
+
+DESCRIPTIONS: Dict[str, str] = {
+    "permissions:list-permissions": "Listar permisos",
+    "roles:create-role": "Crear rol",
+    "roles:roles_list": "Listar roles",
+    "roles:export-roles": "Exportar roles en csv / ndjson",
+    "roles:get-role-by-id": "Obtener un rol por su id",
+    "roles:update-role-by-id": "Actualizar un rol por su id",
+    "roles:update-activate-role-by-id": "Activar / Desactivar un rol por su id",
+    "roles:delete-role-by-id": "Eliminar un rol por su id",
+    "users:create-user": "Crear usuario",
+    "users:users_list": "Listar usuarios",
+    "users:export-users": "Exportar usuarios en csv / ndjson",
+    "users:get-user-by-id": "Obtener un usuario por su id",
+    "users:activate-user-by-id": "Activar / Desactivar un usuario por su id",
+    "users:update-user-by-id": "Actualizar un usuario por su id",
+    "users:delete-user-by-id": "Eliminar un usuario por su id",
+    "users:change-password-by-id": "Actualizar password por el propio usuario",
+    "inventory:create-inventory": "Crear inventario",
+    "inventory:create-inventory-bulk": "Crear inventario en lote",
+    "inventory:get_inventory_list": "Listar inventario",
+    "inventory:export-inventory": "Exportar inventario en csv / ndjson",
+    "inventory:get-inventory-by-id": "Obtener una inventario por su ID",
+    "inventory:update-inventory-by-id": "Actualizar una inventario por su ID",
+    "inventory:delete-inventory-by-id": "Eliminar una inventario por su ID",
+    "raw_material:create-raw_material": "Crear materia prima",
+    "raw_material:create-raw_material-bulk": "Crear materia prima en lote",
+    "raw_material:import-raw_material": "Importar materia prima desde csv / ndjson",
+    "raw_material:get_raw_material_list": "Listar materia prima",
+    "raw_material:get-raw_material-by-id": "Obtener una materia prima por su ID",
+    "raw_material:update-raw_material-by-id": "Actualizar una materia prima por su ID",
+    "raw_material:delete-raw_material-by-id": "Eliminar una materia prima por su ID",
+    "product:create-product": "Crear producto",
+    "product:create-product-bulk": "Crear producto en lote",
+    "product:import-product": "Importar producto desde csv / ndjson",
+    "product:get_product_list": "Listar producto",
+    "product:get-product-by-id": "Obtener producto por su ID",
+    "product:update-product-by-id": "Actualizar producto por su ID",
+    "product:delete-product-by-id": "Eliminar producto por su ID",
+    "orders:create-orders": "Crear pedido",
+    "orders:create-orders-bulk": "Crear pedido en lote",
+    "orders:get_orders_list": "Listar pedidos",
+    "orders:export-orders": "Exportar pedidos en csv / ndjson",
+    "orders:get-orders-by-id": "Obtener pedido por su ID",
+    "orders:update-orders-by-id": "Actualizar pedido por su ID",
+    "orders:delete-orders-by-id": "Eliminar pedido por su ID",
+}
+
+
+@dataclass(frozen=True)
+class PermissionRegistry:
     """
+    Immutable catalog of the permissions of the system, one per protected route.
 
-    permissions = [
-        {
-            "functionality": "USUARIOS",
-            "routes": [
-                {"permissions:list-permissions": "Listar permisos"},
-                {"roles:create-role": "Crear rol"},
-                {"roles:roles_list": "Listar roles"},
-                {"roles:get-role-by-id": "Obtener un rol por su id"},
-                {"roles:update-role-by-id": "Actualizar un rol por su id"},
-                {"roles:update-activate-role-by-id": "Activar / Desactivar un rol por su id"},
-                {"roles:delete-role-by-id": "Eliminar un rol por su id"},
-                {"users:create-user": "Crear usuario"},
-                {"users:users_list": "Listar usuarios"},
-                {"users:get-user-by-id": "Obtener un usuario por su id"},
-                {"users:activate-user-by-id": "Activar / Desactivar un usuario por su id"},
-                {"users:update-user-by-id": "Actualizar un usuario por su id"},
-                {"users:delete-user-by-id": "Eliminar un usuario por su id"},
-                {"users:change-password-by-id": "Actualizar password por el propio usuario"},
-            ],
-        },
-        {
-            "functionality": "INVENTARIO",
-            "routes": [
-                {"inventory:create-inventory": "Crear inventario"},
-                {"inventory:get_inventory_list": "Listar inventario"},
-                {"inventory:get-inventory-by-id": "Obtener una inventario por su ID"},
-                {"inventory:update-inventory-by-id": "Actualizar una inventario por su ID"},
-                {"inventory:delete-inventory-by-id": "Eliminar una inventario por su ID"}
-            ],
-        },
-        {
-            "functionality": "RAW_MATERIAL",
-            "routes": [
-                {"raw_material:create-raw_material": "Crear materia prima"},
-                {"raw_material:get_raw_material_list": "Listar materia prima"},
-                {"raw_material:get-raw_material-by-id": "Obtener una materia prima por su ID"},
-                {"raw_material:update-raw_material-by-id": "Actualizar una materia prima por su ID"},
-<<<<<<< HEAD
-                {"raw_material:delete-raw_material-by-id": "Eliminar una materia prima por su ID"}
-=======
-                {"raw_material:delete-raw_material-by-id": "Eliminar una materia prima por su ID"},
->>>>>>> branch-adrian
-            ],
-        },
-        {
-            "functionality": "PRODUCT",
-            "routes": [
-                {"product:create-product": "Crear producto"},
-                {"product:get_product_list": "Listar producto"},
-                {"product:get-product-by-id": "Obtener producto por su ID"},
-                {"product:update-product-by-id": "Actualizar producto por su ID"},
-<<<<<<< HEAD
-                {"product:delete-product-by-id": "Eliminar producto por su ID"}
-=======
-                {"product:delete-product-by-id": "Eliminar producto por su ID"},
->>>>>>> branch-adrian
-            ],
-        },
+    names: every valid permission name
+    functionalities: functionality name -> permission names of its routes
+    catalog: the permissions grouped by functionality, as listed by the API
+    bits: permission name -> its bit in a permissions mask, by catalog
+        position, only the first MAX_MASK_PERMISSIONS have one
+    fingerprint: identifies the bits assignment. A mask is only read with
+        the registry of the same fingerprint, the order changes when routes
+        are added and workers of two releases can run side by side.
+    """
+
+    names: FrozenSet[str]
+    functionalities: Mapping[str, Tuple[str, ...]]
+    catalog: Tuple[Dict, ...]
+    bits: Mapping[str, int]
+    fingerprint: str
+
+    def is_valid(self, permission: str) -> bool:
+        return permission in self.names
+
+    @property
+    def ordered_names(self) -> List[str]:
+        """
+        Permission names that have a bit, by bit position, the first one is bit 0
+        """
+        return list(self.bits)
+
+    def mask_for(self, permissions: Iterable[str] | None) -> int:
+        """
+        Encodes a list of permission names as a bitmask, unknown names are ignored
+        """
+        mask = 0
+        for permission in permissions or ():
+            mask |= self.bits.get(permission, 0)
+
+        return mask
+
+    def find_functionality(self, search: str) -> str:
+        """
+        Returns the first functionality whose name contains search, "" if none
+        """
+        for functionality in self.functionalities:
+            if search in functionality:
+                return functionality
+
+        return ""
+
+    def get_functionality_permissions(self, functionality: str) -> Tuple[str, ...]:
+        return self.functionalities.get(functionality, ())
+
+
+@lru_cache(maxsize=None)
+def get_permission_registry() -> PermissionRegistry:
+    """_
+        builds the permission registry from the names of the routes registered
+        in shared.core.routers, so permissions and routes can't drift apart.
+        It is built on first use and reused afterwards.
+    """
+    from shared.core.routers import router
+
+    routes_by_functionality: Dict[str, List[str]] = {}
+    for route in router.routes:
+        name = getattr(route, "name", None)
+        if not name or name in PUBLIC_ROUTES:
+            continue
+
+        tags = getattr(route, "tags", None) or []
+        functionality = next(
+            (FUNCTIONALITIES_BY_TAG[tag] for tag in tags if tag in FUNCTIONALITIES_BY_TAG),
+            None,
+        )
+        if functionality is None:
+            logger.warning(f"La ruta {name} no pertenece a ninguna funcionalidad")
+            continue
+
+        permissions = routes_by_functionality.setdefault(functionality, [])
+        if name not in permissions:
+            permissions.append(name)
+
+    functionalities = {
+        functionality: tuple(names) for functionality, names in routes_by_functionality.items()
+    }
+    catalog = tuple(
         {
-            "functionality": "ORDERS",
-            "routes": [
-                {"orders:create-orders": "Crear pedido"},
-                {"orders:get_orders_list": "Listar pedidos"},
-                {"orders:get-orders-by-id": "Obtener pedido por su ID"},
-                {"orders:update-orders-by-id": "Actualizar pedido por su ID"},
-                {"orders:delete-orders-by-id": "Eliminar pedido por su ID"},
-            ],
-        },
-                
-    ]
+            "functionality": functionality,
+            "routes": [{name: DESCRIPTIONS.get(name, name)} for name in names],
+        }
+        for functionality, names in functionalities.items()
+    )
 
-    return permissions
+    names = [name for names in functionalities.values() for name in names]
+    masked_names = names[:MAX_MASK_PERMISSIONS]
+    if len(names) > len(masked_names):
+        logger.info(
+            f"{len(names) - len(masked_names)} permisos no caben en la máscara de permisos, "
+            f"se verifican por nombre"
+        )
 
+    return PermissionRegistry(
+        names=frozenset(names),
+        functionalities=MappingProxyType(functionalities),
+        catalog=catalog,
+        bits=MappingProxyType({name: 1 << position for position, name in enumerate(masked_names)}),
+        fingerprint=hashlib.sha1("|".join(masked_names).encode()).hexdigest()[:12],
+    )
 
-async def verify_permissions(permission: str) -> bool:
-    permissions = await get_permissions()
 
-    found = False
-    for dic in permissions:
-        routes = dic.get("routes")
-        for route in routes:
-            if permission in route:
-                found = True
-                return found
+async def get_permissions() -> List:
+    """_
+        returns the permissions to access all routes defined in the system
 
-    return found
+    Returns:
+        a List[Dict[key: "funtionality_name" : route[List[Dict]]]]
+    """
+    return list(get_permission_registry().catalog)
+
+
+async def verify_permissions(permission: str) -> bool:
+    return get_permission_registry().is_valid(permission)
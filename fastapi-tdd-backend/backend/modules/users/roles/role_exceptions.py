@@ -102,3 +102,13 @@ class RoleExceptions:
             status_code = 409
             msg = "No se puede desactivar / eliminar este rol. Hay usuarios que lo usan"
             AppExceptionCase.__init__(self, status_code, msg)
+
+    class RoleExportFormatException(AppExceptionCase):
+        """_
+        Roles export with an unsupported format
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = "Formato de exportación no soportado, use csv o ndjson"
+            AppExceptionCase.__init__(self, status_code, msg)
@@ -1,12 +1,14 @@
 from datetime import datetime
-from typing import Any, List, Type
+from typing import Any, AsyncGenerator, Dict, List, Tuple, Type
 from uuid import UUID
 
+from asyncpg.exceptions import ForeignKeyViolationError, UniqueViolationError
 from databases import Database
 from icecream import ic
 from loguru import logger
 
-from modules.users.permissions import get_permissions
+from modules.users.auths.auth_cache import invalidate_principals_by_role
+from modules.users.permissions import get_permission_registry
 from modules.users.roles.role_exceptions import RoleExceptions
 from modules.users.roles.role_schemas import (
     RoleIn,
@@ -15,8 +17,15 @@ from modules.users.roles.role_schemas import (
     RoleUpdateActive,
 )
 from modules.users.users.user_schemas import UserInDB
+from shared.core.config import EXPORT_BATCH_ROWS
+from shared.core.db import db_statements
+from shared.core.db.db_replicas import primary_database
+from shared.utils.entity_cache import entity_cache
 from shared.utils.record_to_dict import record_to_dict
 from shared.utils.repositories_base import BaseRepository
+from shared.utils.repository_utils import fetch_page, iterate_records
+
+role_cache = entity_cache("roles", RoleOut)
 
 
 class RoleRepository(BaseRepository):
@@ -29,13 +38,23 @@ class RoleRepository(BaseRepository):
         return RoleIn
 
     async def create_role(self, role: RoleIn) -> RoleOut:
-        from modules.users.roles.role_sqlsentences import CREATE_ROLE_ITEM
+        from modules.users.roles.role_sqlsentences import CREATE_ROLE_ITEM, ROLES_ROLE_UNIQUE
 
         values = self.preprocess_create(role.dict())
-        role_record = await self.db.fetch_one(query=CREATE_ROLE_ITEM, values=values)
-        role_in_db = record_to_dict(role_record)
+        registry = get_permission_registry()
+        values["permissions_mask"] = registry.mask_for(role.permissions)
+        values["permissions_catalog"] = registry.fingerprint
+        try:
+            role_record = await self.db.fetch_one(query=CREATE_ROLE_ITEM, values=values)
+        except UniqueViolationError as e:
+            if e.constraint_name != ROLES_ROLE_UNIQUE:
+                raise
+            logger.error(f"El nombre de rol ({role.role}) ya ha sido usado")
+            raise RoleExceptions.RoleAlreadyExistsExcepton()
 
-        return self._schema_out(**role_in_db)
+        await role_cache.invalidate(role_record["id"], db=self.db)
+        # created_by / updated_by are ids here, RoleOut declares them as str
+        return self._from_record(record_to_dict(role_record))
 
     async def get_role_by_name(self, role: str) -> RoleOut:
         from modules.users.roles.role_sqlsentences import GET_ROLE_BY_NAME
@@ -46,25 +65,28 @@ class RoleRepository(BaseRepository):
         if not record:
             return None
 
-        return self._schema_out(**dict(record))
+        return self._from_record(record)
 
     async def get_role_by_id(self, id: UUID) -> RoleOut | dict:
+        # from the primary, a lagging replica would cache an old row
+        return await role_cache.get_or_load(
+            id, lambda: self._fetch_role_by_id(id, db=primary_database(self.db))
+        )
+
+    async def _fetch_role_by_id(self, id: UUID, db: Database | None = None):
         from modules.users.roles.role_sqlsentences import GET_ROLE_BY_ID
 
         values = {"id": id}
-        record = await self.db.fetch_one(query=GET_ROLE_BY_ID, values=values)
-        if not record:
-            return {}
-
-        role_in_db = record_to_dict(record)
-        return self._schema_out(**role_in_db)
+        return await db_statements.fetch_one(db or self.db, GET_ROLE_BY_ID, values)
 
     async def get_roles_list(
         self,
         search: str | None,
         order: str | None,
         direction: str | None,
-    ) -> List[RoleOut]:
+        page_num: int = 1,
+        page_size: int = 10,
+    ) -> Tuple[List[RoleOut], int]:
         from modules.users.roles.role_sqlsentences import (
             role_list_sort,
             role_list_search,
@@ -79,58 +101,56 @@ class RoleRepository(BaseRepository):
         sql_sort = role_list_sort(order, direction)
         sql_search = role_list_search()
 
-        results = []
         if not search:
             sql_sentence = GET_ROLES_LIST + sql_sort
-            records = await self.db.fetch_all(query=sql_sentence, values=values)
         else:
-            found = await self.__check_functionality(search.upper())
+            registry = get_permission_registry()
+            found = registry.find_functionality(search.upper())
             if len(found) > 0:
-                permit_list = await self.__get_permits(found)
-                for permit in permit_list:
-                    values["permit"] = permit
-                    sql_sentence = GET_ROLES_LIST_FUNCTIONALITY + sql_sort
-
-                    records_in_db = await self.db.fetch_all(
-                        query=sql_sentence, values=values
-                    )
-                    results.extend(records_in_db)
-
-                temp = [dict(record) for record in results]
-                records = []
-                [records.append(role) for role in temp if role not in records]
+                permit_list = registry.get_functionality_permissions(found)
+                sql_sentence = GET_ROLES_LIST_FUNCTIONALITY + sql_sort
+                values["permits"] = list(permit_list)
             else:
                 sql_sentence = GET_ROLES_LIST + sql_search + sql_sort
                 values["search"] = "%" + search.lower() + "%"
-                records = await self.db.fetch_all(query=sql_sentence, values=values)
 
-        if len(records) == 0:
-            return []
+        records, total = await fetch_page(
+            self.db, query=sql_sentence, values=values, page_num=page_num, page_size=page_size
+        )
+
+        return [self._from_record(record) for record in records], total
 
-        if not records:
-            return []
+    def iterate_roles_export(self) -> AsyncGenerator[Dict, None]:
+        from modules.users.roles.role_sqlsentences import EXPORT_ROLES
 
-        return [self._schema_out(**dict(record)) for record in records]
+        return iterate_records(self.db, EXPORT_ROLES, prefetch=EXPORT_BATCH_ROWS)
 
     async def update_role(
         self, id: UUID, role_update: RoleUpdate, updated_by_id: UUID
     ) -> RoleOut | dict:
         from modules.users.roles.role_sqlsentences import UPDATE_ROLE_BY_ID
 
-        role = await self.get_role_by_id(id=id)
-        if not role:
+        # read from the database, the whole row is written back
+        record = await self._fetch_role_by_id(id)
+        if not record:
             return {}
 
+        role = self._from_record(record)
         role.updated_by = updated_by_id
         role.updated_at = self._preprocess_date()
         role_update_params = role.copy(update=role_update.dict(exclude_unset=True))
 
+        values = role_update_params.dict()
+        registry = get_permission_registry()
+        values["permissions_mask"] = registry.mask_for(values["permissions"])
+        values["permissions_catalog"] = registry.fingerprint
+
         try:
-            record = await self.db.fetch_one(
-                query=UPDATE_ROLE_BY_ID, values=role_update_params.dict()
-            )
+            record = await self.db.fetch_one(query=UPDATE_ROLE_BY_ID, values=values)
             role_in_db = record_to_dict(record)
-            return self._schema_out(**role_in_db)
+            invalidate_principals_by_role(id, version=role_in_db.get("version"))
+            await role_cache.invalidate(id, db=self.db)
+            return self._from_record(role_in_db)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar un rol: {e}")
             raise RoleExceptions.RoleInvalidUpdateParamsException()
@@ -141,20 +161,27 @@ class RoleRepository(BaseRepository):
         #  arreglar de aqui para abajo:
         from modules.users.roles.role_sqlsentences import UPDATE_ROLE_BY_ID
 
-        role = await self.get_role_by_id(id=id)
-        if not role:
+        # read from the database, the whole row is written back
+        record = await self._fetch_role_by_id(id)
+        if not record:
             return {}
 
+        role = self._from_record(record)
         role.updated_by = updated_by_id
         role.updated_at = self._preprocess_date()
         role_update_params = role.copy(update=role_update.dict(exclude_unset=True))
 
+        values = role_update_params.dict()
+        registry = get_permission_registry()
+        values["permissions_mask"] = registry.mask_for(values["permissions"])
+        values["permissions_catalog"] = registry.fingerprint
+
         try:
-            record = await self.db.fetch_one(
-                query=UPDATE_ROLE_BY_ID, values=role_update_params.dict()
-            )
+            record = await self.db.fetch_one(query=UPDATE_ROLE_BY_ID, values=values)
             role_in_db = record_to_dict(record)
-            return self._schema_out(**role_in_db)
+            invalidate_principals_by_role(id, version=role_in_db.get("version"))
+            await role_cache.invalidate(id, db=self.db)
+            return self._from_record(role_in_db)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar un rol: {e}")
             raise RoleExceptions.RoleInvalidUpdateParamsException()
@@ -163,42 +190,35 @@ class RoleRepository(BaseRepository):
         self,
         id: UUID,
     ) -> str | dict:
-        from modules.users.roles.role_sqlsentences import DELETE_ROLE_BY_ID
+        from modules.users.roles.role_sqlsentences import DELETE_ROLE_BY_ID, USERS_ROLE_ID_FK
 
-        role = await self.get_role_by_id(id=id)
-        if not role:
+        try:
+            deleted_id = await self.db.execute(query=DELETE_ROLE_BY_ID, values={"id": id})
+        except ForeignKeyViolationError as e:
+            if e.constraint_name != USERS_ROLE_ID_FK:
+                raise
+            logger.error(f"El rol {id} no se puede eliminar, hay usuarios que lo usan")
+            raise RoleExceptions.UsersUsingRoleException()
+
+        if not deleted_id:
             return {}
 
-        deleted_id = await self.db.execute(query=DELETE_ROLE_BY_ID, values={"id": id})
+        await role_cache.invalidate(id, db=self.db)
         return str(deleted_id)
 
-    # utility methods to search by funcionality
-    async def __get_functionalities(self):
-        permissions = await get_permissions()
-        funct_list = []
-        for dic in permissions:
-            funct_list.append(dic.get("functionality"))
-
-        return funct_list
-
-    async def __get_permits(self, search: str):
-        permissions = await get_permissions()
-        funct_routes = []
-        for dic in permissions:
-            if dic["functionality"] == search:
-                funct_routes = dic["routes"]
-                break
-
-        permits = []
-        if len(funct_routes) > 0:
-            for dic in funct_routes:
-                permits.append(next(iter(dic)))
-        return permits
-
-    async def __check_functionality(self, search: str) -> str:
-        functionalities = await self.__get_functionalities()
-        for funct in functionalities:
-            if funct.find(search) >= 0:
-                return funct
-
-        return ""
+    async def sync_permissions_masks(self) -> int:
+        """
+        Recomputes the permissions mask of every role from its permissions
+        and stamps it with the catalog fingerprint, needed when the
+        permission catalog changes. Returns the updated roles.
+        """
+        from modules.users.roles.role_sqlsentences import SYNC_ROLES_PERMISSIONS_MASK
+
+        registry = get_permission_registry()
+        values = {"catalog": registry.ordered_names, "fingerprint": registry.fingerprint}
+        records = await self.db.fetch_all(query=SYNC_ROLES_PERMISSIONS_MASK, values=values)
+        for record in records:
+            invalidate_principals_by_role(record["id"])
+            await role_cache.invalidate(record["id"], db=self.db)
+
+        return len(records)
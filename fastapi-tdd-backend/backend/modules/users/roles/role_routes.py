@@ -1,9 +1,9 @@
-from typing import Dict
 from urllib import response
 from uuid import UUID
 
 from databases import Database
-from fastapi import APIRouter, Body, Depends, Path, status
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from modules.users.auths.auth_dependencies import get_current_active_user
 from modules.users.auths.auth_exceptions import AuthExceptions
@@ -17,13 +17,15 @@ from modules.users.roles.role_schemas import (
 from modules.users.roles.role_services import RoleService
 from modules.users.users.user_schemas import UserInDB
 from pydantic.error_wrappers import ValidationError
-from shared.core.db.db_dependencies import get_database
-from shared.utils.service_result import ServiceResult, handle_result
+from shared.core.db.db_dependencies import UnitOfWorkRoute, get_database, get_read_database
+from shared.utils.schemas_base import Page
+from shared.utils.service_result import ServiceResult, handle_json_result, handle_result
 from shared.utils.verify_auth import is_authorized
 
 router = APIRouter(
     prefix="/roles",
     responses={404: {"description": "Not found"}},
+    route_class=UnitOfWorkRoute,
 )
 
 
@@ -48,18 +50,18 @@ async def create_role(
     return handle_result(result)
 
 
-@router.get("/", response_model=Dict, name="roles:roles_list", status_code=status.HTTP_200_OK)
+@router.get("/", response_model=Page[RoleOut], name="roles:roles_list", status_code=status.HTTP_200_OK)
 async def get_roles_list(
     search: str | None = None,
-    page_number: int = 1,
-    page_size: int = 10,
+    page_number: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1),
     order: str = "",
     direction: str = "",
-    db: Database = Depends(get_database),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "roles:roles_list"):
-        return ServiceResult(AuthExceptions.AuthUnauthorizedException())
+        return handle_json_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
 
     result = await RoleService().get_roles_list(
         db=db,
@@ -69,13 +71,31 @@ async def get_roles_list(
         order=order,
         direction=direction,
     )
+    return handle_json_result(result)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    name="roles:export-roles",
+    status_code=status.HTTP_200_OK,
+)
+async def export_roles(
+    file_format: str = Query("csv", alias="format"),
+    db: Database = Depends(get_read_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    if not is_authorized(current_user, "roles:export-roles"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await RoleService().export_roles(db=db, file_format=file_format)
     return handle_result(result)
 
 
 @router.get("/{id}/", response_model=RoleOut, name="roles:get-role-by-id")
 async def get_role_by_id(
     id: UUID,
-    db: Database = Depends(get_database),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "roles:get-role-by-id"):
@@ -4,20 +4,20 @@ from uuid import UUID
 from databases import Database
 from loguru import logger
 
-from modules.users.permissions import verify_permissions
+from modules.users.permissions import get_permission_registry
 from modules.users.roles.role_exceptions import RoleExceptions
 from modules.users.roles.role_repositories import RoleRepository
 from modules.users.roles.role_schemas import (
     RoleIn,
-    RoleOut,
     RoleUpdate,
     RoleUpdateActive,
 )
 from modules.users.users.user_repositories import UserRepository
 from modules.users.users.user_schemas import UserInDB
 from shared.core.config import API_PREFIX
+from shared.utils.export_stream import EXPORT_MEDIA_TYPES, export_response
 from shared.utils.service_result import ServiceResult
-from shared.utils.short_pagination import short_pagination
+from shared.utils.short_pagination import sql_pagination
 from shared.utils.verify_uuid import is_valid_uuid
 
 
@@ -31,17 +31,14 @@ class RoleService:
             logger.error("Try to create a rol with no permissions")
             return ServiceResult(RoleExceptions.RolePermissionsException())
 
-        for permission in role.permissions:
-            if not await verify_permissions(permission):
-                logger.error("Invalid permission name in permissions")
-                return ServiceResult(RoleExceptions.PermissionNameException())
+        if not get_permission_registry().names.issuperset(role.permissions):
+            logger.error("Invalid permission name in permissions")
+            return ServiceResult(RoleExceptions.PermissionNameException())
 
-        role_in_db = await RoleRepository(db).get_role_by_name(role.role)
-        if role_in_db:
-            logger.error("El nombre de rol ({role.role}) ya ha sido usado")
-            return ServiceResult(RoleExceptions.RoleAlreadyExistsExcepton())
-
-        role_item = await RoleRepository(db).create_role(role)
+        try:
+            role_item = await RoleRepository(db).create_role(role)
+        except RoleExceptions.RoleAlreadyExistsExcepton as e:
+            return ServiceResult(e)
 
         if not role_item:
             logger.error("Error in DB creating a role")
@@ -58,26 +55,38 @@ class RoleService:
         order: str = None,
         direction: str = None,
     ) -> ServiceResult:
-        roles = await RoleRepository(db).get_roles_list(search, order, direction)
+        roles, total = await RoleRepository(db).get_roles_list(
+            search, order, direction, page_num=page_num, page_size=page_size
+        )
 
         service_result = None
-        if len(roles) == 0:
+        if total == 0:
             logger.info("La lista de roles solicitada está vacía")
             roles_list = []
             service_result = ServiceResult(roles_list)
             service_result.status_code = 204
         else:
-            roles_list = [RoleOut(**item.dict()) for item in roles]
-            response = short_pagination(
+            response = sql_pagination(
                 page_num=page_num,
                 page_size=page_size,
-                data_list=roles_list,
+                data_list=roles,
+                total=total,
                 route=f"{API_PREFIX}/users/roles/",
             )
             service_result = ServiceResult(response)
 
         return service_result
 
+    async def export_roles(self, db: Database, file_format: str) -> ServiceResult:
+        from modules.users.roles.role_sqlsentences import EXPORT_ROLES_COLUMNS
+
+        if file_format not in EXPORT_MEDIA_TYPES:
+            logger.error(f"Export of roles with an unsupported format: {file_format}")
+            return ServiceResult(RoleExceptions.RoleExportFormatException())
+
+        records = RoleRepository(db).iterate_roles_export()
+        return ServiceResult(export_response(records, file_format, EXPORT_ROLES_COLUMNS, filename="roles"))
+
     async def get_role_by_id(
         self,
         db: Database,
@@ -149,10 +158,10 @@ class RoleService:
         if not is_valid_uuid(id):
             return ServiceResult(RoleExceptions.RoleIdNoValidException())
 
-        if await self.verify_there_are_users_with_role(db=db, role_id=id):
-            return ServiceResult(RoleExceptions.UsersUsingRoleException())
-
-        role_id = await RoleRepository(db).delete_role(id=id)
+        try:
+            role_id = await RoleRepository(db).delete_role(id=id)
+        except RoleExceptions.UsersUsingRoleException as e:
+            return ServiceResult(e)
 
         if isinstance(role_id, dict) and not role_id:
             logger.info("El rol a eliminar no está en base de datos")
@@ -1,28 +1,35 @@
 def role_list_sort(order: str | None, direction: str | None):
     sql_sentence = ""
     if not order and not direction:
-        sql_sentence = " ORDER BY ro.role ASC;"
+        sql_sentence = " ORDER BY ro.role ASC, ro.id ASC"
     elif order == "role" and direction == "DESC":
-        sql_sentence = " ORDER BY ro.role DESC;"
+        sql_sentence = " ORDER BY ro.role DESC, ro.id DESC"
     elif order == "role" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY ro.role ASC;"
+        sql_sentence = " ORDER BY ro.role ASC, ro.id ASC"
     elif order == "estatus" and direction == "DESC":
-        sql_sentence = " ORDER BY ro.is_active DESC;"
+        sql_sentence = " ORDER BY ro.is_active DESC, ro.id DESC"
     elif order == "estatus" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY ro.is_active ASC;"
+        sql_sentence = " ORDER BY ro.is_active ASC, ro.id ASC"
+    else:
+        # unknown order, pages still need a stable order
+        sql_sentence = " ORDER BY ro.id ASC"
 
     return sql_sentence
 
 
 def role_list_search():
-    return " WHERE LOWER(ro.role) ILIKE :search "
+    return " WHERE ro.role ILIKE :search "
 
 
+# constraints declared by the roles and users migrations
+ROLES_ROLE_UNIQUE = "ix_roles_role"
+USERS_ROLE_ID_FK = "users_role_id_fkey"
+
 CREATE_ROLE_ITEM = """
-    INSERT INTO roles (id, role, permissions, is_active, created_at, updated_at,
-        created_by, updated_by)
-    VALUES(:id, :role, :permissions, :is_active, :created_at, :updated_at,
-        :created_by, :updated_by)
+    INSERT INTO roles (id, role, permissions, permissions_mask, permissions_catalog, is_active,
+        created_at, updated_at, created_by, updated_by)
+    VALUES(:id, :role, :permissions, :permissions_mask, :permissions_catalog, :is_active,
+        :created_at, :updated_at, :created_by, :updated_by)
     RETURNING id, role, permissions, created_by, updated_by;
 """
 
@@ -39,7 +46,7 @@ GET_ROLE_BY_ID = """
 GET_ROLES_LIST = """
     SELECT ro.id, ro.role, ro.permissions, ro.is_active, 
         ro.created_at, us1.fullname AS created_by,
-        ro.updated_at, us2.fullname AS updated_by
+        ro.updated_at, us2.fullname AS updated_by, COUNT(*) OVER() AS total_count
     FROM roles AS ro
     LEFT JOIN users AS us1 ON ro.created_by = us1.id
     LEFT JOIN users AS us2 ON ro.updated_by = us2.id
@@ -48,24 +55,36 @@ GET_ROLES_LIST = """
 GET_ROLES_LIST_FUNCTIONALITY = """
     SELECT ro.id, ro.role, ro.permissions, ro.is_active, 
         ro.created_at, us1.fullname AS created_by,
-        ro.updated_at, us2.fullname AS updated_by
+        ro.updated_at, us2.fullname AS updated_by, COUNT(*) OVER() AS total_count
     FROM roles AS ro
     LEFT JOIN users AS us1 ON ro.created_by = us1.id
     LEFT JOIN users AS us2 ON ro.updated_by = us2.id
-    WHERE :permit LIKE ANY(ro.permissions)
+    WHERE ro.permissions && CAST(:permits AS VARCHAR[])
+"""
+
+# the whole table, read with a server side cursor
+EXPORT_ROLES = """
+    SELECT ro.id, ro.role, ro.permissions, ro.is_active, ro.created_at, ro.updated_at
+    FROM roles AS ro
 """
+# csv header of EXPORT_ROLES, in the order of its SELECT
+EXPORT_ROLES_COLUMNS = ("id", "role", "permissions", "is_active", "created_at", "updated_at")
+
 
 UPDATE_ROLE_BY_ID = """
     UPDATE roles
     SET role        = :role,
         permissions = :permissions,
+        permissions_mask = :permissions_mask,
+        permissions_catalog = :permissions_catalog,
         created_at  = :created_at,
         created_by  = :created_by,
         updated_by  = :updated_by,
         updated_at  = :updated_at,
-        is_active   = :is_active
+        is_active   = :is_active,
+        version     = version + 1
     WHERE id = :id
-    RETURNING id, role, permissions, is_active, created_by, updated_by;
+    RETURNING id, role, permissions, is_active, version, created_by, updated_by;
 """
 
 DELETE_ROLE_BY_ID = """
@@ -73,3 +92,23 @@ DELETE_ROLE_BY_ID = """
     WHERE id = :id
     RETURNING id
 """
+
+SYNC_ROLES_PERMISSIONS_MASK = """
+    WITH masks AS (
+        SELECT ro.id,
+            COALESCE(BIT_OR(1::BIGINT << (ca.position - 1)::INTEGER), 0) AS mask
+        FROM roles AS ro
+        LEFT JOIN UNNEST(CAST(:catalog AS VARCHAR[])) WITH ORDINALITY AS ca(name, position)
+            ON ca.name = ANY(ro.permissions)
+        GROUP BY ro.id
+    )
+    UPDATE roles
+    SET permissions_mask    = masks.mask,
+        permissions_catalog = :fingerprint,
+        version             = roles.version + 1
+    FROM masks
+    WHERE roles.id = masks.id
+        AND (roles.permissions_mask <> masks.mask
+            OR roles.permissions_catalog IS DISTINCT FROM :fingerprint)
+    RETURNING roles.id;
+"""
@@ -134,3 +134,23 @@ class UserExceptions:
             status_code = 409
             msg = "No puede cambiar el password de otro usuario"
             AppExceptionCase.__init__(self, status_code, msg)
+
+    class UserExportFormatException(AppExceptionCase):
+        """_
+        Users export with an unsupported format
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = "Formato de exportación no soportado, use csv o ndjson"
+            AppExceptionCase.__init__(self, status_code, msg)
+
+    class UserInvalidFieldsException(AppExceptionCase):
+        """_
+        User fields parameter with unknown fields
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 422
+            msg = f"Campos desconocidos en fields: {msg}"
+            AppExceptionCase.__init__(self, status_code, msg)
@@ -1,14 +1,39 @@
 from datetime import datetime
-from typing import List, Type
+from typing import AsyncGenerator, Dict, List, Tuple, Type
 from uuid import UUID
 
+from asyncpg.exceptions import ForeignKeyViolationError, UniqueViolationError
 from databases import Database
 from icecream import ic
 from loguru import logger
 from modules.users.users.user_exceptions import UserExceptions
-from modules.users.users.user_schemas import UserIn, UserInDB, UserUpdateDB
+from modules.users.users.user_schemas import (
+    UserIn,
+    UserInDB,
+    UserOut,
+    UserPublic,
+    UserTokenState,
+    UserUpdateDB,
+)
+from shared.core.config import EXPORT_BATCH_ROWS
+from shared.core.db import db_statements
+from shared.core.db.db_replicas import primary_database
+from shared.utils.entity_cache import entity_cache
 from shared.utils.record_to_dict import record_to_dict
 from shared.utils.repositories_base import BaseRepository
+from shared.utils.repository_utils import (
+    fetch_page,
+    from_record,
+    iterate_records,
+    parse_fields,
+    projection,
+    update_set_clause,
+)
+
+# public data of the users by id, UserInDB has the credentials and is not cached
+user_cache = entity_cache("users", UserPublic)
+# active flag and token version by id, checked by every stateless token
+user_token_cache = entity_cache("user_tokens", UserTokenState)
 
 
 class UserRepository(BaseRepository):
@@ -21,56 +46,110 @@ class UserRepository(BaseRepository):
         return UserIn
 
     async def create_user(self, user: UserIn) -> UserInDB:
-        from modules.users.users.user_sqlstaments import CREATE_USER_ITEM
+        from modules.users.users.user_sqlstaments import (
+            CREATE_USER_ITEM,
+            USERS_EMAIL_UNIQUE,
+            USERS_ROLE_ID_FK,
+            USERS_USERNAME_UNIQUE,
+        )
 
         values = self.preprocess_create(user.dict())
-        record = await self.db.fetch_one(query=CREATE_USER_ITEM, values=values)
+        try:
+            record = await self.db.fetch_one(query=CREATE_USER_ITEM, values=values)
+        except UniqueViolationError as e:
+            if e.constraint_name == USERS_EMAIL_UNIQUE:
+                logger.error(f"Try to create a User with an existing email: {user.email}")
+                raise UserExceptions.UserEmailAlreadyExistsExeption()
+            if e.constraint_name == USERS_USERNAME_UNIQUE:
+                logger.error(f"Try to create a User with an existing username: {user.username}")
+                raise UserExceptions.UserUsernameAlreadyExistsExeption()
+            raise
+        except ForeignKeyViolationError as e:
+            if e.constraint_name != USERS_ROLE_ID_FK:
+                raise
+            logger.error(f"Try to create a User with a non existing role: {user.role_id}")
+            raise UserExceptions.UserWithNoRoleException()
 
-        result = record_to_dict(record)
+        if not record:
+            return None
 
-        return self._schema_out(**result)
+        await self._invalidate_user(record["id"])
+        return self._from_record(record)
 
     async def get_user_by_email(self, email: str) -> UserInDB:
         from modules.users.users.user_sqlstaments import GET_USER_BY_EMAIL
 
         values = {"email": email}
-        record = await self.db.fetch_one(query=GET_USER_BY_EMAIL, values=values)
+        record = await db_statements.fetch_one(self.db, GET_USER_BY_EMAIL, values)
 
         if not record:
             return None
 
-        return self._schema_out(**dict(record))
+        return self._from_record(record)
 
     async def get_user_by_username(self, username: str) -> UserInDB:
         from modules.users.users.user_sqlstaments import GET_USER_BY_USERNAME
 
         values = {"username": username}
-        record = await self.db.fetch_one(query=GET_USER_BY_USERNAME, values=values)
+        record = await db_statements.fetch_one(self.db, GET_USER_BY_USERNAME, values)
 
         if not record:
             return None
 
-        return self._schema_out(**dict(record))
+        return self._from_record(record)
 
     async def get_user_by_id(self, id: UUID) -> UserInDB | dict:
         from modules.users.users.user_sqlstaments import GET_USER_BY_ID
 
         values = {"id": id}
-        record = await self.db.fetch_one(query=GET_USER_BY_ID, values=values)
+        record = await db_statements.fetch_one(self.db, GET_USER_BY_ID, values)
         if not record:
             return {}
 
-        user_in_db = record_to_dict(record)
-        return self._schema_out(**user_in_db)
+        return self._from_record(record)
+
+    async def get_user_public_by_id(self, id: UUID, fields: str | None = None) -> UserPublic | dict:
+        from modules.users.users.user_sqlstaments import GET_USER_PUBLIC_BY_ID, USER_PUBLIC_COLUMNS
+
+        selected = parse_fields(fields, USER_PUBLIC_COLUMNS)
+        sql_sentence = GET_USER_PUBLIC_BY_ID.format(**projection(USER_PUBLIC_COLUMNS, selected))
+        if selected is None:
+            # from the primary, a lagging replica would cache an old row
+            return await user_cache.get_or_load(
+                id, lambda: db_statements.fetch_one(primary_database(self.db), sql_sentence, {"id": id})
+            )
+
+        record = await self.db.fetch_one(query=sql_sentence, values={"id": id})
+        if not record:
+            return {}
+
+        return dict(record)
+
+    async def get_user_token_state(self, id: UUID) -> UserTokenState | dict:
+        from modules.users.users.user_sqlstaments import GET_USER_TOKEN_STATE
+
+        # from the primary, a lagging replica would cache an old row
+        return await user_token_cache.get_or_load(
+            id, lambda: db_statements.fetch_one(primary_database(self.db), GET_USER_TOKEN_STATE, {"id": id})
+        )
+
+    async def _invalidate_user(self, id: UUID) -> None:
+        await user_cache.invalidate(id, db=self.db)
+        await user_token_cache.invalidate(id, db=self.db)
 
     async def get_users_list(
         self,
         search: str | None,
         order: str | None,
         direction: str | None,
-    ) -> List[UserInDB]:
+        page_num: int = 1,
+        page_size: int = 10,
+        fields: str | None = None,
+    ) -> Tuple[List[UserOut] | List[Dict], int]:
         from modules.users.users.user_sqlstaments import (
             GET_USERS_LIST,
+            USERS_LIST_COLUMNS,
+            USERS_LIST_JOINS,
             user_list_complements,
             user_list_search,
         )
@@ -81,21 +160,28 @@ class UserRepository(BaseRepository):
         sql_sentence = user_list_complements(order, direction)
         sql_search = user_list_search()
 
+        # only the asked fields are read, with no fields every column is
+        selected = parse_fields(fields, USERS_LIST_COLUMNS)
+        with_role = bool(search) or order in ("rol", "status")
+        sql_list = GET_USERS_LIST.format(
+            **projection(
+                USERS_LIST_COLUMNS, selected, USERS_LIST_JOINS, with_joins=["role"] if with_role else []
+            )
+        )
+
         if not search:
-            sql_sentence = GET_USERS_LIST + sql_sentence
+            sql_sentence = sql_list + sql_sentence
         else:
-            sql_sentence = GET_USERS_LIST + sql_search + sql_sentence
+            sql_sentence = sql_list + sql_search + sql_sentence
             values["search"] = "%" + search + "%"
 
-        records = await self.db.fetch_all(query=sql_sentence, values=values)
-
-        if len(records) == 0:
-            return []
-
-        if not records:
-            return None
+        records, total = await fetch_page(
+            self.db, query=sql_sentence, values=values, page_num=page_num, page_size=page_size
+        )
 
-        return [self._schema_out(**dict(record)) for record in records]
+        if selected is not None:
+            return records, total
+        return [from_record(UserOut, record) for record in records], total
 
     async def update_user(
         self,
@@ -106,43 +192,46 @@ class UserRepository(BaseRepository):
     ) -> UserInDB | dict:
         from modules.users.users.user_sqlstaments import UPDATE_USER_BY_ID
 
-        user = await self.get_user_by_id(id=id)
-        if not user:
-            return {}
-
-        user_update_params = user.copy(update=user_update.dict(exclude_unset=True))
-
-        user_params_dict = user_update_params.dict()
-        user_params_dict.pop("role")
-        user_params_dict.pop("permissions")
-        user_params_dict["updated_by"] = updated_by_id
-        user_params_dict["updated_at"] = self._preprocess_date()
-        if len(credentials) > 0:
+        # the password is only written hashed, from credentials
+        user_params_dict = user_update.dict(exclude_unset=True, exclude={"password", "salt"})
+        if credentials:
             user_params_dict["password"] = credentials.get("password")
             user_params_dict["salt"] = credentials.get("salt")
+        user_params_dict["updated_by"] = updated_by_id
+        user_params_dict["updated_at"] = self._preprocess_date()
+        sql_sentence = UPDATE_USER_BY_ID.format(set_clause=update_set_clause(user_params_dict))
+        user_params_dict["id"] = id
 
         try:
-            record = await self.db.fetch_one(query=UPDATE_USER_BY_ID, values=user_params_dict)
-            user_updated = record_to_dict(record)
-            return await self.get_user_by_id(id=user_updated.get("id"))
+            record = await self.db.fetch_one(query=sql_sentence, values=user_params_dict)
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar un usuario: {e}")
             raise UserExceptions.UserInvalidUpdateParamsException()
 
+        if not record:
+            return {}
+
+        await self._invalidate_user(id)
+        return self._from_record(record)
+
     async def delete_user(
         self,
         id: UUID,
     ) -> str | dict:
         from modules.users.users.user_sqlstaments import DELETE_USER_BY_ID
 
-        user = await self.get_user_by_id(id=id)
-        if not user:
-            return {}
-
         deleted_id = await self.db.execute(query=DELETE_USER_BY_ID, values={"id": id})
+        if not deleted_id:
+            return {}
 
+        await self._invalidate_user(id)
         return deleted_id
 
+    def iterate_users_export(self) -> AsyncGenerator[Dict, None]:
+        from modules.users.users.user_sqlstaments import EXPORT_USERS
+
+        return iterate_records(self.db, EXPORT_USERS, prefetch=EXPORT_BATCH_ROWS)
+
     async def get_users_by_role_id(self, role_id: UUID) -> List | dict:
         from modules.users.users.user_sqlstaments import GET_USERS_LIST_BY_ROLE_ID
 
@@ -158,7 +247,7 @@ class UserRepository(BaseRepository):
         users = [dict(record) for record in records]
         logger.debug(f"los usuarios son: {users}")
 
-        return [self._schema_out(**dict(record)) for record in records]
+        return [self._from_record(record) for record in records]
 
     async def change_password_by_id(
         self,
@@ -188,11 +277,16 @@ class UserRepository(BaseRepository):
         user_params_dict.pop("role_id")
         user_params_dict.pop("role")
         user_params_dict.pop("permissions")
+        user_params_dict.pop("role_version")
+        user_params_dict.pop("permissions_mask")
+        user_params_dict.pop("permissions_catalog")
+        user_params_dict.pop("token_version")
         user_params_dict.pop("username")
 
         try:
             record = await self.db.fetch_one(query=UPDATE_PSW_BY_ID, values=user_params_dict)
             user_updated = record_to_dict(record)
+            await self._invalidate_user(id)
             return await self.get_user_by_id(id=user_updated.get("id"))
         except Exception as e:
             logger.error(f"Datos inválidos para actualizar el password del usuario: {e}")
@@ -1,8 +1,8 @@
-from typing import Dict
 from uuid import UUID
 
 from databases import Database
-from fastapi import APIRouter, Body, Depends, Path, status
+from fastapi import APIRouter, Body, Depends, Path, Query, status
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from modules.users.auths.auth_dependencies import get_current_active_user
 from modules.users.auths.auth_exceptions import AuthExceptions
@@ -13,16 +13,25 @@ from modules.users.users.user_schemas import (
     UserOut,
     UserPasswordUpdate,
     UserPublic,
+    UserPublicFields,
     UserToSave,
     UserUpdate,
 )
 from modules.users.users.user_services import UserService
-from shared.core.db.db_dependencies import get_database
-from shared.utils.service_result import ServiceResult, handle_result
+from shared.core.db.db_dependencies import (
+    UnitOfWorkRoute,
+    get_database,
+    get_database_unpinned,
+    get_read_database,
+    without_unit_of_work,
+)
+from shared.utils.schemas_base import Page
+from shared.utils.service_result import ServiceResult, handle_json_result, handle_result
 from shared.utils.verify_auth import is_authorized
 
 router = APIRouter(
     responses={404: {"description": "Not found"}},
+    route_class=UnitOfWorkRoute,
 )
 
 
@@ -32,9 +41,11 @@ router = APIRouter(
     name="users:create-user",
     status_code=status.HTTP_201_CREATED,
 )
+# the password is hashed before the insert, with no connection or transaction held
+@without_unit_of_work
 async def create_user(
     user: UserCreate = Body(..., embed=True),
-    db: Database = Depends(get_database),
+    db: Database = Depends(get_database_unpinned),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "users:create-user"):
@@ -48,27 +59,52 @@ async def create_user(
     return handle_result(result)
 
 
-@router.get("/{id}", response_model=UserPublic, name="users:get-user-by-id")
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    name="users:export-users",
+    status_code=status.HTTP_200_OK,
+)
+async def export_users(
+    file_format: str = Query("csv", alias="format"),
+    db: Database = Depends(get_read_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+):
+    if not is_authorized(current_user, "users:export-users"):
+        return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
+
+    result = await UserService(db).export_users(file_format)
+    return handle_result(result)
+
+
+@router.get(
+    "/{id}",
+    response_model=UserPublicFields,
+    response_model_exclude_unset=True,
+    name="users:get-user-by-id",
+)
 async def get_user_by_id(
     id: UUID = Path(..., title="The id of the user to get"),
-    db: Database = Depends(get_database),
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "users:get-user-by-id"):
         return handle_result(ServiceResult(AuthExceptions.AuthUnauthorizedException()))
 
-    result = await UserService(db).get_user_by_id(id=id)
-    return handle_result(result)
+    result = await UserService(db).get_user_by_id(id=id, fields=fields)
+    return handle_json_result(result)
 
 
-@router.get("/", response_model=Dict, name="users:users_list", status_code=status.HTTP_200_OK)
+@router.get("/", response_model=Page[UserOut], name="users:users_list", status_code=status.HTTP_200_OK)
 async def get_users_list(
     search: str | None = None,
-    page_number: int = 1,
-    page_size: int = 10,
+    page_number: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1),
     order: str = "",
     direction: str = "",
-    db: Database = Depends(get_database),
+    fields: str | None = Query(None, description="Campos a devolver separados por coma, el id siempre se incluye"),
+    db: Database = Depends(get_read_database),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     if not is_authorized(current_user, "users:users_list"):
@@ -80,8 +116,9 @@ async def get_users_list(
         page_size=page_size,
         order=order,
         direction=direction,
+        fields=fields,
     )
-    return handle_result(result)
+    return handle_json_result(result)
 
 
 @router.put("/{id}", response_model=UserPublic, name="users:update-user-by-id")
@@ -130,10 +167,11 @@ async def delete_user_by_id(
 
 
 @router.put("/change_password/{id}", response_model=UserPublic, name="users:change-password-by-id")
+@without_unit_of_work
 async def change_password_by_id(
     id: UUID = Path(..., title="The id of the user to update"),
     psw_update: str = Body(..., embed=True),
-    db: Database = Depends(get_database),
+    db: Database = Depends(get_database_unpinned),
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> ServiceResult:
     """
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List
 from uuid import UUID
 
@@ -40,6 +41,10 @@ class UserInDB(IDModelMixin, DateTimeModelMixin):
     role_id: UUID
     role: str | None
     permissions: List | None
+    role_version: int | None
+    permissions_mask: int | None
+    permissions_catalog: str | None
+    token_version: int | None
     created_by: UUID | str | None
     updated_by: UUID | str | None
 
@@ -81,6 +86,24 @@ class UserPublic(IDModelMixin, DateTimeModelMixin):
     is_superadmin: bool
 
 
+# what a stateless token is checked against, the version changes with the user
+class UserTokenState(IDModelMixin, BaseSchema):
+    is_active: bool
+    token_version: int
+
+
+# UserPublic with only the fields asked for with ?fields=
+class UserPublicFields(IDModelMixin, BaseSchema):
+    fullname: str | None
+    username: str | None
+    email: EmailStr | None
+    role_id: UUID | None
+    is_active: bool | None
+    is_superadmin: bool | None
+    created_at: datetime | None
+    updated_at: datetime | None
+
+
 class UserUpdate(UserBase):
     password: constr(min_length=7, max_length=80) | None
 
@@ -4,15 +4,14 @@ from uuid import UUID
 from databases import Database
 from icecream import ic
 from loguru import logger
+from modules.users.auths.auth_cache import invalidate_principal
 from modules.users.auths.auth_services import AuthService
-from modules.users.roles.role_repositories import RoleRepository
 from modules.users.users.user_exceptions import UserExceptions
 from modules.users.users.user_repositories import UserRepository
 from modules.users.users.user_schemas import (
     UserActivate,
     UserIn,
     UserInDB,
-    UserOut,
     UserPublic,
     UserToSave,
     UserUpdate,
@@ -20,8 +19,10 @@ from modules.users.users.user_schemas import (
 )
 from passlib.context import CryptContext
 from shared.core.config import API_PREFIX
+from shared.utils.export_stream import EXPORT_MEDIA_TYPES, export_response
+from shared.utils.repository_utils import UnknownFieldsError
 from shared.utils.service_result import ServiceResult
-from shared.utils.short_pagination import short_pagination
+from shared.utils.short_pagination import sql_pagination
 from shared.utils.verify_uuid import is_valid_uuid
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -55,16 +56,7 @@ class UserService:
 
         user_repo = UserRepository(self.db)
 
-        # validates iis not existing in db
-        if await user_repo.get_user_by_email(user.email):
-            logger.error(f"Try to create a User with an existing email: {user.email}")
-            return ServiceResult(UserExceptions.UserEmailAlreadyExistsExeption())
-
-        if await user_repo.get_user_by_username(user.username):
-            logger.error(f"Try to create a User with an existing username: {user.username}")
-            return ServiceResult(UserExceptions.UserUsernameAlreadyExistsExeption())
-
-        user_password_update = AuthService().create_salt_and_hashedpassword(
+        user_password_update = await AuthService().create_salt_and_hashedpassword_async(
             plaintext_password=user.password
         )
         user.password = user_password_update.password
@@ -72,18 +64,19 @@ class UserService:
 
         user.username = user.username.lower()
 
-        user_item = await user_repo.create_user(user)
+        try:
+            user_item = await user_repo.create_user(user)
+        except (
+            UserExceptions.UserEmailAlreadyExistsExeption,
+            UserExceptions.UserUsernameAlreadyExistsExeption,
+            UserExceptions.UserWithNoRoleException,
+        ) as e:
+            return ServiceResult(e)
+
         if not user_item:
             logger.error("Error in DB creating a user")
             return ServiceResult(UserExceptions.UserCreateExcepton())
 
-        role_repo = RoleRepository(db=self.db)
-        role = await role_repo.get_role_by_id(user_item.id)
-        if not role:
-            user_item.role = None
-        else:
-            user_item.role = role.role
-
         return ServiceResult(user_item)
 
     async def get_users_list(
@@ -93,35 +86,55 @@ class UserService:
         page_size: int = 10,
         order: str = None,
         direction: str = None,
+        fields: str | None = None,
     ) -> ServiceResult:
-        users = await UserRepository(self.db).get_users_list(search, order, direction)
+        try:
+            users, total = await UserRepository(self.db).get_users_list(
+                search, order, direction, page_num=page_num, page_size=page_size, fields=fields
+            )
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(UserExceptions.UserInvalidFieldsException(str(e)))
 
         service_result = None
-        if len(users) == 0:
+        if total == 0:
             users_list = []
             service_result = ServiceResult(users_list)
             service_result.status_code = 204
         else:
-            users_list = [UserOut(**item.dict()) for item in users]
-            response = short_pagination(
+            response = sql_pagination(
                 page_num=page_num,
                 page_size=page_size,
-                data_list=users_list,
+                data_list=users,
+                total=total,
                 route=f"{API_PREFIX}/users",
             )
             service_result = ServiceResult(response)
 
         return service_result
 
-    async def get_user_by_id(self, id: UUID) -> ServiceResult:
-        user = await UserRepository(self.db).get_user_by_id(id=id)
+    async def export_users(self, file_format: str) -> ServiceResult:
+        from modules.users.users.user_sqlstaments import EXPORT_USERS_COLUMNS
+
+        if file_format not in EXPORT_MEDIA_TYPES:
+            logger.error(f"Export of users with an unsupported format: {file_format}")
+            return ServiceResult(UserExceptions.UserExportFormatException())
+
+        records = UserRepository(self.db).iterate_users_export()
+        return ServiceResult(export_response(records, file_format, EXPORT_USERS_COLUMNS, filename="users"))
+
+    async def get_user_by_id(self, id: UUID, fields: str | None = None) -> ServiceResult:
+        try:
+            user = await UserRepository(self.db).get_user_public_by_id(id=id, fields=fields)
+        except UnknownFieldsError as e:
+            logger.error(f"Se produjo un error: {e}")
+            return ServiceResult(UserExceptions.UserInvalidFieldsException(str(e)))
 
         if isinstance(user, dict) and not user.get("id"):
             logger.info("El usuario solicitado no está en base de datos")
             return ServiceResult(UserExceptions.UserNotFoundException())
 
-        user_public = UserPublic(**user.dict())
-        return ServiceResult(user_public)
+        return ServiceResult(user)
 
     async def update_user(
         self, id: UUID, user_update: UserUpdate, current_user: UserInDB
@@ -132,7 +145,7 @@ class UserService:
         credentials = {}
         try:
             if user_update.password:
-                user_password_update = AuthService().create_salt_and_hashedpassword(
+                user_password_update = await AuthService().create_salt_and_hashedpassword_async(
                     plaintext_password=user_update.password
                 )
                 credentials["password"] = user_password_update.password
@@ -149,6 +162,7 @@ class UserService:
                 logger.info("El usuario a actualizar no está en base de datos")
                 return ServiceResult(UserExceptions.UserNotFoundException())
 
+            invalidate_principal(id)
             user_public = UserPublic(**user.dict())
             return ServiceResult(user_public)
 
@@ -173,6 +187,7 @@ class UserService:
             logger.info("El usuario a activar / desactivar no está en base de datos")
             return ServiceResult(UserExceptions.UserNotFoundException())
 
+        invalidate_principal(id)
         user_public = UserPublic(**user.dict())
         return ServiceResult(user_public)
 
@@ -189,6 +204,7 @@ class UserService:
             logger.info("El usuario a eliminar no está en base de datos")
             return ServiceResult(UserExceptions.UserNotFoundException())
 
+        invalidate_principal(id)
         return ServiceResult(user_id)
 
     async def change_password_by_id(
@@ -199,7 +215,7 @@ class UserService:
 
         credentials = {}
         try:
-            user_password_update = AuthService().create_salt_and_hashedpassword(
+            user_password_update = await AuthService().create_salt_and_hashedpassword_async(
                 plaintext_password=psw_update
             )
             credentials["password"] = user_password_update.password
@@ -214,6 +230,7 @@ class UserService:
                 logger.info("El usuario a actualizar no está en base de datos")
                 return ServiceResult(UserExceptions.UserNotFoundException())
 
+            invalidate_principal(id)
             user_public = UserPublic(**user.dict())
             return ServiceResult(user_public)
 
@@ -1,49 +1,64 @@
 def user_list_complements(order: str | None, direction: str | None):
     sql_sentence = ""
     if not order and not direction:
-        sql_sentence = " ORDER BY us.username ASC;"
+        sql_sentence = " ORDER BY us.username ASC, us.id ASC"
     elif order == "fullname" and direction == "DESC":
-        sql_sentence = " ORDER BY us.fullname DESC;"
+        sql_sentence = " ORDER BY us.fullname DESC, us.id DESC"
     elif order == "fullname" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY us.fullname ASC;"
+        sql_sentence = " ORDER BY us.fullname ASC, us.id ASC"
     elif order == "username" and direction == "DESC":
-        sql_sentence = " ORDER BY us.username DESC;"
+        sql_sentence = " ORDER BY us.username DESC, us.id DESC"
     elif order == "username" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY us.username ASC;"
+        sql_sentence = " ORDER BY us.username ASC, us.id ASC"
     elif order == "email" and direction == "DESC":
-        sql_sentence = " ORDER BY us.email DESC;"
+        sql_sentence = " ORDER BY us.email DESC, us.id DESC"
     elif order == "email" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY us.email ASC;"
+        sql_sentence = " ORDER BY us.email ASC, us.id ASC"
     elif order == "rol" and direction == "DESC":
-        sql_sentence = " ORDER BY ro.role DESC;"
+        sql_sentence = " ORDER BY ro.role DESC, us.id DESC"
     elif order == "rol" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY ro.role ASC;"
+        sql_sentence = " ORDER BY ro.role ASC, us.id ASC"
     elif order == "status" and direction == "DESC":
-        sql_sentence = " ORDER BY ro.is_active DESC;"
+        sql_sentence = " ORDER BY ro.is_active DESC, us.id DESC"
     elif order == "status" and (direction == "ASC" or direction == None):
-        sql_sentence = " ORDER BY ro.is_active ASC;"
+        sql_sentence = " ORDER BY ro.is_active ASC, us.id ASC"
+    else:
+        # unknown order, pages still need a stable order
+        sql_sentence = " ORDER BY us.id ASC"
 
     return sql_sentence
 
 
 def user_list_search():
-    return """ WHERE (us.fullname LIKE :search 
+    return """ WHERE (us.fullname ILIKE :search 
         or us.username ILIKE :search 
         or ro.role ILIKE :search
         or us.email ILIKE :search) """
 
 
+# constraints declared by the users migration, used to translate violations
+USERS_EMAIL_UNIQUE = "ix_users_email"
+USERS_USERNAME_UNIQUE = "ix_users_username"
+USERS_ROLE_ID_FK = "users_role_id_fkey"
+
 CREATE_USER_ITEM = """
-    INSERT INTO users (id, fullname, username, password, email, is_superadmin, role_id,
-        is_active, created_by, created_at, updated_by, updated_at, salt)
-    VALUES(:id, :fullname, :username, :password, :email, :is_superadmin, :role_id,
-        :is_active, :created_by, :created_at, :updated_by, :updated_at, :salt)
-    RETURNING id, fullname, username, email, is_superadmin, is_active, role_id, password, salt;
+    WITH us AS (
+        INSERT INTO users (id, fullname, username, password, email, is_superadmin, role_id,
+            is_active, created_by, created_at, updated_by, updated_at, salt)
+        VALUES(:id, :fullname, :username, :password, :email, :is_superadmin, :role_id,
+            :is_active, :created_by, :created_at, :updated_by, :updated_at, :salt)
+        RETURNING id, fullname, username, email, is_superadmin, is_active, role_id, password, salt
+    )
+    SELECT us.id, us.fullname, us.username, us.email, us.is_superadmin, us.is_active,
+        us.role_id, us.password, us.salt, ro.role, ro.permissions
+    FROM us
+    INNER JOIN roles as ro ON us.role_id = ro.id;
 """
 
 GET_USER_BY_EMAIL = """
     SELECT us.id, us.fullname, us.username, us.password, us.salt, us.email, us.is_active, 
-        us.is_superadmin, us.role_id,ro.role, ro.permissions
+        us.is_superadmin, us.role_id,ro.role, ro.permissions, ro.version AS role_version,
+        ro.permissions_mask, ro.permissions_catalog, us.token_version
     FROM users AS us
     INNER JOIN roles as ro ON us.role_id = ro.id
     WHERE email = :email;
@@ -51,7 +66,8 @@ GET_USER_BY_EMAIL = """
 
 GET_USER_BY_USERNAME = """
     SELECT us.id, us.fullname, us.username, us.password, us.salt, us.email, us.is_active, 
-        us.is_superadmin, us.role_id,ro.role, ro.permissions
+        us.is_superadmin, us.role_id,ro.role, ro.permissions, ro.version AS role_version,
+        ro.permissions_mask, ro.permissions_catalog, us.token_version
     FROM users AS us 
     INNER JOIN roles as ro ON us.role_id = ro.id
     WHERE username = :username;
@@ -59,20 +75,67 @@ GET_USER_BY_USERNAME = """
 
 GET_USER_BY_ID = """
     SELECT us.id, us.fullname, us.username, us.password, us.salt, us.email, us.is_active, 
-        us.is_superadmin, us.role_id,ro.role, ro.permissions
+        us.is_superadmin, us.role_id,ro.role, ro.permissions, ro.version AS role_version,
+        ro.permissions_mask, ro.permissions_catalog, us.token_version
     FROM users AS us 
     INNER JOIN roles as ro ON us.role_id = ro.id
     WHERE us.id = :id; 
 """
 
+# field -> column of GET_USERS_LIST, the fields ?fields= can ask for
+USERS_LIST_COLUMNS = {
+    "id": "us.id",
+    "fullname": "us.fullname",
+    "username": "us.username",
+    "email": "us.email",
+    "role": "ro.role",
+    "role_id": "us.role_id",
+    "is_active": "us.is_active",
+    "created_by": "us1.fullname AS created_by",
+    "updated_by": "us2.fullname AS updated_by",
+}
+
+# joins of GET_USERS_LIST, only added when their field is selected, the
+# search and the "rol" / "status" orders need the role too
+USERS_LIST_JOINS = {
+    "role": "INNER JOIN roles AS ro ON us.role_id = ro.id",
+    "created_by": "LEFT JOIN users AS us1 ON us1.id = us.created_by",
+    "updated_by": "LEFT JOIN users AS us2 ON us2.id = us.updated_by",
+}
+
+# select and joins are built with projection, no credentials are listed
 GET_USERS_LIST = """
-    SELECT us.id, us.fullname, us.username, us.password, us.salt, us.email, us.is_superadmin, 
-        us.is_active, us.role_id, ro.role, ro.permissions, us1.fullname AS created_by, 
-        us2.fullname AS updated_by
+    SELECT {select},
+        COUNT(*) OVER() AS total_count
+    FROM users AS us
+    {joins}
+"""
+
+# field -> column of GET_USER_PUBLIC_BY_ID
+USER_PUBLIC_COLUMNS = {
+    "id": "us.id",
+    "fullname": "us.fullname",
+    "username": "us.username",
+    "email": "us.email",
+    "role_id": "us.role_id",
+    "is_active": "us.is_active",
+    "is_superadmin": "us.is_superadmin",
+    "created_at": "us.created_at",
+    "updated_at": "us.updated_at",
+}
+
+# the user as the API shows it, GET_USER_BY_ID is for the auth and updates
+GET_USER_PUBLIC_BY_ID = """
+    SELECT {select}
+    FROM users AS us
+    WHERE us.id = :id;
+"""
+
+# stateless tokens are checked against it, see AuthService.get_user_from_claims
+GET_USER_TOKEN_STATE = """
+    SELECT us.id, us.is_active, us.token_version
     FROM users AS us
-    INNER JOIN roles AS ro ON us.role_id = ro.id
-    LEFT JOIN users AS us1 ON us1.id = us.created_by
-    LEFT JOIN users AS us2 ON us2.id = us.updated_by
+    WHERE us.id = :id;
 """
 
 GET_USERS_LIST_BY_ROLE_ID = """
@@ -81,22 +144,32 @@ GET_USERS_LIST_BY_ROLE_ID = """
     WHERE us.role_id = :role_id
 """
 
+# the whole table without credentials, read with a server side cursor
+EXPORT_USERS = """
+    SELECT us.id, us.fullname, us.username, us.email, us.is_superadmin, us.is_active,
+        ro.role, us.created_at, us.updated_at
+    FROM users AS us
+    INNER JOIN roles as ro ON us.role_id = ro.id
+"""
+# csv header of EXPORT_USERS, in the order of its SELECT
+EXPORT_USERS_COLUMNS = ("id", "fullname", "username", "email", "is_superadmin", "is_active", "role", "created_at", "updated_at")
+
+
+# set_clause is built from the fields sent in the request, the updated row
+# is returned joined with its role like GET_USER_BY_ID
 UPDATE_USER_BY_ID = """
-    UPDATE users
-    SET fullname      = :fullname,
-        username      = :username,
-        email         = :email,
-        password      = :password,
-        role_id       = :role_id,
-        is_superadmin = :is_superadmin,
-        is_active     = :is_active,
-        salt          = :salt,
-        created_by    = :created_by,
-        created_at    = :created_at,
-        updated_by    = :updated_by,
-        updated_at    = :updated_at
-    WHERE id = :id
-    RETURNING id, fullname, username, email, is_superadmin, role_id, password, salt, updated_by;
+    WITH us AS (
+        UPDATE users
+        SET {set_clause}, token_version = token_version + 1
+        WHERE id = :id
+        RETURNING id, fullname, username, password, salt, email, is_active, is_superadmin, role_id,
+            token_version
+    )
+    SELECT us.id, us.fullname, us.username, us.password, us.salt, us.email, us.is_active, 
+        us.is_superadmin, us.role_id, ro.role, ro.permissions, ro.version AS role_version,
+        ro.permissions_mask, ro.permissions_catalog, us.token_version
+    FROM us
+    INNER JOIN roles as ro ON us.role_id = ro.id;
 """
 
 UPDATE_PSW_BY_ID = """
@@ -104,7 +177,8 @@ UPDATE_PSW_BY_ID = """
     SET password      = :password,
         salt          = :salt,
         updated_by    = :updated_by,
-        updated_at    = :updated_at
+        updated_at    = :updated_at,
+        token_version = token_version + 1
     WHERE id = :id
     RETURNING id, password;
 """
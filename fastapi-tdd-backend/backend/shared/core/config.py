@@ -4,7 +4,7 @@ from typing import Optional
 from databases import DatabaseURL
 from pydantic import PostgresDsn
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 config = Config(".env")
 
@@ -35,16 +35,64 @@ ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=int)
 JWT_ALGORITHM = config("JWT_ALGORITHM", cast=str)
 JWT_AUDIENCE = config("JWT_AUDIENCE", cast=str)
 JWT_TOKEN_PREFIX = config("JWT_TOKEN_PREFIX", cast=str)
+# when enabled, access tokens carry role, permissions and status claims so that
+# protected routes can authorize without querying the database
+JWT_STATELESS_AUTH = config("JWT_STATELESS_AUTH", cast=bool, default=False)
+# bcrypt runs in a thread pool, at most PASSWORD_HASH_MAX_CONCURRENCY calls at once
+PASSWORD_HASH_MAX_WORKERS = config("PASSWORD_HASH_MAX_WORKERS", cast=int, default=os.cpu_count() or 1)
+PASSWORD_HASH_MAX_CONCURRENCY = config(
+    "PASSWORD_HASH_MAX_CONCURRENCY", cast=int, default=PASSWORD_HASH_MAX_WORKERS
+)
 AES_KEY = config("AES_KEY", cast=str)
 AES_BLOCKSIZE = config("AES_BLOCKSIZE", cast=int)
 
+# cache of authenticated users used by protected routes
+PRINCIPAL_CACHE_TTL_SECONDS = config("PRINCIPAL_CACHE_TTL_SECONDS", cast=float, default=60)
+PRINCIPAL_CACHE_MAX_SIZE = config("PRINCIPAL_CACHE_MAX_SIZE", cast=int, default=1024)
+
+# read-through cache of rows by id: memory (per worker), redis (shared) or none
+ENTITY_CACHE_BACKEND = config("ENTITY_CACHE_BACKEND", cast=str, default="memory")
+ENTITY_CACHE_REDIS_URL = config("ENTITY_CACHE_REDIS_URL", cast=str, default="redis://localhost:6379/0")
+ENTITY_CACHE_TTL_SECONDS = config("ENTITY_CACHE_TTL_SECONDS", cast=float, default=30)
+# ids answered with 404 are cached for a shorter time
+ENTITY_CACHE_NEGATIVE_TTL_SECONDS = config("ENTITY_CACHE_NEGATIVE_TTL_SECONDS", cast=float, default=5)
+ENTITY_CACHE_MAX_SIZE = config("ENTITY_CACHE_MAX_SIZE", cast=int, default=10000)
+
+# bulk create endpoints: items accepted per request and rows per INSERT statement
+BULK_MAX_ITEMS = config("BULK_MAX_ITEMS", cast=int, default=50000)
+BULK_CHUNK_SIZE = config("BULK_CHUNK_SIZE", cast=int, default=5000)
+# csv / ndjson imports: rows validated and copied per chunk, rejects listed in the answer
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", cast=int, default=5000)
+IMPORT_MAX_REJECTS = config("IMPORT_MAX_REJECTS", cast=int, default=1000)
+# exports: rows serialized per chunk written to the response
+EXPORT_BATCH_ROWS = config("EXPORT_BATCH_ROWS", cast=int, default=500)
+
 DATABASE_URL = config(
     "DATABASE_URL",
     cast=DatabaseURL,
     default=f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}",
 )
 
+# read replicas, comma separated, GET list / by-id / export routes read from them
+DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", cast=CommaSeparatedStrings, default="")
+# a client that wrote reads from the primary during this time
+READ_YOUR_WRITES_SECONDS = config("READ_YOUR_WRITES_SECONDS", cast=float, default=5)
 
-DB_MIN_SIZE: int = 2
-DB_MAX_SIZE: int = 15
+# connection pool
+DB_MIN_SIZE = config("DB_MIN_SIZE", cast=int, default=2)
+DB_MAX_SIZE = config("DB_MAX_SIZE", cast=int, default=15)
+# a connection is replaced after serving DB_MAX_QUERIES queries
+DB_MAX_QUERIES = config("DB_MAX_QUERIES", cast=int, default=50000)
+# idle connections above DB_MIN_SIZE are closed after this time, 0 keeps them
+DB_MAX_IDLE_SECONDS = config("DB_MAX_IDLE_SECONDS", cast=float, default=300)
+# statement_timeout of the connections, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = config("DB_STATEMENT_TIMEOUT_MS", cast=int, default=0)
+# time a request waits for a free connection before it is answered with 503
+DB_ACQUIRE_TIMEOUT_SECONDS = config("DB_ACQUIRE_TIMEOUT_SECONDS", cast=float, default=10)
+# requests that hold their connection longer than this are logged
+DB_HOLD_WARNING_SECONDS = config("DB_HOLD_WARNING_SECONDS", cast=float, default=2)
+# statements each connection keeps prepared, the least used are closed
+DB_PREPARED_STATEMENTS = config("DB_PREPARED_STATEMENTS", cast=int, default=256)
 DB_FORCE_ROLL_BACK: bool = False
+# POST / PUT / PATCH / DELETE routes run in one transaction, see UnitOfWorkRoute
+DB_REQUEST_TRANSACTIONS = config("DB_REQUEST_TRANSACTIONS", cast=bool, default=True)
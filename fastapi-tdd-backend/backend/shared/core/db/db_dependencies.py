@@ -1,7 +1,101 @@
+import contextlib
+import time
+from typing import AsyncIterator, Callable
+
 from databases import Database
-from fastapi import FastAPI
+from fastapi.routing import APIRoute
 from starlette.requests import Request
+from starlette.responses import Response
+
+from shared.core.config import DB_REQUEST_TRANSACTIONS
+from shared.core.db.db_pool import pool_monitor
+from shared.core.db.db_replicas import replica_router
+from shared.utils.entity_cache import evict_again_after_commit
+
+# methods whose route handlers run in one transaction, see UnitOfWorkRoute
+MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+async def get_database(request: Request) -> AsyncIterator[Database]:
+    """_
+        unit of work of a request: every query of the request, through any
+        repository, runs on one connection of the pool, checked out once and
+        returned after the response is sent.
+    """
+    async with _pinned(request, request.app.state._db) as db:
+        yield db
+
+
+async def get_read_database(request: Request) -> AsyncIterator[Database]:
+    """_
+        get_database for the read only routes: a read replica when there are
+        replicas and the client did not write in the last READ_YOUR_WRITES_SECONDS
+    """
+    async with _pinned(request, replica_router.for_read(request, request.app.state._db)) as db:
+        yield db
+
+
+@contextlib.asynccontextmanager
+async def _pinned(request: Request, db: Database) -> AsyncIterator[Database]:
+    async with db.connection():
+        held_since = time.perf_counter()
+        try:
+            yield db
+        finally:
+            route = request.scope.get("route")
+            pool_monitor.held(getattr(route, "name", request.url.path), time.perf_counter() - held_since)
 
 
-def get_database(request: Request) -> Database:
+def get_database_unpinned(request: Request) -> Database:
+    """_
+        the pool without a pinned connection, for routes that spend most of
+        their time hashing passwords and would hold a connection meanwhile.
+        In a UnitOfWorkRoute router they also need without_unit_of_work.
+    """
     return request.app.state._db
+
+
+def without_unit_of_work(endpoint: Callable) -> Callable:
+    """_
+        marks an endpoint of a UnitOfWorkRoute router that must not run in a
+        transaction, e.g. one that hashes a password before its only write
+        and would keep the transaction open meanwhile. Goes below the
+        router decorator.
+    """
+    endpoint.unit_of_work = False
+    return endpoint
+
+
+class UnitOfWorkRoute(APIRoute):
+    """
+    Route whose POST / PUT / PATCH / DELETE handler runs in one transaction
+    on the pinned connection. It is committed before the response is sent and
+    rolled back when the handler raises, AppExceptionCase included.
+    Disabled with DB_REQUEST_TRANSACTIONS=False, or for one endpoint with
+    without_unit_of_work.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        in_transaction = DB_REQUEST_TRANSACTIONS and getattr(self.endpoint, "unit_of_work", True)
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            if request.method not in MUTATING_METHODS:
+                return await handler(request)
+
+            db = request.app.state._db
+            if in_transaction:
+                async with db.connection():
+                    # keys evicted before the commit could be loaded again with the old row
+                    async with evict_again_after_commit():
+                        async with db.transaction():
+                            response = await handler(request)
+            else:
+                response = await handler(request)
+
+            # with or without a transaction, the replicas may not have the write yet
+            if response.status_code < 400:
+                await replica_router.wrote(request, response, db)
+            return response
+
+        return unit_of_work_handler
@@ -0,0 +1,13 @@
+from shared.utils.app_exceptions import AppExceptionCase
+
+
+class DatabaseExceptions:
+    class PoolTimeoutException(AppExceptionCase):
+        """_
+        No connection of the pool was free within DB_ACQUIRE_TIMEOUT_SECONDS
+        """
+
+        def __init__(self, msg: str = ""):
+            status_code = 503
+            msg = "No hay conexiones libres con la base de datos, intente de nuevo"
+            AppExceptionCase.__init__(self, status_code, msg)
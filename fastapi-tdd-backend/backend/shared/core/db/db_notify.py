@@ -0,0 +1,120 @@
+import asyncio
+from typing import Awaitable, Callable, Set, Tuple
+from uuid import uuid4
+
+import asyncpg
+from databases import Database
+from loguru import logger
+
+# changes of the cached tables, payload "<origin>:<entity>:<id>", id "*" for all rows
+CHANGES_CHANNEL = "entity_changes"
+
+# identifies the notifications sent by this worker, it already evicted its keys
+ORIGIN = uuid4().hex[:12]
+
+NOTIFY_CHANGE = "SELECT pg_notify(:channel, :payload);"
+
+
+async def notify_change(db: Database, entity: str, id: str = "*") -> None:
+    """
+    Tells the other workers that rows of entity changed. Postgres delivers
+    the notification when the transaction of db commits.
+    """
+    payload = f"{ORIGIN}:{entity}:{id}"
+    await db.execute(query=NOTIFY_CHANGE, values={"channel": CHANGES_CHANNEL, "payload": payload})
+
+
+def parse_change(payload: str) -> Tuple[str, str, str] | None:
+    parts = payload.split(":", 2)
+    if len(parts) != 3:
+        return None
+    return parts[0], parts[1], parts[2]
+
+
+class ChangesListener:
+    """
+    Dedicated connection, outside the pool, that listens to CHANGES_CHANNEL.
+    on_change(entity, id) runs for the changes of the other workers. When the
+    connection is lost it reconnects, and on_reset() runs because the
+    changes sent meanwhile were not received.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        on_change: Callable[[str, str], Awaitable[None]],
+        on_reset: Callable[[], Awaitable[None]],
+        retry_seconds: float = 5,
+    ):
+        self.dsn = dsn
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.retry_seconds = retry_seconds
+        self._connection: asyncpg.Connection | None = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._closing = False
+
+    async def start(self) -> None:
+        self._closing = False
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_termination)
+        await self._connection.add_listener(CHANGES_CHANNEL, self._on_notification)
+
+    async def connect(self) -> None:
+        """
+        start() at startup. When the database cannot be reached the listener
+        keeps retrying in the background, like after losing the connection,
+        instead of failing the rest of the startup.
+        """
+        try:
+            await self.start()
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning(f"No se pudo iniciar la escucha de cambios: {e}")
+            self._spawn(self._reconnect())
+
+    async def stop(self) -> None:
+        self._closing = True
+        for task in list(self._tasks):
+            task.cancel()
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    def _spawn(self, coroutine: Awaitable) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        change = parse_change(payload)
+        if change is None:
+            logger.warning(f"Notificación de cambios no válida: {payload}")
+            return
+
+        origin, entity, id = change
+        if origin != ORIGIN:
+            self._spawn(self._apply(entity, id))
+
+    async def _apply(self, entity: str, id: str) -> None:
+        try:
+            await self.on_change(entity, id)
+        except Exception as e:
+            logger.error(f"Error aplicando el cambio {entity}:{id}: {e}")
+
+    def _on_termination(self, connection) -> None:
+        if not self._closing:
+            logger.warning("Se perdió la conexión de notificaciones de cambios")
+            self._spawn(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._closing:
+            await asyncio.sleep(self.retry_seconds)
+            try:
+                await self.start()
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning(f"No se pudo reconectar la escucha de cambios: {e}")
+                continue
+
+            await self.on_reset()
+            logger.info("Escucha de cambios reconectada")
+            return
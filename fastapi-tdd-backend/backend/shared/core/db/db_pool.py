@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+from databases import Database
+from loguru import logger
+
+from shared.core.config import (
+    DB_ACQUIRE_TIMEOUT_SECONDS,
+    DB_HOLD_WARNING_SECONDS,
+    DB_MAX_IDLE_SECONDS,
+    DB_MAX_QUERIES,
+    DB_MAX_SIZE,
+    DB_MIN_SIZE,
+    DB_PREPARED_STATEMENTS,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+from shared.core.db.db_exceptions import DatabaseExceptions
+from shared.core.db.db_statements import PreparedConnection, statement_warmer
+from shared.core.metrics import Histogram, register_metrics
+
+# seconds waited for a connection
+ACQUIRE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def pool_options() -> Dict[str, Any]:
+    """
+    asyncpg.create_pool arguments, databases passes them through
+    """
+    options: Dict[str, Any] = {
+        "min_size": DB_MIN_SIZE,
+        "max_size": DB_MAX_SIZE,
+        "max_queries": DB_MAX_QUERIES,
+        "max_inactive_connection_lifetime": DB_MAX_IDLE_SECONDS,
+        # the hot statements are prepared when a connection is opened
+        "connection_class": PreparedConnection,
+        "statement_cache_size": DB_PREPARED_STATEMENTS,
+        "init": statement_warmer.warm_up,
+    }
+    if DB_STATEMENT_TIMEOUT_MS:
+        options["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return options
+
+
+class InstrumentedPool:
+    """
+    The asyncpg pool of a databases.Database, acquire() waits at most
+    acquire_timeout and is measured. Everything else goes to the pool.
+    """
+
+    def __init__(self, pool, acquire_timeout: float):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.waiting = 0
+        self.timeouts = 0
+        self.acquire_wait = Histogram(ACQUIRE_WAIT_BUCKETS)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+    async def acquire(self):
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = await self._pool.acquire(timeout=self.acquire_timeout or None)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.error(f"Pool agotado: {self.acquire_timeout}s esperando una conexión")
+            raise DatabaseExceptions.PoolTimeoutException()
+        finally:
+            self.waiting -= 1
+
+        self.acquire_wait.observe(time.perf_counter() - started)
+        return connection
+
+    async def release(self, connection) -> None:
+        await self._pool.release(connection)
+
+
+def _gauges(pool: InstrumentedPool) -> Dict:
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": size,
+        "in_use": size - idle,
+        "idle": idle,
+        "waiters": pool.waiting,
+        "acquire_timeouts": pool.timeouts,
+        "acquire_wait_seconds": pool.acquire_wait.snapshot(),
+    }
+
+
+class PoolMonitor:
+    """
+    Gauges of the pools of the app, the primary and its read replicas, and
+    the requests that held a connection for more than hold_warning seconds,
+    published in /metrics
+    """
+
+    def __init__(self, hold_warning: float):
+        self.hold_warning = hold_warning
+        self.pool: InstrumentedPool | None = None
+        self.replicas: Dict[str, InstrumentedPool] = {}
+        self.long_holds = 0
+
+    def instrument(
+        self, database: Database, acquire_timeout: float, replica: str | None = None
+    ) -> InstrumentedPool:
+        backend = database._backend
+        pool = InstrumentedPool(backend._pool, acquire_timeout)
+        backend._pool = pool
+        if replica is None:
+            self.pool = pool
+        else:
+            self.replicas[replica] = pool
+        return pool
+
+    def held(self, route: str, seconds: float) -> None:
+        if seconds > self.hold_warning:
+            self.long_holds += 1
+            logger.warning(f"La ruta {route} retuvo una conexión {seconds:.3f}s")
+
+    def stats(self) -> Dict:
+        if self.pool is None:
+            return {}
+
+        stats = {**_gauges(self.pool), "long_holds": self.long_holds}
+        if self.replicas:
+            stats["replicas"] = {name: _gauges(pool) for name, pool in self.replicas.items()}
+        return stats
+
+
+pool_monitor = PoolMonitor(hold_warning=DB_HOLD_WARNING_SECONDS)
+
+register_metrics("db_pool", pool_monitor.stats)
+
+
+def instrument_pool(database: Database, replica: str | None = None) -> InstrumentedPool:
+    return pool_monitor.instrument(database, DB_ACQUIRE_TIMEOUT_SECONDS, replica=replica)
@@ -0,0 +1,120 @@
+import hashlib
+import math
+import time
+from typing import Dict, List
+
+from databases import Database
+from loguru import logger
+from starlette.requests import Request
+from starlette.responses import Response
+
+from shared.core.config import READ_YOUR_WRITES_SECONDS
+from shared.core.db.db_notify import notify_change
+from shared.core.metrics import register_metrics
+from shared.utils.entity_cache import on_remote_change
+from shared.utils.ttl_cache import TTLCache
+
+# time of the last write of a client, for the workers that did not serve it
+LAST_WRITE_COOKIE = "db_last_write"
+
+# notifications of the clients that wrote, the id is the client key
+WRITERS_ENTITY = "db_writers"
+
+
+class ReplicaDatabase(Database):
+    """
+    Pool of a read replica, primary is the database it replicates
+    """
+
+    def __init__(self, url: str, primary: Database, **options):
+        super().__init__(url, **options)
+        self.primary = primary
+
+
+def primary_database(db: Database) -> Database:
+    """
+    The primary of a replica, rows that are cached are read from it
+    """
+    return getattr(db, "primary", db)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads to the replicas in turn. A client that wrote in the last
+    window seconds reads from the primary, so it sees its own writes while
+    the replicas catch up. Clients are known by their Authorization header,
+    the other workers learn about a write from a notification and, for the
+    clients that keep cookies, from LAST_WRITE_COOKIE. The notification is
+    delivered asynchronously: a bearer client without cookies whose next
+    request reaches another worker before it may still read from a replica.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self.replicas: List[ReplicaDatabase] = []
+        self._recent_writers = TTLCache(max_size=10000, ttl=window)
+        self._next = 0
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def _client(self, request: Request) -> str:
+        credentials = request.headers.get("authorization") or (request.client.host if request.client else "")
+        return hashlib.sha1(credentials.encode()).hexdigest()
+
+    async def wrote(self, request: Request, response: Response, db: Database) -> None:
+        """
+        Records a successful write of the client of request, here and in the
+        other workers
+        """
+        if not self.replicas:
+            return
+
+        now = time.time()
+        client = self._client(request)
+        self._recent_writers.set(client, now)
+        response.set_cookie(
+            LAST_WRITE_COOKIE, str(now), max_age=math.ceil(self.window), httponly=True, samesite="lax"
+        )
+        try:
+            await notify_change(db, WRITERS_ENTITY, client)
+        except Exception as e:
+            # the write is committed, the other workers rely on the cookie
+            logger.warning(f"No se pudo notificar la escritura a los otros workers: {e}")
+
+    def remote_write(self, client: str) -> None:
+        # "*" is a reset of the listener, the writers it missed are unknown
+        if client != "*":
+            self._recent_writers.set(client, time.time())
+
+    def wrote_recently(self, request: Request) -> bool:
+        if self._recent_writers.get(self._client(request)) is not None:
+            return True
+
+        try:
+            last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+        except ValueError:
+            return False
+        return time.time() - last_write < self.window
+
+    def for_read(self, request: Request, primary: Database) -> Database:
+        if not self.replicas or self.wrote_recently(request):
+            self.primary_reads += 1
+            return primary
+
+        self.replica_reads += 1
+        self._next = (self._next + 1) % len(self.replicas)
+        return self.replicas[self._next]
+
+    def stats(self) -> Dict:
+        return {
+            "replicas": len(self.replicas),
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+        }
+
+
+replica_router = ReplicaRouter(window=READ_YOUR_WRITES_SECONDS)
+
+on_remote_change(WRITERS_ENTITY, replica_router.remote_write)
+
+register_metrics("db_replicas", replica_router.stats)
@@ -0,0 +1,132 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Tuple
+
+import asyncpg
+from databases import Database
+from loguru import logger
+
+from shared.core.metrics import register_metrics
+
+# :name parameters of the SQL constants, not the ::type casts
+_PARAMETER = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+class Statement(NamedTuple):
+    """
+    A query with $1..$n parameters, names are the values in that order
+    """
+
+    sql: str
+    names: Tuple[str, ...]
+
+    def arguments(self, values: Mapping[str, Any] | None) -> List[Any]:
+        values = values or {}
+        return [values[name] for name in self.names]
+
+
+@lru_cache(maxsize=1024)
+def compile_statement(query: str) -> Statement:
+    """
+    The $1..$n form of a query with :name parameters. It is done once per
+    text, databases compiles the query with SQLAlchemy on every call.
+    """
+    names: List[str] = []
+
+    def number(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    # the parts between quotes are literals
+    parts = query.split("'")
+    parts[::2] = [_PARAMETER.sub(number, part) for part in parts[::2]]
+    return Statement("'".join(parts), tuple(names))
+
+
+class PreparedConnection(asyncpg.Connection):
+    """
+    Connection of the pool. asyncpg keeps the statements it runs prepared
+    in the connection, up to statement_cache_size, and reuses them by text.
+    """
+
+    async def prepare_cached(self, query: str) -> None:
+        """
+        Prepares query in the statement cache without running it
+        """
+        await self._get_statement(query, None)
+
+
+class StatementWarmer:
+    """
+    Statements prepared on every new connection of the pool, before the
+    first request that runs them. They are registered by text in the
+    $1..$n form, see compile_statement.
+    """
+
+    def __init__(self):
+        self.hot: Dict[str, None] = {}
+        self.warmed = 0
+        self.errors = 0
+
+    def register(self, queries: Iterable[str]) -> None:
+        for query in queries:
+            self.hot[compile_statement(query).sql] = None
+
+    async def warm_up(self, connection: asyncpg.Connection) -> None:
+        """_
+            init of the pool. A statement that cannot be prepared, e.g.
+            before the migrations ran, is prepared on first use instead.
+        """
+        if not isinstance(connection, PreparedConnection):
+            return
+
+        for sql in self.hot:
+            try:
+                await connection.prepare_cached(sql)
+                self.warmed += 1
+            except asyncpg.PostgresError as e:
+                self.errors += 1
+                logger.warning(f"No se pudo preparar una sentencia al abrir la conexión: {e}")
+
+    def stats(self) -> Dict:
+        compiled = compile_statement.cache_info()
+        return {
+            "hot": len(self.hot),
+            "warmed": self.warmed,
+            "warm_up_errors": self.errors,
+            "compiled": compiled.currsize,
+            "compile_hits": compiled.hits,
+        }
+
+
+statement_warmer = StatementWarmer()
+
+register_metrics("db_statements", statement_warmer.stats)
+
+
+async def _run(db: Database, method: str, query: str, values: Mapping[str, Any] | None) -> Any:
+    statement = compile_statement(query)
+    arguments = statement.arguments(values)
+    async with db.connection() as connection:
+        # the pinned connection runs one query at a time, like databases does
+        async with connection._query_lock:
+            raw_connection = connection.raw_connection
+            return await getattr(raw_connection, method)(statement.sql, *arguments)
+
+
+async def fetch_one(db: Database, query: str, values: Mapping[str, Any] | None = None) -> asyncpg.Record | None:
+    """
+    db.fetch_one for the static SQL constants, straight on asyncpg with the
+    statement prepared in the connection. Rows are asyncpg records.
+    """
+    return await _run(db, "fetchrow", query, values)
+
+
+async def fetch_all(db: Database, query: str, values: Mapping[str, Any] | None = None) -> List[asyncpg.Record]:
+    return await _run(db, "fetch", query, values)
+
+
+async def fetch_val(db: Database, query: str, values: Mapping[str, Any] | None = None) -> Any:
+    return await _run(db, "fetchval", query, values)
@@ -1,15 +1,21 @@
 import os
+from typing import List
 
-from databases import Database
+from databases import Database, DatabaseURL
 from fastapi import FastAPI
 from loguru import logger
 
 from modules.users.users.user_repositories import UserRepository
 from modules.users.roles.role_schemas import RoleOut
+from shared.core.db.db_notify import ChangesListener
+from shared.core.db.db_pool import instrument_pool, pool_options
+from shared.core.db.db_replicas import ReplicaDatabase, replica_router
+from shared.core.db.db_statements import statement_warmer
+from shared.utils.entity_cache import apply_remote_change, reset_local_caches
+from shared.utils.repository_utils import projection
 from shared.core.config import (
     DATABASE_URL,
-    DB_MIN_SIZE,
-    DB_MAX_SIZE,
+    DATABASE_REPLICA_URLS,
     SUPER_ADMIN,
     SUPER_PASSWORD,
     SUPER_EMAIL,
@@ -19,14 +25,19 @@ from shared.core.config import (
 
 
 async def connect_to_db(app: FastAPI) -> None:
+    DB_URL = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else DATABASE_URL
     try:
-        DB_URL = f"{DATABASE_URL}_test" if os.environ.get("TESTING") else DATABASE_URL
-        database = Database(DB_URL, min_size=DB_MIN_SIZE, max_size=DB_MAX_SIZE)
+        statement_warmer.register(hot_statements())
+        database = Database(DB_URL, **pool_options())
 
         await database.connect()
+        instrument_pool(database)
         app.state._db = database
 
         await verify_super_admin(db=database)
+        await sync_roles_permissions(db=database)
+
+        await connect_to_replicas(database)
 
         logger.info("Database connection - successful")
     except Exception as e:
@@ -34,9 +45,78 @@ async def connect_to_db(app: FastAPI) -> None:
         logger.warning(e)
         logger.warning("--- DB CONNECTION ERROR ---")
 
+    # evicts what the other workers change from the caches of this one, it
+    # retries on its own until it can listen
+    listener = ChangesListener(str(DB_URL), on_change=apply_remote_change, on_reset=reset_local_caches)
+    await listener.connect()
+    app.state._changes_listener = listener
+
+
+def hot_statements() -> List[str]:
+    """
+    The get by id and auth lookups, prepared on every new connection. The
+    get by id queries as the repositories run them, with every column.
+    """
+    from modules.inventory.inventory_sqlstatements import GET_INVENTORY_BY_ID, INVENTORY_COLUMNS
+    from modules.orders.orders_sqlstatements import GET_ORDERS_BY_ID, ORDERS_COLUMNS
+    from modules.product.product_sqlstatements import GET_PRODUCT_BY_ID, PRODUCT_COLUMNS
+    from modules.raw_material.raw_material_sqlstatements import GET_RAW_MATERIAL_BY_ID, RAW_MATERIAL_COLUMNS
+    from modules.users.roles.role_sqlsentences import GET_ROLE_BY_ID
+    from modules.users.users.user_sqlstaments import (
+        GET_USER_BY_EMAIL,
+        GET_USER_BY_ID,
+        GET_USER_BY_USERNAME,
+        GET_USER_PUBLIC_BY_ID,
+        GET_USER_TOKEN_STATE,
+        USER_PUBLIC_COLUMNS,
+    )
+
+    by_id = [
+        (GET_PRODUCT_BY_ID, PRODUCT_COLUMNS),
+        (GET_RAW_MATERIAL_BY_ID, RAW_MATERIAL_COLUMNS),
+        (GET_INVENTORY_BY_ID, INVENTORY_COLUMNS),
+        (GET_ORDERS_BY_ID, ORDERS_COLUMNS),
+        (GET_USER_PUBLIC_BY_ID, USER_PUBLIC_COLUMNS),
+    ]
+    return [
+        *[query.format(**projection(columns)) for query, columns in by_id],
+        GET_ROLE_BY_ID,
+        GET_USER_BY_ID,
+        GET_USER_BY_USERNAME,
+        GET_USER_BY_EMAIL,
+        GET_USER_TOKEN_STATE,
+    ]
+
+
+async def connect_to_replicas(primary: Database) -> None:
+    replicas = []
+    for url in DATABASE_REPLICA_URLS:
+        url = DatabaseURL(f"{url}_test" if os.environ.get("TESTING") else url)
+        name = f"{url.hostname}:{url.port or 5432}/{url.database}"
+        replica = ReplicaDatabase(url, primary=primary, **pool_options())
+        try:
+            await replica.connect()
+        except Exception as e:
+            # the primary serves the reads of a replica that is not available
+            logger.warning(f"No se pudo conectar la réplica {name}: {e}")
+            continue
+
+        instrument_pool(replica, replica=name)
+        replicas.append(replica)
+        logger.info(f"Réplica de lectura {name} - conectada")
+
+    replica_router.replicas = replicas
+
 
 async def close_db_connection(app: FastAPI) -> None:
+    for replica in replica_router.replicas:
+        await replica.disconnect()
+    replica_router.replicas = []
+
     try:
+        listener = getattr(app.state, "_changes_listener", None)
+        if listener is not None:
+            await listener.stop()
         await app.state._db.disconnect()  # database.disconnect()
         logger.info("Database connection - closed")
     except Exception as e:
@@ -56,6 +136,17 @@ async def verify_super_admin(db: Database) -> None:
         logger.error("se produjo este error: {e}")
 
 
+async def sync_roles_permissions(db: Database) -> None:
+    from modules.users.roles.role_repositories import RoleRepository
+
+    try:
+        updated = await RoleRepository(db).sync_permissions_masks()
+        if updated:
+            logger.info(f"Máscara de permisos actualizada en {updated} roles")
+    except Exception as e:
+        logger.error(f"se produjo este error: {e}")
+
+
 async def _create_super_admin(db: Database) -> None:
     from modules.users.auths.auth_services import AuthService
     from modules.users.users.user_repositories import UserRepository
@@ -71,7 +162,7 @@ async def _create_super_admin(db: Database) -> None:
         role_id=role.id,
     )
 
-    user_password_update = AuthService().create_salt_and_hashedpassword(
+    user_password_update = await AuthService().create_salt_and_hashedpassword_async(
         plaintext_password=super_admin.password
     )
     super_admin.password = user_password_update.password
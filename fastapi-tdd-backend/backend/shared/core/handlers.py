@@ -3,12 +3,17 @@ from typing import Callable
 from fastapi import FastAPI
 from loguru import logger
 
+from modules.users.auths.auth_hashing import password_hasher
+from modules.users.permissions import get_permission_registry
 from shared.core.db.db_tasks import connect_to_db, close_db_connection
+from shared.utils.entity_cache import close_entity_cache, configure_entity_cache
 
 
 def create_start_app_handler(app: FastAPI) -> Callable:
     async def start_app() -> None:
         await connect_to_db(app)
+        await configure_entity_cache()
+        get_permission_registry()
 
     return start_app
 
@@ -16,5 +21,7 @@ def create_start_app_handler(app: FastAPI) -> Callable:
 def create_stop_app_handler(app: FastAPI) -> Callable:
     async def stop_app() -> None:
         await close_db_connection(app)
+        await close_entity_cache()
+        password_hasher.shutdown()
 
     return stop_app
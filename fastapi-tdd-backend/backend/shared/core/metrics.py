@@ -0,0 +1,45 @@
+import bisect
+import itertools
+from typing import Callable, Dict, Tuple
+
+_providers: Dict[str, Callable[[], Dict]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Dict]) -> None:
+    """
+    Registers a callable that returns the current values of a group of metrics
+    """
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict:
+    return {name: provider() for name, provider in _providers.items()}
+
+
+class Histogram:
+    """
+    Counts of observed values by upper bound, like a Prometheus histogram.
+    Buckets are cumulative, the last one is +Inf.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict:
+        cumulative = list(itertools.accumulate(self._counts))
+        return {
+            "buckets": {
+                **{str(bound): total for bound, total in zip(self.buckets, cumulative)},
+                "+Inf": cumulative[-1],
+            },
+            "count": self.count,
+            "sum": round(self.sum, 6),
+        }
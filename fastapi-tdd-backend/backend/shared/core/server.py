@@ -3,9 +3,11 @@ import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from shared.core import config
+from shared.core.metrics import collect_metrics
 from shared.core.handlers import create_start_app_handler, create_stop_app_handler
 from shared.core.routers import router
 from shared.utils.app_exceptions import AppExceptionCase, app_exception_handler
+from shared.utils.orjson_response import ORJSONResponse
 
 
 def get_application():
@@ -14,6 +16,7 @@ def get_application():
         description=config.DESCRIPTION,
         version=config.VERSION,
         debug=config.DEBUG,
+        default_response_class=ORJSONResponse,
     )
 
     app.add_middleware(
@@ -37,6 +40,10 @@ def get_application():
     def home():
         return {"message": "Bienvenido al backend del Sistema ANIMAL FOOD de Desarrollo de APIs con Python"}
 
+    @app.get("/metrics")
+    def metrics():
+        return collect_metrics()
+
     return app
 
 
@@ -0,0 +1,41 @@
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from shared.utils.schemas_base import BulkItemError
+
+
+def validate_bulk_items(
+    items: List[Dict], schema: Type[BaseModel], key: str, **extra: Any
+) -> Tuple[List[Tuple[int, BaseModel]], List[BulkItemError]]:
+    """_
+        validates every item of a bulk request with schema, extra values are
+        added to every item (created_by, updated_by...). Items whose key was
+        already used by a previous item of the request are rejected.
+
+    Returns:
+        the valid items with their position in the request, and the errors
+    """
+    valid = []
+    errors = []
+    keys = set()
+    for index, item in enumerate(items):
+        try:
+            model = schema(**{**item, **extra})
+        except ValidationError as e:
+            msg = "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            )
+            errors.append(BulkItemError(index=index, msg=msg))
+            continue
+
+        value = getattr(model, key)
+        if value in keys:
+            errors.append(BulkItemError(index=index, msg=f"{key} repetido en la solicitud"))
+            continue
+
+        keys.add(value)
+        valid.append((index, model))
+
+    return valid, errors
@@ -0,0 +1,112 @@
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, FrozenSet
+from uuid import UUID
+
+from fastapi import Header, Request
+from starlette.responses import Response
+
+from shared.utils.orjson_response import ORJSONResponse
+from shared.utils.service_result import ServiceResult
+
+# polled resources are stored by the client but revalidated on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass(frozen=True)
+class Validators:
+    """
+    ETag and, for single rows, Last-Modified of a response
+    """
+
+    etag: str
+    last_modified: datetime | None = None
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(
+                self.last_modified.astimezone(timezone.utc), usegmt=True
+            )
+        return headers
+
+
+@dataclass(frozen=True)
+class Preconditions:
+    """
+    If-None-Match / If-Modified-Since of a GET. variant is the query string,
+    the same row or list answered with other parameters has another ETag.
+    """
+
+    variant: str = ""
+    if_none_match: FrozenSet[str] = field(default_factory=frozenset)
+    if_modified_since: datetime | None = None
+
+    def _etag(self, *version: Any) -> str:
+        key = "|".join(str(value) for value in (*version, self.variant))
+        return f'W/"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+    def entity_validators(self, id: UUID, updated_at: datetime | None) -> Validators:
+        return Validators(etag=self._etag(id, updated_at), last_modified=updated_at)
+
+    def list_validators(self, total: int, last_updated: datetime | None) -> Validators:
+        # a delete does not move max(updated_at), so lists have no Last-Modified
+        return Validators(etag=self._etag(total, last_updated))
+
+    def not_modified(self, validators: Validators) -> bool:
+        """
+        If-None-Match wins over If-Modified-Since, ETags are compared weakly
+        """
+        if self.if_none_match:
+            return "*" in self.if_none_match or _opaque(validators.etag) in self.if_none_match
+
+        if self.if_modified_since is None or validators.last_modified is None:
+            return False
+
+        # HTTP dates have no fractions of a second
+        return validators.last_modified.replace(microsecond=0) <= self.if_modified_since
+
+
+def _opaque(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _http_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+async def get_preconditions(
+    request: Request,
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+) -> Preconditions:
+    return Preconditions(
+        variant="&".join(sorted(request.url.query.split("&"))),
+        if_none_match=frozenset(
+            _opaque(etag) for etag in (if_none_match or "").split(",") if etag.strip()
+        ),
+        if_modified_since=_http_date(if_modified_since),
+    )
+
+
+def not_modified_response(validators: Validators) -> Response:
+    return Response(status_code=304, headers=validators.headers())
+
+
+def with_validators(result: ServiceResult, validators: Validators | None) -> ServiceResult:
+    """
+    Successful results are answered with their validators in the headers
+    """
+    if validators is None or not result.success or isinstance(result.value, Response):
+        return result
+
+    return ServiceResult(ORJSONResponse(result.value, headers=validators.headers()))
@@ -0,0 +1,386 @@
+import abc
+import asyncio
+import contextlib
+import copy
+import random
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Tuple, Type
+
+import orjson
+from databases import Database
+from loguru import logger
+from pydantic import BaseModel
+
+from shared.core.db.db_notify import notify_change
+from shared.core.config import (
+    ENTITY_CACHE_BACKEND,
+    ENTITY_CACHE_MAX_SIZE,
+    ENTITY_CACHE_NEGATIVE_TTL_SECONDS,
+    ENTITY_CACHE_REDIS_URL,
+    ENTITY_CACHE_TTL_SECONDS,
+)
+from shared.core.metrics import register_metrics
+from shared.utils.orjson_response import _orjson_default
+from shared.utils.repository_utils import from_record, record_values
+from shared.utils.ttl_cache import TTLCache
+
+# cached value of an id that is not in the database
+MISSING: Dict = {}
+
+# entries of the same age do not expire all at once
+TTL_JITTER = 0.1
+
+# (cache, id) evicted inside a request transaction, None for all the rows
+_evicted_in_transaction: ContextVar[List[Tuple["EntityCache", Hashable | None]] | None] = ContextVar(
+    "evicted_in_transaction", default=None
+)
+
+
+class CacheBackend(abc.ABC):
+    """
+    Storage of the entity caches, keys are "<entity>:<id>" and values the
+    columns of a row, or MISSING.
+    revalidate: values come back with JSON types and must be parsed by the schema
+    shared: every worker uses the same entries
+    """
+
+    revalidate = False
+    shared = False
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Dict | None:
+        pass
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Dict, ttl: float) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def clear(self, prefix: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU with TTL, one per worker. max_size=0 disables the cache.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    async def get(self, key: str) -> Dict | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Dict, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def clear(self, prefix: str) -> None:
+        self._cache.evict_where_key(lambda key: key.startswith(prefix))
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared by the workers in a Redis compatible server. client is an
+    asyncio client with get / set(ex=) / delete / scan_iter, like redis.asyncio.
+    """
+
+    revalidate = True
+    shared = True
+
+    def __init__(self, client: Any, namespace: str = "entity"):
+        self.client = client
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Dict | None:
+        value = await self.client.get(self._key(key))
+        return None if value is None else orjson.loads(value)
+
+    async def set(self, key: str, value: Dict, ttl: float) -> None:
+        payload = orjson.dumps(value, default=_orjson_default)
+        await self.client.set(self._key(key), payload, ex=max(1, round(ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self._key(key))
+
+    async def clear(self, prefix: str) -> None:
+        keys = [key async for key in self.client.scan_iter(match=f"{self._key(prefix)}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+_backend: CacheBackend = MemoryCacheBackend(
+    max_size=0 if ENTITY_CACHE_BACKEND == "none" else ENTITY_CACHE_MAX_SIZE,
+    ttl=ENTITY_CACHE_TTL_SECONDS,
+)
+
+
+def get_cache_backend() -> CacheBackend:
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend) -> CacheBackend:
+    """
+    Replaces the backend of every entity cache, returns the previous one
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+
+async def configure_entity_cache() -> None:
+    """_
+        connects the Redis backend when ENTITY_CACHE_BACKEND=redis. redis is
+        an optional dependency, without it the in-process cache is kept.
+    """
+    if ENTITY_CACHE_BACKEND != "redis":
+        return
+
+    try:
+        from redis import asyncio as aioredis
+    except ImportError:
+        logger.warning("ENTITY_CACHE_BACKEND=redis pero el paquete redis no está instalado")
+        return
+
+    client = aioredis.from_url(ENTITY_CACHE_REDIS_URL)
+    await client.ping()
+    set_cache_backend(RedisCacheBackend(client))
+    logger.info("Caché de entidades en Redis")
+
+
+async def close_entity_cache() -> None:
+    await _backend.close()
+
+
+class EntityCache:
+    """
+    Read-through cache of the rows of one entity by id. Rows are loaded once,
+    404s are cached for negative_ttl, and concurrent misses of the same id in
+    this worker wait for a single query. Values are returned as fresh schema
+    instances, callers can modify them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        schema: Type[BaseModel],
+        ttl: float = ENTITY_CACHE_TTL_SECONDS,
+        negative_ttl: float = ENTITY_CACHE_NEGATIVE_TTL_SECONDS,
+    ):
+        self.name = name
+        self.schema = schema
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def _key(self, id: Hashable) -> str:
+        return f"{self.name}:{id}"
+
+    def _build(self, values: Dict) -> BaseModel | Dict:
+        if not values:
+            return {}
+        if get_cache_backend().revalidate:
+            return self.schema.parse_obj(values)
+        # the in-process backend returns the cached dict itself, its lists and
+        # dicts are copied so a caller cannot change the row of the next one
+        values = {
+            column: copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+            for column, value in values.items()
+        }
+        return from_record(self.schema, values)
+
+    async def get_or_load(self, id: Hashable, load: Callable[[], Awaitable[Any]]) -> BaseModel | Dict:
+        """
+        The cached row of id, load() fetches its record on a miss.
+        Returns {} when the id is not in the database.
+        """
+        key = self._key(id)
+        values = await get_cache_backend().get(key)
+        if values is not None:
+            if values:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+            return self._build(values)
+
+        loading = self._loading.get(key)
+        if loading is not None:
+            self.coalesced += 1
+            try:
+                return self._build(await asyncio.shield(loading))
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+
+        self.misses += 1
+        return self._build(await self._load(key, load))
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[Any]]) -> Dict:
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            record = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # the exception is raised here, waiters are optional
+            future.exception()
+            raise
+        finally:
+            # invalidate() drops the future, a load it raced with is not stored
+            current = self._loading.get(key) is future
+            if current:
+                del self._loading[key]
+
+        values = MISSING
+        if record:
+            values = {
+                name: value
+                for name, value in record_values(record).items()
+                if name in self.schema.__fields__
+            }
+        future.set_result(values)
+
+        if current:
+            ttl = self.ttl if values else self.negative_ttl
+            await get_cache_backend().set(key, values, ttl * random.uniform(1 - TTL_JITTER, 1))
+        return values
+
+    async def invalidate(self, id: Hashable, db: Database | None = None) -> None:
+        """
+        Evicts id after a write, with db the other workers are notified too
+        """
+        self.invalidations += 1
+        await self.discard(id)
+        _evict_after_commit(self, id)
+        if db is not None:
+            await notify_change(db, self.name, str(id))
+
+    async def clear(self, db: Database | None = None) -> None:
+        await self.discard_all()
+        _evict_after_commit(self, None)
+        if db is not None:
+            await notify_change(db, self.name)
+
+    async def discard(self, id: Hashable) -> None:
+        key = self._key(id)
+        self._loading.pop(key, None)
+        await get_cache_backend().delete(key)
+
+    async def discard_all(self) -> None:
+        self._loading.clear()
+        await get_cache_backend().clear(f"{self.name}:")
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.negative_hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.negative_hits) / requests, 4) if requests else 0.0,
+        }
+
+
+def _evict_after_commit(cache: EntityCache, id: Hashable | None) -> None:
+    evicted = _evicted_in_transaction.get()
+    if evicted is not None:
+        evicted.append((cache, id))
+
+
+@contextlib.asynccontextmanager
+async def evict_again_after_commit() -> AsyncIterator[None]:
+    """_
+        the keys invalidated inside the block are evicted again when it ends.
+        Until a transaction commits, other requests still read the old row
+        and could cache it again.
+    """
+    evicted: List[Tuple[EntityCache, Hashable | None]] = []
+    token = _evicted_in_transaction.set(evicted)
+    try:
+        yield
+    finally:
+        _evicted_in_transaction.reset(token)
+        for cache, id in evicted:
+            if id is None:
+                await cache.discard_all()
+            else:
+                await cache.discard(id)
+
+
+_caches: Dict[str, EntityCache] = {}
+
+
+def entity_cache(name: str, schema: Type[BaseModel]) -> EntityCache:
+    """
+    The cache of an entity, created on first use
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        cache = _caches[name] = EntityCache(name, schema)
+    return cache
+
+
+# functions run with the id when another worker changes rows of an entity
+_change_handlers: Dict[str, List[Callable[[str], None]]] = {}
+
+
+def on_remote_change(name: str, handler: Callable[[str], None]) -> None:
+    _change_handlers.setdefault(name, []).append(handler)
+
+
+async def apply_remote_change(name: str, id: str) -> None:
+    """_
+        evicts the rows another worker changed, id "*" for all the rows of
+        the entity. A shared backend was already updated by that worker.
+    """
+    cache = _caches.get(name)
+    if cache is not None and not get_cache_backend().shared:
+        if id == "*":
+            await cache.discard_all()
+        else:
+            await cache.discard(id)
+
+    for handler in _change_handlers.get(name, ()):
+        handler(id)
+
+
+async def reset_local_caches() -> None:
+    """
+    Forgets everything cached in this worker, some changes were missed
+    """
+    for name in set(_caches) | set(_change_handlers):
+        await apply_remote_change(name, "*")
+
+
+def entity_cache_stats() -> Dict:
+    return {
+        "backend": type(get_cache_backend()).__name__,
+        **{name: cache.stats() for name, cache in _caches.items()},
+    }
+
+
+register_metrics("entity_cache", entity_cache_stats)
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Mapping, Sequence
+from uuid import UUID
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from shared.core.config import EXPORT_BATCH_ROWS
+
+EXPORT_MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def export_rows(
+    records: AsyncGenerator[Mapping, None],
+    file_format: str,
+    columns: Sequence[str],
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> AsyncIterator[bytes]:
+    """
+    Serializes the records as csv or ndjson, the csv header is columns so an
+    empty table still has one. At most batch_rows rows are held before they
+    are written, the next ones are not read from the database until the
+    client has taken the previous chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+    pending = 0
+
+    try:
+        async for record in records:
+            if writer is not None:
+                writer.writerow([_csv_value(record[column]) for column in columns])
+            else:
+                buffer.write(json.dumps(dict(record), default=_json_default))
+                buffer.write("\n")
+
+            pending += 1
+            if pending >= batch_rows:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    finally:
+        # an abandoned stream must release its cursor now, not when collected
+        await records.aclose()
+
+
+class ExportResponse(StreamingResponse):
+    """
+    StreamingResponse that closes its body when the client goes away, so the
+    query behind it is cancelled and its connection returned to the pool.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+def export_response(
+    records: AsyncGenerator[Mapping, None], file_format: str, columns: Sequence[str], filename: str
+) -> ExportResponse:
+    """_
+        streams the records to the client. If the client disconnects the
+        response is cancelled, which closes the database cursor and ends the
+        transaction the rows were read in.
+    """
+    return ExportResponse(
+        export_rows(records, file_format, columns),
+        media_type=EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{file_format}"'},
+    )
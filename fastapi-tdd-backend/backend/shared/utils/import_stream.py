@@ -0,0 +1,189 @@
+import csv
+import io
+import itertools
+import json
+import uuid
+from typing import IO, AsyncIterator, Dict, Iterator, List, Sequence, Tuple, Type
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from shared.core.config import IMPORT_CHUNK_SIZE, IMPORT_MAX_REJECTS
+from shared.core.metrics import register_metrics
+from shared.utils.schemas_base import ImportReject, ImportResult
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# (line, row) with row None when the line could not be parsed, error says why
+ParsedRow = Tuple[int, Dict | None, str]
+
+
+def detect_format(filename: str | None, content_type: str | None, file_format: str | None) -> str | None:
+    """
+    Format of an upload, the explicit one first, then the file extension and
+    the content type. None when it is not csv or ndjson.
+    """
+    if file_format:
+        file_format = file_format.lower()
+        return file_format if file_format in IMPORT_FORMATS else None
+
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv" or content_type == "text/csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl") or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+
+    return None
+
+
+def iter_rows(file: IO[bytes], file_format: str) -> Iterator[ParsedRow]:
+    """
+    Reads the rows of an upload one at a time, the file is never loaded whole
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            row.pop(None, None)
+            yield reader.line_num, row, ""
+        return
+
+    for line, content in enumerate(text, start=1):
+        if not content.strip():
+            continue
+        try:
+            row = json.loads(content)
+        except ValueError as e:
+            yield line, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line, None, "La línea debe ser un objeto JSON"
+            continue
+        yield line, row, ""
+
+
+class ImportTracker:
+    """
+    Progress of the imports running in this process, published in /metrics
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.running: Dict[int, Dict] = {}
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, entity: str) -> int:
+        import_id = next(self._ids)
+        self.running[import_id] = {"entity": entity, "rows": 0, "rejected": 0}
+        return import_id
+
+    def progress(self, import_id: int, rows: int, rejected: int) -> None:
+        self.running[import_id].update(rows=rows, rejected=rejected)
+
+    def finish(self, import_id: int, failed: bool = False) -> None:
+        self.running.pop(import_id, None)
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stats(self) -> Dict:
+        return {
+            "running": {str(key): dict(value) for key, value in self.running.items()},
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+import_tracker = ImportTracker()
+
+register_metrics("imports", import_tracker.stats)
+
+
+class RowImporter:
+    """
+    Validates the rows of a csv / ndjson upload chunk by chunk with schema and
+    yields them as records for COPY: (line, id, *columns). Only one chunk is
+    in memory at a time, and at most IMPORT_MAX_REJECTS rejects are kept.
+    """
+
+    def __init__(
+        self,
+        entity: str,
+        schema: Type[BaseModel],
+        columns: Sequence[str],
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        max_rejects: int = IMPORT_MAX_REJECTS,
+    ):
+        self.entity = entity
+        self.schema = schema
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.max_rejects = max_rejects
+        self.rows = 0
+        self.loaded = 0
+        self.rejected = 0
+        self.rejects: List[ImportReject] = []
+        self.import_id: int | None = None
+
+    def _reject(self, line: int, msg: str) -> None:
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append(ImportReject(line=line, msg=msg))
+
+    def _validate(self, chunk: List[ParsedRow]) -> List[Tuple]:
+        records = []
+        for line, row, error in chunk:
+            self.rows += 1
+            if row is None:
+                self._reject(line, error)
+                continue
+            try:
+                item = self.schema(**row)
+            except ValidationError as e:
+                self._reject(
+                    line,
+                    "; ".join(
+                        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                        for err in e.errors()
+                    ),
+                )
+                continue
+            records.append((line, uuid.uuid4(), *(getattr(item, column) for column in self.columns)))
+
+        self.loaded += len(records)
+        return records
+
+    async def chunks(self, file: IO[bytes], file_format: str) -> AsyncIterator[List[Tuple]]:
+        rows = iter_rows(file, file_format)
+        while True:
+            # reading and parsing touch the spooled upload file, keep it off the event loop
+            chunk = await run_in_threadpool(lambda: list(itertools.islice(rows, self.chunk_size)))
+            if not chunk:
+                return
+
+            records = self._validate(chunk)
+            import_tracker.progress(self.import_id, self.rows, self.rejected)
+            logger.info(
+                f"Importando {self.entity}: {self.rows} filas leídas, {self.rejected} rechazadas"
+            )
+            if records:
+                yield records
+
+    def start(self) -> None:
+        self.import_id = import_tracker.start(self.entity)
+
+    def finish(self, failed: bool = False) -> None:
+        import_tracker.finish(self.import_id, failed=failed)
+
+    def result(self, created: int, updated: int) -> ImportResult:
+        return ImportResult(
+            rows=self.rows,
+            created=created,
+            updated=updated,
+            duplicated=self.loaded - created - updated,
+            rejected=self.rejected,
+            rejects=self.rejects,
+        )
@@ -0,0 +1,33 @@
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _orjson_default(value: Any) -> Any:
+    # uuid.UUID, datetime, date and enums are written by orjson itself
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, UUID):
+        # asyncpg returns its own UUID subclass in raw records
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. It is the default response class of
+    the app, and routes that get their response models from the services
+    return it directly, see handle_json_result, so the content is not walked
+    again by jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
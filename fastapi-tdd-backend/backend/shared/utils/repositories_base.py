@@ -10,6 +10,7 @@ from fastapi import FastAPI
 from loguru import logger
 from modules.users.users.user_schemas import UserInDB
 from shared.core.db.db_base import database
+from shared.utils.repository_utils import from_record
 from shared.utils.schemas_base import BaseSchema
 
 
@@ -28,6 +29,13 @@ class BaseRepository(abc.ABC):
     def _schema_in(self):
         pass
 
+    def _from_record(self, record):
+        """
+        _schema_out instance for a row read from the database, without
+        validating it again, see repository_utils.from_record
+        """
+        return from_record(self._schema_out, record)
+
     @staticmethod
     def generate_uuid() -> uuid.UUID:
         return uuid.uuid4()
@@ -1,7 +1,15 @@
+import base64
+import json
 from datetime import datetime
 import pytz
 import uuid
-from typing import Dict
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Mapping, Sequence, Tuple, Type, TypeVar
+
+import asyncpg
+from databases import Database
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
 def preprocess_create(values: Dict) -> Dict:
     if "id" not in values:
@@ -19,6 +27,121 @@ def preprocess_update(values: Dict, updated_by: uuid.UUID) -> Dict:
     values["updated_by"] = updated_by
     return values
 
+def update_set_clause(values: Dict) -> str:
+    """
+    SET clause for the given columns, values must come from a schema, never
+    from raw user input, because the keys are written into the SQL
+    """
+    return ", ".join(f"{column} = :{column}" for column in values)
+
+def rows_to_columns(rows: List[Dict], columns: Sequence[str]) -> Dict[str, List]:
+    """
+    One list of values per column, to insert many rows in a single statement
+    with INSERT ... SELECT * FROM UNNEST(CAST(:column AS type[]), ...)
+    """
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+# errors caused by the values of a row, the other rows can still be inserted
+BULK_ROW_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+async def bulk_insert(
+    db: Database, query: str, rows: List[Dict], columns: Sequence[str], chunk_size: int
+) -> Tuple[List[Any], Dict[int, str]]:
+    """
+    Inserts the rows in one transaction, one UNNEST statement per chunk of
+    chunk_size rows. A chunk the database rejects (a value too long or out
+    of range, a foreign key...) is inserted again row by row, each row in a
+    savepoint, to keep the valid ones. Returns the records of every
+    RETURNING clause and the error of every rejected row by its position.
+    """
+    records = []
+    failed: Dict[int, str] = {}
+    async with db.transaction():
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                async with db.transaction():
+                    records.extend(await db.fetch_all(query=query, values=rows_to_columns(chunk, columns)))
+                continue
+            except BULK_ROW_ERRORS:
+                pass
+
+            for position, row in enumerate(chunk, start):
+                try:
+                    async with db.transaction():
+                        records.extend(await db.fetch_all(query=query, values=rows_to_columns([row], columns)))
+                except BULK_ROW_ERRORS as e:
+                    failed[position] = str(e)
+
+    return records, failed
+
+class UnknownFieldsError(ValueError):
+    """
+    A ?fields= parameter asked for fields the resource does not have, the
+    message lists them
+    """
+
+
+def parse_fields(fields: str | None, allowed: Iterable[str]) -> List[str] | None:
+    """
+    Field names of a ?fields= parameter, comma separated, without repeated
+    names. id is always the first one. None when the parameter was not sent.
+    """
+    if fields is None:
+        return None
+
+    names = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+
+    allowed = set(allowed)
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise UnknownFieldsError(", ".join(unknown))
+
+    return names
+
+def projection(
+    columns: Mapping[str, str],
+    fields: Sequence[str] | None = None,
+    joins: Mapping[str, str] | None = None,
+    with_joins: Iterable[str] = (),
+) -> Dict[str, str]:
+    """
+    select list and joins of a query template for the given fields, every
+    column when fields is None. A join is only added when a selected field,
+    or a name of with_joins (e.g. the search columns), needs it.
+    """
+    names = list(columns) if fields is None else list(fields)
+    joins = joins or {}
+    needed = [joins[name] for name in [*names, *with_joins] if name in joins]
+
+    return {
+        "select": ", ".join(columns[name] for name in names),
+        "joins": "\n    ".join(dict.fromkeys(needed)),
+    }
+
+def record_values(record: Any) -> Mapping:
+    """
+    Column -> value of a databases Record, a dict is returned as it is.
+    Reads the asyncpg row directly, dict(record) warns on every row.
+    """
+    return getattr(record, "_mapping", record)
+
+def from_record(schema: Type[ModelT], record: Any) -> ModelT:
+    """
+    Trusted path from a row of our own typed columns to a schema: the values
+    are set without validating them again, columns the schema does not
+    declare are left out. Request bodies and imported files must keep going
+    through the schema constructor.
+    """
+    fields = schema.__fields__
+    return schema.construct(
+        **{column: value for column, value in record_values(record).items() if column in fields}
+    )
+
 def _generate_uuid() -> uuid.UUID:
     return uuid.uuid4()
 
@@ -27,3 +150,104 @@ def _preprocess_date() -> datetime:
     timezone = pytz.timezone("America/Caracas")
     return timezone.localize(d)
 
+
+async def fetch_page(
+    db: Database, query: str, values: Dict, page_num: int, page_size: int
+) -> Tuple[List[Dict], int]:
+    """
+    Runs a list query limited to one page. The query must select
+    COUNT(*) OVER() AS total_count, which is returned apart from the rows.
+    """
+    page_values = {**values, "page_limit": page_size, "page_offset": (page_num - 1) * page_size}
+
+    records = await db.fetch_all(
+        query=f"{query} LIMIT :page_limit OFFSET :page_offset", values=page_values
+    )
+    if records:
+        rows = [dict(record_values(record)) for record in records]
+        total = rows[0]["total_count"]
+        for row in rows:
+            row.pop("total_count")
+        return rows, total
+
+    if page_num == 1:
+        return [], 0
+
+    # page past the end, count the rows of the whole query
+    total = await db.fetch_val(query=f"SELECT COUNT(*) FROM ({query}) AS page_query", values=values)
+    return [], total
+
+
+def encode_cursor(sort_column: str, direction: str, sort_value: Any, id: uuid.UUID) -> str:
+    """
+    Opaque cursor with the sort key and id of the last row of a page, and the
+    ORDER BY it was made for
+    """
+    payload = json.dumps([sort_column, direction, sort_value, str(id)], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_column: str, direction: str, key_type: type) -> Tuple[Any, uuid.UUID]:
+    """
+    Sort key and id of the cursor. Raises ValueError when the cursor was not
+    created by encode_cursor for this ORDER BY, or its key is not a key_type
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        column, order, sort_value, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        id = uuid.UUID(id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+    if (column, order) != (sort_column, direction):
+        raise ValueError(f"El cursor es de otro orden: {column} {order}")
+    # bool is an int in python, the exact type is compared
+    if sort_value is not None and type(sort_value) is not key_type:
+        raise ValueError(f"Clave de cursor inválida: {sort_value!r}")
+    return sort_value, id
+
+
+def keyset_predicate(sort_column: str, id_column: str, direction: str) -> str:
+    """
+    Rows after the cursor for ORDER BY sort_column direction, id_column direction
+    """
+    operator = "<" if direction == "DESC" else ">"
+    return f" ({sort_column}, {id_column}) {operator} (:cursor_key, :cursor_id) "
+
+
+async def fetch_keyset_page(
+    db: Database,
+    query: str,
+    values: Dict,
+    sort_field: str,
+    page_size: int,
+    sort_column: str,
+    direction: str,
+) -> Tuple[List[Dict], str | None]:
+    """
+    Runs a list query already filtered by keyset_predicate and ordered by
+    sort_column direction. Reads one row more than the page to know if there
+    is a next one.
+    """
+    records = await db.fetch_all(
+        query=f"{query} LIMIT :page_limit", values={**values, "page_limit": page_size + 1}
+    )
+    rows = [dict(record_values(record)) for record in records[:page_size]]
+
+    next_cursor = None
+    if len(records) > page_size:
+        next_cursor = encode_cursor(sort_column, direction, rows[-1][sort_field], rows[-1]["id"])
+
+    return rows, next_cursor
+
+
+async def iterate_records(db: Database, query: str, prefetch: int = 500) -> AsyncGenerator[Dict, None]:
+    """
+    Reads the rows of query with a server side cursor, prefetch rows per round
+    trip. Closing the generator ends the transaction and releases the
+    connection at once, Database.iterate leaves that to the garbage collector.
+    """
+    async with db.connection() as connection:
+        async with connection.transaction():
+            async for record in connection.raw_connection.cursor(query, prefetch=prefetch):
+                yield dict(record)
@@ -1,8 +1,16 @@
 from datetime import datetime
 import pytz
+from typing import Generic, List, TypeVar
 from uuid import UUID
 
-from pydantic import BaseModel, BaseConfig, validator
+from pydantic import BaseModel, BaseConfig, conint, constr, validator
+from pydantic.generics import GenericModel
+
+
+# the VARCHAR(255) and INTEGER columns, a value out of them is rejected by the
+# schema instead of failing the whole statement in the database
+Varchar255 = constr(max_length=255)
+Integer = conint(ge=-2 ** 31, le=2 ** 31 - 1)
 
 
 class BaseSchema(BaseModel):
@@ -23,3 +31,56 @@ class DateTimeModelMixin(BaseModel):
 
 class IDModelMixin(BaseModel):
     id: UUID
+
+
+class BulkItemError(BaseModel):
+    index: int
+    msg: str
+
+
+class BulkResult(BaseModel):
+    created: int
+    errors: List[BulkItemError] = []
+
+
+class ImportReject(BaseModel):
+    line: int
+    msg: str
+
+
+class ImportResult(BaseModel):
+    rows: int
+    created: int
+    updated: int
+    duplicated: int
+    rejected: int
+    rejects: List[ImportReject] = []
+
+
+ItemT = TypeVar("ItemT")
+
+
+class PageLinks(BaseModel):
+    previous: str | None
+    next: str | None
+
+
+# response of sql_pagination
+class Page(GenericModel, Generic[ItemT]):
+    data: List[ItemT]
+    total: int
+    count: int
+    pages: int
+    pagination: PageLinks
+
+
+class CursorPageLinks(BaseModel):
+    next: str | None
+
+
+# response of cursor_pagination
+class CursorPage(GenericModel, Generic[ItemT]):
+    data: List[ItemT]
+    count: int
+    next_cursor: str | None
+    pagination: CursorPageLinks
@@ -1,7 +1,9 @@
 import inspect
 from loguru import logger
+from starlette.responses import Response
 
 from shared.utils.app_exceptions import AppExceptionCase
+from shared.utils.orjson_response import ORJSONResponse
 
 
 class ServiceResult(object):
@@ -45,3 +47,21 @@ def handle_result(result: ServiceResult):
             raise exception
     with result as result:
         return result
+
+
+def handle_json_result(result: ServiceResult) -> Response:
+    """_
+        handle_result for routes whose services already return the response
+        models, or the dicts of a ?fields= projection. The value is rendered
+        once with orjson, FastAPI does not validate it against the
+        response_model nor encode it with jsonable_encoder again.
+    """
+    if not result.success:
+        with result as exception:
+            logger.error(f"{exception} | caller={caller_info()}")
+            raise exception
+    with result as result:
+        # a 304 of a conditional GET or a response that carries headers
+        if isinstance(result, Response):
+            return result
+        return ORJSONResponse(result)
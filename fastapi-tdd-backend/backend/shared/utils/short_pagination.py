@@ -1,5 +1,6 @@
 import math
 from typing import Dict, List
+from urllib.parse import urlencode
 
 from loguru import logger
 
@@ -7,34 +8,66 @@ from loguru import logger
 def short_pagination(page_num: int, page_size: int, data_list: List, route: str) -> Dict:
     start = (page_num - 1) * page_size
     end = start + page_size
-    data_length = len(data_list)
-    pages = math.ceil(data_length / page_size)
+
+    return sql_pagination(
+        page_num=page_num,
+        page_size=page_size,
+        data_list=data_list[start:end],
+        total=len(data_list),
+        route=route,
+    )
+
+
+def sql_pagination(page_num: int, page_size: int, data_list: List, total: int, route: str) -> Dict:
+    """
+    Builds the pagination response for a page already limited in SQL,
+    total is the number of rows of the whole query
+    """
+    end = page_num * page_size
+    pages = math.ceil(total / page_size)
 
     response = {
-        "data": data_list[start:end],
-        "total": len(data_list),
+        "data": data_list,
+        "total": total,
         "count": page_size,
         "pages": pages,
         "pagination": {},
     }
 
-    if end >= data_length:
+    if page_num > 1:
+        response["pagination"][
+            "previous"
+        ] = f"{route}?page_number={page_num-1}&page_size={page_size}"
+    else:
+        response["pagination"]["previous"] = None
+
+    if end >= total:
         response["pagination"]["next"] = None
-        if page_num > 1:
-            response["pagination"][
-                "previous"
-            ] = f"{route}?page_number={page_num-1}&page_size{page_size}"
-        else:
-            response["pagination"]["previous"] = None
     else:
-        if page_num > 1:
-            response["pagination"][
-                "previous"
-            ] = f"{route}?page_number={page_num-1}&page_size{page_size}"
-        else:
-            response["pagination"]["previous"] = None
+        response["pagination"]["next"] = f"{route}?page_number={page_num+1}&page_size={page_size}"
 
-        response["pagination"]["next"] = f"{route}?page_number={page_num+1}&page_size{page_size}"
+    return response
+
+
+def cursor_pagination(
+    page_size: int, data_list: List, next_cursor: str | None, route: str, params: Dict | None = None
+) -> Dict:
+    """
+    Builds the response of a keyset page, next_cursor is None on the last page.
+    params are the other query parameters of the request (search, order...),
+    the next page must be read with the same ones.
+    """
+    response = {
+        "data": data_list,
+        "count": page_size,
+        "next_cursor": next_cursor,
+        "pagination": {"next": None},
+    }
+
+    if next_cursor:
+        query = {name: value for name, value in (params or {}).items() if value}
+        query.update(cursor=next_cursor, page_size=page_size)
+        response["pagination"]["next"] = f"{route}?{urlencode(query)}"
 
     return response
 
@@ -1,8 +1,20 @@
+from modules.users.permissions import get_permission_registry
 from modules.users.users.user_schemas import UserInDB
 
 
 def is_authorized(current_user: UserInDB, endpoint: str) -> bool:
-    if current_user.is_superadmin or endpoint in current_user.permissions:
+    if current_user.is_superadmin:
         return True
-    else:
-        return False
+
+    registry = get_permission_registry()
+    bit = registry.bits.get(endpoint)
+    # a mask built with another catalog, e.g. by another release, tests other bits
+    if (
+        current_user.permissions_mask is not None
+        and current_user.permissions_catalog == registry.fingerprint
+        and bit is not None
+    ):
+        return current_user.permissions_mask & bit != 0
+
+    # users loaded without a valid mask or permissions without a bit
+    return endpoint in (current_user.permissions or [])
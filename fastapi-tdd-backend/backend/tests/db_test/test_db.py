@@ -0,0 +1,284 @@
+import asyncio
+from uuid import UUID, uuid4
+
+import asyncpg
+import pytest
+from databases import Database
+from fastapi import APIRouter, Depends, FastAPI, status
+from httpx import AsyncClient
+
+from modules.product.product_exceptions import ProductExceptions
+from modules.product.product_repositories import ProductRepository
+from modules.product.product_schemas import ProductToSave
+from modules.product.product_sqlstatements import GET_PRODUCT_BY_ID, PRODUCT_COLUMNS
+from modules.users.users.user_sqlstaments import GET_USER_BY_USERNAME
+from shared.core.db import db_statements
+from shared.core.db.db_dependencies import UnitOfWorkRoute, get_database
+from shared.core.db.db_notify import CHANGES_CHANNEL, ChangesListener
+from shared.core.db.db_pool import pool_monitor
+from shared.core.db.db_replicas import LAST_WRITE_COOKIE, WRITERS_ENTITY, ReplicaDatabase, replica_router
+from shared.utils.repository_utils import projection
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def unit_of_work_router() -> APIRouter:
+    router = APIRouter(route_class=UnitOfWorkRoute)
+
+    @router.get("/uow/backends", name="uow:backends")
+    async def backends(db: Database = Depends(get_database)) -> int:
+        pids = {await db.fetch_val("SELECT pg_backend_pid()") for _ in range(5)}
+        return len(pids)
+
+    @router.post("/uow/fails", name="uow:fails")
+    async def fails(db: Database = Depends(get_database)) -> None:
+        await ProductRepository(db).create_product(
+            ProductToSave(product_name="producto revertido", description="uow", price=1.0)
+        )
+        raise ProductExceptions.ProductCreateException()
+
+    return router
+
+
+class TestUnitOfWork:
+    async def test_request_runs_on_one_connection(self, app: FastAPI, client: AsyncClient) -> None:
+        app.include_router(unit_of_work_router())
+
+        res = await client.get(app.url_path_for("uow:backends"))
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == 1
+
+    async def test_failed_mutation_is_rolled_back(self, app: FastAPI, client: AsyncClient) -> None:
+        app.include_router(unit_of_work_router())
+
+        res = await client.post(app.url_path_for("uow:fails"))
+        assert res.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        record = await app.state._db.fetch_one(
+            query="SELECT id FROM product WHERE product_name = :name",
+            values={"name": "producto revertido"},
+        )
+        assert record is None
+
+
+class TestConnectionPool:
+    async def test_metrics_publish_pool_gauges(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        await client.get(app.url_path_for("product:get_product_list"))
+
+        res = await client.get("/metrics")
+        pool = res.json()["db_pool"]
+
+        assert pool["size"] == pool["in_use"] + pool["idle"]
+        assert pool["max_size"] >= pool["size"]
+        assert pool["waiters"] == 0
+        assert pool["acquire_wait_seconds"]["count"] > 0
+        assert pool["acquire_wait_seconds"]["buckets"]["+Inf"] == pool["acquire_wait_seconds"]["count"]
+
+    async def test_long_holds_are_counted(self) -> None:
+        long_holds = pool_monitor.long_holds
+
+        pool_monitor.held("product:get_product_list", pool_monitor.hold_warning / 2)
+        pool_monitor.held("product:get_product_list", pool_monitor.hold_warning + 1)
+
+        assert pool_monitor.long_holds == long_holds + 1
+
+    async def test_exhausted_pool_answers_503(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        pool = pool_monitor.pool
+        # opening the connections can take longer than the short timeout
+        held = [await pool.acquire() for _ in range(pool.get_max_size())]
+        timeout, pool.acquire_timeout = pool.acquire_timeout, 0.05
+        try:
+            res = await client.post(
+                app.url_path_for("product:create-product"),
+                json={"product": {"product_name": "producto sin pool", "description": "503", "price": 1.0}},
+            )
+        finally:
+            for connection in held:
+                await pool.release(connection)
+            pool.acquire_timeout = timeout
+
+        assert res.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert pool.timeouts > 0
+
+
+class TestReadReplicas:
+    async def test_reads_go_to_replica_until_the_client_writes(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        primary = app.state._db
+        # la misma base de datos hace de réplica
+        replica = ReplicaDatabase(primary.url, primary=primary, min_size=1, max_size=2)
+        await replica.connect()
+        replica_router.replicas = [replica]
+        try:
+            replica_reads = replica_router.replica_reads
+            res = await client.get(app.url_path_for("product:get_product_list"))
+            assert res.status_code == status.HTTP_200_OK
+            assert replica_router.replica_reads == replica_reads + 1
+
+            res = await client.post(
+                app.url_path_for("product:create-product"),
+                json={"product": {"product_name": "producto réplica", "description": "rw", "price": 1.5}},
+            )
+            assert LAST_WRITE_COOKIE in res.cookies
+            test_id = res.json()["id"]
+
+            primary_reads = replica_router.primary_reads
+            res = await client.get(app.url_path_for("product:get-product-by-id", id=test_id))
+            assert res.status_code == status.HTTP_200_OK
+            assert replica_router.primary_reads == primary_reads + 1
+
+            # otro worker no conoce la escritura, la cookie lo lleva al primario
+            replica_router._recent_writers.clear()
+            res = await client.get(app.url_path_for("product:get_product_list"))
+            assert replica_router.primary_reads == primary_reads + 2
+        finally:
+            replica_router.replicas = []
+            await replica.disconnect()
+
+    async def test_writes_outside_a_transaction_are_recorded(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        primary = app.state._db
+        replica = ReplicaDatabase(primary.url, primary=primary, min_size=1, max_size=2)
+        await replica.connect()
+        replica_router.replicas = [replica]
+        try:
+            # POST /users runs without_unit_of_work
+            role_id = await primary.fetch_val("SELECT role_id FROM users LIMIT 1")
+            res = await client.post(
+                app.url_path_for("users:create-user"),
+                json={
+                    "user": {
+                        "fullname": "Usuario Replica",
+                        "username": "usuario_replica",
+                        "email": "usuario_replica@prueba.com",
+                        "password": "psw_super_secreto",
+                        "is_superadmin": False,
+                        "role_id": str(role_id),
+                    }
+                },
+            )
+            assert res.status_code == status.HTTP_201_CREATED
+            assert LAST_WRITE_COOKIE in res.cookies
+        finally:
+            replica_router.replicas = []
+            await replica.disconnect()
+
+    async def test_other_workers_learn_the_write_without_the_cookie(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        primary = app.state._db
+        replica = ReplicaDatabase(primary.url, primary=primary, min_size=1, max_size=2)
+        await replica.connect()
+        replica_router.replicas = [replica]
+        payloads = []
+        listening = await asyncpg.connect(str(primary.url))
+        await listening.add_listener(CHANGES_CHANNEL, lambda *args: payloads.append(args[-1]))
+        try:
+            await client.post(
+                app.url_path_for("product:create-product"),
+                json={"product": {"product_name": "producto otro lector", "description": "rw", "price": 1.5}},
+            )
+            for _ in range(50):
+                writes = [payload for payload in payloads if f":{WRITERS_ENTITY}:" in payload]
+                if writes:
+                    break
+                await asyncio.sleep(0.02)
+            client_key = writes[0].rsplit(":", 1)[-1]
+
+            # la escritura llega a este worker como si la hubiera servido otro, sin cookie
+            replica_router._recent_writers.clear()
+            client.cookies.clear()
+            await primary.execute(
+                query="SELECT pg_notify(:channel, :payload)",
+                values={"channel": CHANGES_CHANNEL, "payload": f"otro_worker:{WRITERS_ENTITY}:{client_key}"},
+            )
+            for _ in range(50):
+                if replica_router._recent_writers.get(client_key) is not None:
+                    break
+                await asyncio.sleep(0.02)
+
+            primary_reads = replica_router.primary_reads
+            await client.get(app.url_path_for("product:get_product_list"))
+            assert replica_router.primary_reads == primary_reads + 1
+        finally:
+            await listening.close()
+            replica_router.replicas = []
+            await replica.disconnect()
+
+
+
+class TestPreparedStatements:
+    async def test_compile_statement_numbers_the_parameters(self) -> None:
+        statement = db_statements.compile_statement("SELECT :id::uuid, ':id', :name WHERE t.id = :id")
+        assert statement.sql == "SELECT $1::uuid, ':id', $2 WHERE t.id = $1"
+        assert statement.names == ("id", "name")
+        assert statement.arguments({"name": "a", "id": 1}) == [1, "a"]
+
+    async def test_hot_statements_are_prepared_on_connect(self, app: FastAPI, client: AsyncClient) -> None:
+        async with app.state._db.connection() as connection:
+            rows = await connection.fetch_all("SELECT statement FROM pg_prepared_statements")
+        prepared = {row["statement"] for row in rows}
+
+        get_by_id = GET_PRODUCT_BY_ID.format(**projection(PRODUCT_COLUMNS))
+        assert db_statements.compile_statement(get_by_id).sql in prepared
+        assert db_statements.compile_statement(GET_USER_BY_USERNAME).sql in prepared
+
+    async def test_prepared_rows_match_databases(self, app: FastAPI, authorized_client: AsyncClient) -> None:
+        client = await authorized_client
+        db = app.state._db
+        res = await client.post(
+            app.url_path_for("product:create-product"),
+            json={"product": {"product_name": "producto preparado", "description": "ps", "price": 3.5}},
+        )
+        test_id = UUID(res.json()["id"])
+
+        query = GET_PRODUCT_BY_ID.format(**projection(PRODUCT_COLUMNS))
+        expected = await db.fetch_one(query=query, values={"id": test_id})
+        record = await db_statements.fetch_one(db, query, {"id": test_id})
+        assert dict(record) == dict(expected._mapping)
+        assert await db_statements.fetch_one(db, query, {"id": uuid4()}) is None
+
+
+class TestChangesListener:
+    async def test_listener_that_cannot_start_retries_in_the_background(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        resets = []
+
+        async def on_change(entity: str, id: str) -> None:
+            pass
+
+        async def on_reset() -> None:
+            resets.append(True)
+
+        # nothing listens on port 1
+        listener = ChangesListener(
+            "postgresql://postgres@127.0.0.1:1/postgres", on_change=on_change, on_reset=on_reset, retry_seconds=0.01
+        )
+        await listener.connect()
+        try:
+            assert listener._connection is None
+
+            listener.dsn = str(app.state._db.url)
+            for _ in range(100):
+                if resets:
+                    break
+                await asyncio.sleep(0.02)
+
+            assert resets == [True]
+            assert not listener._connection.is_closed()
+        finally:
+            await listener.stop()
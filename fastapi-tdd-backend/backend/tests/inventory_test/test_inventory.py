@@ -82,13 +82,33 @@ class TestGetInventory:
     ) -> None:
         client = await authorized_client
         
-        res = await client.get(app.url_path_for("inventory:inventory_list"))
+        res = await client.get(app.url_path_for("inventory:get_inventory_list"))
         
         assert res.status_code == status.HTTP_200_OK
         assert len(res.json()) > 0
         
         
         
+    #Buscar sin distinguir mayúsculas:
+    async def test_search_inventory_list_is_case_insensitive(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        await client.post(
+            app.url_path_for("inventory:create-inventory"),
+            json={"inventory": {"inventory_name": "Inventario Búsqueda", "location_stock": "A1"}},
+        )
+
+        res = await client.get(
+            app.url_path_for("inventory:get_inventory_list"), params={"search": "inventario bús"}
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        names = [item["inventory_name"] for item in res.json()["data"]]
+        assert "Inventario Búsqueda" in names
+
+
+
     #Obtener una tarea por su id:
     async def test_get_inventory_by_id(
         self, 
@@ -154,7 +174,7 @@ class TestUpdateInventory:
         client = await authorized_client
 
         res1 = await client.get(
-            app.url_path_for("inventory:inventory_list")
+            app.url_path_for("inventory:get_inventory_list")
         )
         inventory_in_db = res1.json().get("data")[0]
 
@@ -189,7 +209,7 @@ class TestUpdateInventory:
         client = await authorized_client
         
         res1 = await client.get(
-            app.url_path_for("inventory:inventory_list")
+            app.url_path_for("inventory:get_inventory_list")
         )
         inventory_in_db = res1.json().get("data")[0]
         test_id = inventory_in_db.get("id")
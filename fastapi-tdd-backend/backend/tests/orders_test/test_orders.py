@@ -1,10 +1,19 @@
+import json
 import pytest
 from uuid import UUID, uuid4
 
+from datetime import datetime
+
+import pytz
 from fastapi import FastAPI, status
+from fastapi.encoders import jsonable_encoder
 from httpx import AsyncClient
 from loguru import logger
 
+from shared.utils.export_stream import export_rows
+from shared.utils.orjson_response import ORJSONResponse
+from shared.utils.short_pagination import sql_pagination
+import shared.utils.repository_utils as ru
 from modules.orders.orders_schemas import OrdersCreate, OrdersInDB, OrdersToUpdate
 
 
@@ -75,6 +84,35 @@ class TestCreateOrders:
     
     
         
+class TestBulkCreateOrders:
+    async def test_bulk_create_reports_errors_per_item(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        items = [{"orders_name": f"pedido en lote {i}", "state": "nuevo"} for i in range(5)]
+        items.append({"orders_name": "ab", "state": "nuevo"})
+        items.append({"orders_name": "pedido en lote 0", "state": "repetido"})
+
+        res = await client.post(app.url_path_for("orders:create-orders-bulk"), json={"items": items})
+
+        assert res.status_code == status.HTTP_201_CREATED
+        result = res.json()
+        assert result["created"] == 5
+        assert [error["index"] for error in result["errors"]] == [5, 6]
+
+        res = await client.post(app.url_path_for("orders:create-orders-bulk"), json={"items": items[:2]})
+
+        assert res.status_code == status.HTTP_201_CREATED
+        result = res.json()
+        assert result["created"] == 0
+        assert [error["msg"] for error in result["errors"]] == ["orders_name ya existe"] * 2
+
+
+
+
 class TestGetOrders:
     #Obtener una lista de tareas:
     async def test_get_orders_list(
@@ -82,13 +120,201 @@ class TestGetOrders:
     ) -> None:
         client = await authorized_client
         
-        res = await client.get(app.url_path_for("orders:orders_list"))
+        res = await client.get(app.url_path_for("orders:get_orders_list"))
         
         assert res.status_code == status.HTTP_200_OK
         assert len(res.json()) > 0
         
         
         
+    #Recorrer la lista completa con cursor:
+    async def test_get_orders_list_with_cursor(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        url = app.url_path_for("orders:get_orders_list")
+        for name in ("cursor order a", "cursor order b", "cursor order c"):
+            await client.post(
+                app.url_path_for("orders:create-orders"),
+                json={"orders": {"orders_name": name, "state": "test_state"}},
+            )
+
+        # every order has the same status, ties are broken by id
+        res = await client.get(url, params={"page_size": 1000, "order": "status"})
+        expected_ids = [item["id"] for item in res.json()["data"]]
+
+        ids = []
+        cursor = ""
+        while cursor is not None:
+            res = await client.get(
+                url, params={"cursor": cursor, "page_size": 2, "order": "status"}
+            )
+            assert res.status_code == status.HTTP_200_OK
+            page = res.json()
+            assert len(page["data"]) <= 2
+            ids.extend(item["id"] for item in page["data"])
+            cursor = page["next_cursor"]
+
+        assert ids == expected_ids
+
+    async def test_next_link_keeps_the_order_of_the_list(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        url = app.url_path_for("orders:get_orders_list")
+        for name in ("enlace order a", "enlace order b", "enlace order c"):
+            await client.post(
+                app.url_path_for("orders:create-orders"),
+                json={"orders": {"orders_name": name, "state": "test_state"}},
+            )
+        params = {"search": "enlace order", "order": "name", "direction": "DESC"}
+
+        res = await client.get(url, params={**params, "page_size": 1000})
+        expected_ids = [item["id"] for item in res.json()["data"]]
+
+        ids = []
+        res = await client.get(url, params={**params, "cursor": "", "page_size": 1})
+        while True:
+            assert res.status_code == status.HTTP_200_OK
+            page = res.json()
+            ids.extend(item["id"] for item in page["data"])
+            if page["pagination"]["next"] is None:
+                break
+            # the link is the list route without its trailing slash
+            res = await client.get(page["pagination"]["next"], follow_redirects=True)
+
+        assert len(expected_ids) == 3
+        assert ids == expected_ids
+
+    @pytest.mark.parametrize(
+        "params",
+        (
+            {"page_size": 0},
+            {"page_size": -5},
+            {"page_number": 0},
+            {"cursor": "", "page_size": 0},
+        ),
+    )
+    async def test_get_orders_list_with_invalid_page(
+        self, app: FastAPI, authorized_client: AsyncClient, params: dict
+    ) -> None:
+        client = await authorized_client
+        res = await client.get(app.url_path_for("orders:get_orders_list"), params=params)
+
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_get_orders_list_with_invalid_cursor(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        res = await client.get(
+            app.url_path_for("orders:get_orders_list"), params={"cursor": "no-es-un-cursor"}
+        )
+
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_cursor_of_another_order_is_rejected(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        url = app.url_path_for("orders:get_orders_list")
+        for name in ("orden cambiado a", "orden cambiado b"):
+            await client.post(
+                app.url_path_for("orders:create-orders"),
+                json={"orders": {"orders_name": name, "state": "test_state"}},
+            )
+
+        res = await client.get(url, params={"cursor": "", "page_size": 1, "order": "status"})
+        next_cursor = res.json()["next_cursor"]
+        assert next_cursor
+
+        # the key of the cursor is a status, the list is now sorted by name
+        res = await client.get(url, params={"cursor": next_cursor, "page_size": 1, "order": "name"})
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        res = await client.get(
+            url, params={"cursor": next_cursor, "page_size": 1, "order": "status", "direction": "DESC"}
+        )
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        # same order, but a key of another type
+        edited = ru.encode_cursor("t.orders_name", "ASC", 1, uuid4())
+        res = await client.get(url, params={"cursor": edited, "page_size": 1})
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_get_orders_list_with_fields(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        url = app.url_path_for("orders:get_orders_list")
+
+        res = await client.get(url, params={"fields": "orders_name"})
+        assert res.status_code == status.HTTP_200_OK
+        page = res.json()
+        assert all(set(item) == {"id", "orders_name"} for item in page["data"])
+
+        # the sort field is read for the cursor but not returned
+        res = await client.get(
+            url, params={"cursor": "", "page_size": 2, "order": "status", "fields": "state"}
+        )
+        assert res.status_code == status.HTTP_200_OK
+        assert all(set(item) == {"id", "state"} for item in res.json()["data"])
+
+        res = await client.get(
+            app.url_path_for("orders:get-orders-by-id", id=page["data"][0]["id"]),
+            params={"fields": "orders_name,created_by"},
+        )
+        assert res.status_code == status.HTTP_200_OK
+        assert set(res.json()) == {"id", "orders_name", "created_by"}
+
+    async def test_get_orders_list_with_unknown_fields(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+        res = await client.get(
+            app.url_path_for("orders:get_orders_list"), params={"fields": "orders_name,password"}
+        )
+
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert res.json().get("app_exception") == "OrdersInvalidFieldsException"
+
+    async def test_orjson_page_matches_jsonable_encoder(self) -> None:
+        now = datetime.now(pytz.timezone("America/Caracas"))
+        orders = [
+            OrdersInDB(
+                id=uuid4(),
+                orders_name=f"pedido {i}",
+                state="test_state",
+                is_active=True,
+                created_at=now,
+                updated_at=now,
+                created_by="Usuario de prueba",
+            )
+            for i in range(3)
+        ]
+        page = sql_pagination(page_num=1, page_size=2, data_list=orders, total=3, route="/orders")
+
+        assert json.loads(ORJSONResponse(page).body) == jsonable_encoder(page)
+
+    async def test_rows_are_mapped_without_validating_again(self) -> None:
+        row = {"id": uuid4(), "orders_name": "ab", "state": "test_state", "total_count": 1}
+        orders = ru.from_record(OrdersInDB, row)
+
+        # the name length validator only runs for request bodies
+        assert orders.orders_name == "ab"
+        assert orders.dict() == {
+            "id": row["id"],
+            "orders_name": "ab",
+            "state": "test_state",
+            "is_active": None,
+            "created_at": None,
+            "updated_at": None,
+            "created_by": None,
+            "updated_by": None,
+        }
+        
+        
+        
     #Obtener una tarea por su id:
     async def test_get_orders_by_id(
         self, 
@@ -144,6 +370,69 @@ class TestGetOrders:
 
 
 
+class TestExportOrders:
+    @pytest.mark.parametrize("file_format", ("csv", "ndjson"))
+    async def test_export_orders_streams_every_row(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        file_format: str,
+    ) -> None:
+        client = await authorized_client
+
+        res = await client.get(app.url_path_for("orders:get_orders_list"))
+        total = res.json()["total"]
+
+        res = await client.get(
+            app.url_path_for("orders:export-orders"), params={"format": file_format}
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        lines = res.text.splitlines()
+        if file_format == "csv":
+            assert lines[0].startswith("id,orders_name,state")
+            assert len(lines) == total + 1
+        else:
+            assert len(lines) == total
+            assert "orders_name" in json.loads(lines[0])
+
+    async def test_export_with_unknown_format(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+
+        res = await client.get(app.url_path_for("orders:export-orders"), params={"format": "xml"})
+
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_closing_the_stream_closes_the_query(self) -> None:
+        closed = []
+
+        async def records():
+            try:
+                for i in range(10):
+                    yield {"id": i}
+            finally:
+                closed.append(True)
+
+        stream = export_rows(records(), "ndjson", ("id",), batch_rows=1)
+        assert await stream.__anext__() == b'{"id": 0}\n'
+        await stream.aclose()
+
+        assert closed == [True]
+
+    async def test_csv_of_an_empty_table_has_the_header(self) -> None:
+        async def records():
+            return
+            yield
+
+        chunks = [chunk async for chunk in export_rows(records(), "csv", ("id", "orders_name"))]
+
+        assert b"".join(chunks) == b"id,orders_name\r\n"
+
+
+
+
 class TestUpdateOrders:
     async def test_update_orders_with_valid_data(
         self,
@@ -154,7 +443,7 @@ class TestUpdateOrders:
         client = await authorized_client
 
         res1 = await client.get(
-            app.url_path_for("orders:orders_list")
+            app.url_path_for("orders:get_orders_list")
         )
         orders_in_db = res1.json().get("data")[0]
 
@@ -189,7 +478,7 @@ class TestUpdateOrders:
         client = await authorized_client
         
         res1 = await client.get(
-            app.url_path_for("orders:orders_list")
+            app.url_path_for("orders:get_orders_list")
         )
         orders_in_db = res1.json().get("data")[0]
         test_id = orders_in_db.get("id")
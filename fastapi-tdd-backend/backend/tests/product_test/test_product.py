@@ -1,3 +1,5 @@
+import asyncio
+import json
 import pytest
 from uuid import UUID, uuid4
 
@@ -5,7 +7,10 @@ from fastapi import FastAPI, status
 from httpx import AsyncClient
 from loguru import logger
 
+from modules.product.product_repositories import product_cache
 from modules.product.product_schemas import ProductCreate, ProductInDB, ProductToUpdate
+from shared.core.db.db_notify import CHANGES_CHANNEL
+from shared.utils.entity_cache import EntityCache, RedisCacheBackend, set_cache_backend
 
 
 pytestmark = pytest.mark.asyncio
@@ -75,6 +80,63 @@ class TestCreateProduct:
     
     
         
+class TestBulkCreateProduct:
+    async def test_bulk_create_products(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        items = [
+            {"product_name": f"producto en lote {i}", "description": "lote", "price": i + 0.5}
+            for i in range(20)
+        ]
+        res = await client.post(app.url_path_for("product:create-product-bulk"), json={"items": items})
+
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json() == {"created": 20, "errors": []}
+
+        res = await client.get(
+            app.url_path_for("product:get_product_list"), params={"search": "producto en lote"}
+        )
+        assert res.json()["total"] == 20
+
+
+
+
+class TestImportProduct:
+    async def test_import_ndjson_products(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        # the file goes as multipart/form-data, not json
+        del client.headers["Content-Type"]
+
+        lines = [
+            json.dumps({"product_name": f"producto importado {i}", "description": "ndjson", "price": i})
+            for i in range(5)
+        ]
+        lines.append("{no es json")
+        content = "\n".join(lines).encode()
+
+        res = await client.post(
+            app.url_path_for("product:import-product"),
+            params={"format": "ndjson"},
+            files={"file": ("productos.txt", content, "text/plain")},
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        result = res.json()
+        assert result["created"] == 5
+        assert result["rejected"] == 1
+        assert result["rejects"][0]["line"] == 6
+
+
+
+
 class TestGetProduct:
     #Obtener una lista de materias primas:
     async def test_get_product_list(
@@ -82,7 +144,7 @@ class TestGetProduct:
     ) -> None:
         client = await authorized_client
         
-        res = await client.get(app.url_path_for("product:product_list"))
+        res = await client.get(app.url_path_for("product:get_product_list"))
         
         assert res.status_code == status.HTTP_200_OK
         assert len(res.json()) > 0
@@ -144,6 +206,209 @@ class TestGetProduct:
         assert res.status_code == status_code
 
 
+class TestConditionalGetProduct:
+    async def test_get_product_by_id_not_modified(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        res1 = await client.post(
+            app.url_path_for("product:create-product"),
+            json={"product": {"product_name": "producto etag", "description": "etag", "price": 3.5}},
+        )
+        test_id = res1.json()["id"]
+        url = app.url_path_for("product:get-product-by-id", id=test_id)
+
+        res = await client.get(url)
+        assert res.status_code == status.HTTP_200_OK
+        etag = res.headers["etag"]
+        last_modified = res.headers["last-modified"]
+
+        res = await client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+        assert res.headers["etag"] == etag
+        assert res.content == b""
+
+        res = await client.get(url, headers={"If-Modified-Since": last_modified})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # otra proyección de la misma fila tiene otro ETag
+        res = await client.get(url, params={"fields": "product_name"}, headers={"If-None-Match": etag})
+        assert res.status_code == status.HTTP_200_OK
+
+        await client.put(
+            app.url_path_for("product:update-product-by-id", id=test_id),
+            json={"product_update": {"price": 4.5}},
+        )
+        res = await client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == status.HTTP_200_OK
+        assert res.headers["etag"] != etag
+        assert res.json()["price"] == 4.5
+
+    async def test_get_product_list_not_modified(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        url = app.url_path_for("product:get_product_list")
+
+        res = await client.get(url)
+        assert res.status_code == status.HTTP_200_OK
+        etag = res.headers["etag"]
+
+        res = await client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+        await client.post(
+            app.url_path_for("product:create-product"),
+            json={"product": {"product_name": "producto etag lista", "description": "etag", "price": 1.5}},
+        )
+        res = await client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == status.HTTP_200_OK
+        assert res.headers["etag"] != etag
+
+
+class RedisStandIn:
+    """
+    The part of redis.asyncio used by RedisCacheBackend, kept in a dict
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if key.startswith(match.rstrip("*")):
+                yield key
+
+    async def close(self):
+        pass
+
+
+class TestProductCache:
+    async def test_get_product_by_id_is_cached_until_updated(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        res1 = await client.post(
+            app.url_path_for("product:create-product"),
+            json={"product": {"product_name": "producto cache", "description": "cache", "price": 2.5}},
+        )
+        test_id = res1.json()["id"]
+        url = app.url_path_for("product:get-product-by-id", id=test_id)
+
+        await client.get(url)
+        hits = product_cache.hits
+        res = await client.get(url)
+        assert res.status_code == status.HTTP_200_OK
+        assert product_cache.hits > hits
+
+        await client.put(
+            app.url_path_for("product:update-product-by-id", id=test_id),
+            json={"product_update": {"price": 7.5}},
+        )
+        res = await client.get(url)
+        assert res.json()["price"] == 7.5
+
+        await client.delete(app.url_path_for("product:delete-product-by-id", id=test_id))
+        res = await client.get(url)
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+
+        negative_hits = product_cache.negative_hits
+        res = await client.get(url)
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+        assert product_cache.negative_hits == negative_hits + 1
+
+    async def test_changes_of_other_workers_evict_the_row(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        db = app.state._db
+
+        res1 = await client.post(
+            app.url_path_for("product:create-product"),
+            json={"product": {"product_name": "producto otro worker", "description": "notify", "price": 3.5}},
+        )
+        test_id = res1.json()["id"]
+        url = app.url_path_for("product:get-product-by-id", id=test_id)
+        await client.get(url)
+
+        # otro worker actualiza el producto sin pasar por esta caché
+        await db.execute(
+            query="UPDATE product SET price = 9.5 WHERE id = :id", values={"id": test_id}
+        )
+        await db.execute(
+            query="SELECT pg_notify(:channel, :payload)",
+            values={"channel": CHANGES_CHANNEL, "payload": f"otro_worker:product:{test_id}"},
+        )
+
+        for _ in range(50):
+            res = await client.get(url)
+            if res.json()["price"] == 9.5:
+                break
+            await asyncio.sleep(0.02)
+
+        assert res.json()["price"] == 9.5
+
+    async def test_concurrent_misses_load_once(self) -> None:
+        cache = EntityCache("product_test", ProductInDB)
+        loads = 0
+
+        async def load():
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.01)
+            return None
+
+        results = await asyncio.gather(*(cache.get_or_load("id", load) for _ in range(10)))
+
+        assert results == [{}] * 10
+        assert loads == 1
+        assert cache.coalesced == 9
+
+    async def test_redis_backend(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        redis = RedisStandIn()
+        previous = set_cache_backend(RedisCacheBackend(redis))
+        try:
+            res1 = await client.post(
+                app.url_path_for("product:create-product"),
+                json={"product": {"product_name": "producto redis", "description": "redis", "price": 1.5}},
+            )
+            test_id = res1.json()["id"]
+            url = app.url_path_for("product:get-product-by-id", id=test_id)
+
+            res = await client.get(url)
+            assert f"entity:product:{test_id}" in redis.data
+
+            cached = await client.get(url)
+            assert cached.json() == res.json()
+            assert ProductInDB(**cached.json()).id == UUID(test_id)
+        finally:
+            set_cache_backend(previous)
+
 
 class TestUpdateProduct:
     async def test_update_product_with_valid_data(
@@ -155,7 +420,7 @@ class TestUpdateProduct:
         client = await authorized_client
 
         res1 = await client.get(
-            app.url_path_for("product:product_list")
+            app.url_path_for("product:get_product_list")
         )
         product_in_db = res1.json().get("data")[0]
 
@@ -191,7 +456,7 @@ class TestUpdateProduct:
         client = await authorized_client
         
         res1 = await client.get(
-            app.url_path_for("product:product_list")
+            app.url_path_for("product:get_product_list")
         )
         product_in_db = res1.json().get("data")[0]
         test_id = product_in_db.get("id")
@@ -226,5 +491,10 @@ class TestDeleteProduct:
         )
         assert res.status_code == status.HTTP_200_OK
 
+        res = await client.delete(
+            app.url_path_for("product:delete-product-by-id", id=test_id)
+        )
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+
 # def test_placeholder():
 #     pass
@@ -5,7 +5,8 @@ from fastapi import FastAPI, status
 from httpx import AsyncClient
 from loguru import logger
 
-from modules.raw_material.raw_material_schemas import Raw_materialCreate, Raw_materialInDB, Raw_materialToUpdate
+from modules.raw_material.raw_material_repositories import Raw_materialRepository
+from modules.raw_material.raw_material_schemas import Raw_materialCreate, Raw_materialInDB, Raw_materialToSave, Raw_materialToUpdate
 
 
 pytestmark = pytest.mark.asyncio
@@ -71,10 +72,162 @@ class TestCreateRaw_material:
         )
         
         assert res.status_code == status_code
-    
-    
-    
-        
+
+
+
+
+class TestBulkCreateRaw_material:
+    async def test_values_out_of_the_columns_are_reported_per_item(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        items = [
+            {"raw_material_name": f"materia en lote {i}", "provider": "lote", "quantity": i}
+            for i in range(5)
+        ]
+        # integer column, and a provider longer than its VARCHAR(255)
+        items[1]["quantity"] = 2 ** 40
+        items[3]["provider"] = "p" * 300
+        res = await client.post(
+            app.url_path_for("raw_material:create-raw_material-bulk"), json={"items": items}
+        )
+
+        assert res.status_code == status.HTTP_201_CREATED
+        result = res.json()
+        assert result["created"] == 3
+        assert [error["index"] for error in result["errors"]] == [1, 3]
+
+        res = await client.get(
+            app.url_path_for("raw_material:get_raw_material_list"), params={"search": "materia en lote"}
+        )
+        assert res.json()["total"] == 3
+
+    async def test_rows_rejected_by_the_database_keep_the_others(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+    ) -> None:
+        # built without validation, only the database can reject them
+        items = [
+            Raw_materialToSave.construct(raw_material_name=f"materia sin validar {i}", provider="lote", quantity=i)
+            for i in range(4)
+        ]
+        items[2] = Raw_materialToSave.construct(
+            raw_material_name="materia sin validar 2", provider="p" * 300, quantity=2
+        )
+
+        created, failed = await Raw_materialRepository(app.state._db).create_raw_material_bulk(items)
+
+        assert created == {f"materia sin validar {i}" for i in (0, 1, 3)}
+        assert list(failed) == [2]
+
+    async def test_too_many_items_is_rejected(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        client = await authorized_client
+        monkeypatch.setattr("modules.raw_material.raw_material_services.BULK_MAX_ITEMS", 2)
+
+        items = [
+            {"raw_material_name": f"materia de sobra {i}", "provider": "lote", "quantity": i}
+            for i in range(3)
+        ]
+        res = await client.post(
+            app.url_path_for("raw_material:create-raw_material-bulk"), json={"items": items}
+        )
+
+        assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+
+
+class TestImportRaw_material:
+    async def test_import_csv_merges_on_name_and_reports_rejects(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        # the file goes as multipart/form-data, not json
+        del client.headers["Content-Type"]
+
+        lines = ["raw_material_name,provider,quantity"]
+        lines += [f"materia importada {i},proveedor csv,{i}" for i in range(10)]
+        lines += ["ab,proveedor csv,1", "materia sin cantidad,proveedor csv,", "materia importada 0,proveedor nuevo,99"]
+        content = "\n".join(lines).encode()
+
+        res = await client.post(
+            app.url_path_for("raw_material:import-raw_material"),
+            files={"file": ("materias.csv", content, "text/csv")},
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        result = res.json()
+        assert result["rows"] == 13
+        assert result["created"] == 10
+        assert result["duplicated"] == 1
+        assert [reject["line"] for reject in result["rejects"]] == [12, 13]
+
+        res = await client.post(
+            app.url_path_for("raw_material:import-raw_material"),
+            files={"file": ("materias.csv", content, "text/csv")},
+        )
+        assert res.json()["updated"] == 10
+
+        res = await client.get(
+            app.url_path_for("raw_material:get_raw_material_list"),
+            params={"search": "materia importada 0"},
+        )
+        assert res.json()["data"][0]["quantity"] == 99
+
+    async def test_import_unsupported_format(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        # the file goes as multipart/form-data, not json
+        del client.headers["Content-Type"]
+
+        res = await client.post(
+            app.url_path_for("raw_material:import-raw_material"),
+            files={"file": ("materias.xlsx", b"...", "application/octet-stream")},
+        )
+
+        assert res.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+    async def test_values_out_of_the_columns_are_rejects(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+        # the file goes as multipart/form-data, not json
+        del client.headers["Content-Type"]
+
+        lines = ["raw_material_name,provider,quantity"]
+        lines += [f"materia acotada {i},proveedor csv,{i}" for i in range(3)]
+        lines += [f"materia muy larga,{'p' * 300},1", f"materia muy grande,proveedor csv,{2 ** 40}"]
+        content = "\n".join(lines).encode()
+
+        res = await client.post(
+            app.url_path_for("raw_material:import-raw_material"),
+            files={"file": ("materias.csv", content, "text/csv")},
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        result = res.json()
+        assert result["created"] == 3
+        assert [reject["line"] for reject in result["rejects"]] == [5, 6]
+
+
+
+
 class TestGetRaw_material:
     #Obtener una lista de materias primas:
     async def test_get_raw_material_list(
@@ -82,7 +235,7 @@ class TestGetRaw_material:
     ) -> None:
         client = await authorized_client
         
-        res = await client.get(app.url_path_for("raw_material:raw_material_list"))
+        res = await client.get(app.url_path_for("raw_material:get_raw_material_list"))
         
         assert res.status_code == status.HTTP_200_OK
         assert len(res.json()) > 0
@@ -155,7 +308,7 @@ class TestUpdateRaw_material:
         client = await authorized_client
 
         res1 = await client.get(
-            app.url_path_for("raw_material:raw_material_list")
+            app.url_path_for("raw_material:get_raw_material_list")
         )
         raw_material_in_db = res1.json().get("data")[0]
 
@@ -174,6 +327,45 @@ class TestUpdateRaw_material:
         raw_material_updated = res.json()
         assert raw_material_updated["raw_material_name"] == raw_material_update.raw_material_name
 
+    async def test_partial_update_only_changes_sent_fields(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        res1 = await client.post(
+            app.url_path_for("raw_material:create-raw_material"),
+            json={"raw_material": {"raw_material_name": "materia parcial", "provider": "proveedor", "quantity": 3}},
+        )
+        raw_material_in_db = res1.json()
+
+        res = await client.put(
+            app.url_path_for("raw_material:update-raw_material-by-id", id=raw_material_in_db["id"]),
+            json={"raw_material_update": {"quantity": 7}},
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        raw_material_updated = res.json()
+        assert raw_material_updated["quantity"] == 7
+        assert raw_material_updated["raw_material_name"] == "materia parcial"
+        assert raw_material_updated["provider"] == "proveedor"
+        assert raw_material_updated["created_at"] == raw_material_in_db["created_at"]
+
+    async def test_update_missing_raw_material_returns_not_found(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+    ) -> None:
+        client = await authorized_client
+
+        res = await client.put(
+            app.url_path_for("raw_material:update-raw_material-by-id", id=uuid4()),
+            json={"raw_material_update": {"quantity": 7}},
+        )
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+
     @pytest.mark.parametrize(
         "attrs_to_change, value",
         (
@@ -191,7 +383,7 @@ class TestUpdateRaw_material:
         client = await authorized_client
         
         res1 = await client.get(
-            app.url_path_for("raw_material:raw_material_list")
+            app.url_path_for("raw_material:get_raw_material_list")
         )
         raw_material_in_db = res1.json().get("data")[0]
         test_id = raw_material_in_db.get("id")
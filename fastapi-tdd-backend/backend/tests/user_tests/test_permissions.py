@@ -5,6 +5,8 @@ from fastapi import FastAPI, status
 from httpx import AsyncClient
 from loguru import logger
 
+from modules.users.permissions import PUBLIC_ROUTES, get_permission_registry
+
 
 pytestmark = pytest.mark.asyncio
 
@@ -26,3 +28,22 @@ class TestGetPermissions:
         assert res.status_code == status.HTTP_200_OK
         assert isinstance(res.json(), list)
         assert len(res.json()) > 0
+
+
+class TestPermissionRegistry:
+    async def test_registry_matches_registered_routes(self, app: FastAPI) -> None:
+        registry = get_permission_registry()
+        route_names = {route.name for route in app.routes if route.name.count(":") == 1}
+
+        assert registry.names == route_names - PUBLIC_ROUTES
+        assert registry.is_valid("inventory:get_inventory_list")
+        assert not registry.is_valid("auth:login")
+        assert registry is get_permission_registry()
+
+    async def test_registry_groups_permissions_by_functionality(self) -> None:
+        registry = get_permission_registry()
+
+        assert registry.find_functionality("INVENT") == "INVENTARIO"
+        assert registry.find_functionality("NOPE") == ""
+        assert "orders:create-orders" in registry.get_functionality_permissions("ORDERS")
+        assert "roles:create-role" in registry.get_functionality_permissions("USUARIOS")
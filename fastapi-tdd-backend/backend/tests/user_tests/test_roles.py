@@ -8,8 +8,10 @@ from httpx import AsyncClient
 from icecream import ic
 from loguru import logger
 
+from modules.users.permissions import get_permission_registry
 from modules.users.roles.role_repositories import RoleRepository
 from modules.users.roles.role_schemas import RoleCreate, RoleIn, RoleOut
+from modules.users.users.user_schemas import UserInDB
 
 pytestmark = pytest.mark.asyncio
 
@@ -97,6 +99,19 @@ class TestCreateRole:
         )
         assert res.status_code == status_code
 
+    async def test_duplicated_role_name_returns_conflict(
+        self, app: FastAPI, authorized_client: AsyncClient, test_role: RoleOut
+    ) -> None:
+        client = await authorized_client
+        role_in_db = await test_role
+        res = await client.post(
+            app.url_path_for("roles:create-role"),
+            json={"role": {"role": role_in_db.role, "permissions": role_in_db.permissions}},
+        )
+
+        assert res.status_code == status.HTTP_409_CONFLICT
+        assert res.json().get("app_exception") == "RoleAlreadyExistsExcepton"
+
 
 class TestGetRolesList:
     async def test_get_roles_list(
@@ -176,6 +191,27 @@ class TestGetRolesList:
         assert res.status_code == status
 
 
+    async def test_search_roles_by_functionality(
+        self, client: AsyncClient, db: Database, test_role: RoleOut
+    ) -> None:
+        role_in_db = await test_role
+        roles, total = await RoleRepository(db).get_roles_list(
+            search="usuarios", order=None, direction=None, page_size=100
+        )
+
+        assert role_in_db.id in [role.id for role in roles]
+        assert all(
+            set(role.permissions) & set(get_permission_registry().functionalities["USUARIOS"])
+            for role in roles
+        )
+
+    async def test_sync_permissions_masks_is_idempotent(
+        self, client: AsyncClient, db: Database
+    ) -> None:
+        await RoleRepository(db).sync_permissions_masks()
+        assert await RoleRepository(db).sync_permissions_masks() == 0
+
+
 class TestGetRoleById:
     async def test_get_role_by_id(
         self, app: FastAPI, authorized_client: AsyncClient, test_role: RoleOut
@@ -189,6 +225,19 @@ class TestGetRoleById:
         assert res.status_code == status.HTTP_200_OK
         assert (res.json()).get("id") == str(role_in_db.id)
 
+    async def test_changing_a_cached_role_does_not_change_the_cache(
+        self, app: FastAPI, client: AsyncClient, test_role: RoleOut
+    ) -> None:
+        role_in_db = await test_role
+        repository = RoleRepository(app.state._db)
+
+        role = await repository.get_role_by_id(role_in_db.id)
+        permissions = list(role.permissions)
+        role.permissions.append("roles:otro-permiso")
+
+        cached = await repository.get_role_by_id(role_in_db.id)
+        assert cached.permissions == permissions
+
     @pytest.mark.parametrize(
         "id, status_code",
         (
@@ -337,6 +386,19 @@ class TestDeleteUser:
         )
         assert res.status_code == status.HTTP_404_NOT_FOUND
 
+    async def test_can_not_delete_role_in_use(
+        self, app: FastAPI, authorized_client: AsyncClient, otro_test_user: UserInDB
+    ) -> None:
+        client = await authorized_client
+        user_in_db = await otro_test_user
+
+        res = await client.delete(
+            app.url_path_for("roles:delete-role-by-id", id=user_in_db.role_id)
+        )
+
+        assert res.status_code == status.HTTP_409_CONFLICT
+        assert res.json().get("app_exception") == "UsersUsingRoleException"
+
     @pytest.mark.parametrize(
         "id, status_code",
         (
@@ -1,3 +1,7 @@
+import asyncio
+import json
+import threading
+
 import pytest
 import jwt
 from typing import List, Type
@@ -14,12 +18,16 @@ from starlette.datastructures import Secret
 
 from modules.users.roles.role_repositories import RoleRepository
 from modules.users.roles.role_schemas import RoleIn
+from modules.users.auths.auth_cache import cache_principal, principal_cache, set_role_version
 from modules.users.auths.auth_exceptions import AuthExceptions
+from modules.users.auths.auth_hashing import PasswordHasher, password_hasher
 from modules.users.auths.auth_schemas import JWTCreds, JWTMeta, JWTPayload
 from modules.users.auths.auth_services import AuthService
+from modules.users.permissions import get_permission_registry
 from modules.users.permissions.permissions_schemas import PermissionsOut
 from modules.users.roles.role_schemas import RoleOut
 from modules.users.users.user_schemas import (
+    UserActivate,
     UserCreate,
     UserIn,
     UserOut,
@@ -27,7 +35,7 @@ from modules.users.users.user_schemas import (
     UserPublic,
 )
 from modules.users.users.user_services import UserService
-from modules.users.users.user_repositories import UserRepository
+from modules.users.users.user_repositories import UserRepository, user_token_cache
 from shared.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     JWT_ALGORITHM,
@@ -37,8 +45,10 @@ from shared.core.config import (
     SUPER_ROLE,
     SUPER_PASSWORD,
 )
+from shared.core.db.db_pool import pool_monitor
 from shared.utils.crypto_credentials import CryptoAES
 from shared.utils.service_result import ServiceResult
+from shared.utils.verify_auth import is_authorized
 
 
 pytestmark = pytest.mark.asyncio
@@ -191,6 +201,80 @@ class TestCreateUser:
         )
         assert res.status_code == status_code
 
+    async def test_duplicated_email_is_rejected_by_the_constraint(
+        self, app: FastAPI, authorized_client: AsyncClient, test_role: RoleOut
+    ) -> None:
+        client = await authorized_client
+        role_in_db = await test_role
+        new_test = {
+            "fullname": "Usuario Duplicado",
+            "username": "duplicado",
+            "email": "duplicado@prueba.com",
+            "password": "psw_super_secreto",
+            "is_superadmin": False,
+            "role_id": str(role_in_db.id),
+        }
+        res = await client.post(
+            app.url_path_for("users:create-user"), json={"user": new_test}
+        )
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json().get("role") == role_in_db.role
+
+        new_test["username"] = "otro_duplicado"
+        res = await client.post(
+            app.url_path_for("users:create-user"), json={"user": new_test}
+        )
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert res.json().get("app_exception") == "UserEmailAlreadyExistsExeption"
+
+        new_test["email"] = "otro_duplicado@prueba.com"
+        new_test["role_id"] = str(uuid4())
+        res = await client.post(
+            app.url_path_for("users:create-user"), json={"user": new_test}
+        )
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_password_is_hashed_without_holding_a_connection(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_role: RoleOut,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        client = await authorized_client
+        role_in_db = await test_role
+        pool = pool_monitor.pool
+        in_use = []
+        hash_password = AuthService.create_salt_and_hashedpassword_async
+
+        async def hash_and_count(self, plaintext_password: str):
+            in_use.append(pool.get_size() - pool.get_idle_size())
+            return await hash_password(self, plaintext_password=plaintext_password)
+
+        monkeypatch.setattr(AuthService, "create_salt_and_hashedpassword_async", hash_and_count)
+        res = await client.post(
+            app.url_path_for("users:create-user"),
+            json={
+                "user": {
+                    "fullname": "Usuario Sin Conexion",
+                    "username": "sin_conexion",
+                    "email": "sin_conexion@prueba.com",
+                    "password": "psw_super_secreto",
+                    "is_superadmin": False,
+                    "role_id": str(role_in_db.id),
+                }
+            },
+        )
+        assert res.status_code == status.HTTP_201_CREATED
+
+        res = await client.put(
+            app.url_path_for("users:change-password-by-id", id=res.json()["id"]),
+            json={"psw_update": "otro_psw_secreto"},
+        )
+        assert res.status_code == status.HTTP_200_OK
+
+        assert in_use == [0, 0]
+
 
 class TestAuthTokens:
     async def test_can_create_access_token_successfully(
@@ -312,6 +396,76 @@ class TestAuthTokens:
             )
 
 
+    async def test_stateless_token_carries_authorization_claims(
+        self, app: FastAPI, client: AsyncClient, test_user: UserInDB, db: Database
+    ) -> None:
+        user_test = await test_user
+        user_in_db = await UserRepository(db).get_user_by_username(user_test.username)
+
+        token = AuthService().create_access_token_for_user(user=user_in_db, stateless=True)
+        creds = jwt.decode(
+            token, str(SECRET_KEY), audience=JWT_AUDIENCE, algorithms=[JWT_ALGORITHM]
+        )
+
+        assert creds["uid"] == str(user_in_db.id)
+        assert creds["rv"] == user_in_db.role_version
+        assert creds["perms"] == user_in_db.permissions
+        assert creds["sa"] == user_in_db.is_superadmin
+
+    async def test_stateless_token_is_revalidated_when_role_changes(
+        self, app: FastAPI, client: AsyncClient, test_user: UserInDB, db: Database
+    ) -> None:
+        user_test = await test_user
+        user_in_db = await UserRepository(db).get_user_by_username(user_test.username)
+        cache_principal(user_in_db)
+
+        token = AuthService().create_access_token_for_user(user=user_in_db, stateless=True)
+        payload = AuthService().get_payload_from_token(token=token, secret_key=str(SECRET_KEY))
+
+        user_from_claims = await AuthService().get_user_from_claims(payload, db)
+        assert user_from_claims.id == user_in_db.id
+        assert user_from_claims.permissions == user_in_db.permissions
+
+        set_role_version(user_in_db.role_id, user_in_db.role_version + 1)
+        assert await AuthService().get_user_from_claims(payload, db) is None
+
+    async def test_stateless_token_of_a_deactivated_user_is_not_accepted(
+        self, app: FastAPI, client: AsyncClient, test_user: UserInDB, db: Database
+    ) -> None:
+        user_test = await test_user
+        await UserService(db).create_user(
+            user=UserCreate(
+                fullname="Usuario Revocado",
+                username="usuario_revocado",
+                email="usuario_revocado@prueba.com",
+                password="psw_super_secreto",
+                role_id=user_test.role_id,
+            )
+        )
+        user_in_db = await UserRepository(db).get_user_by_username("usuario_revocado")
+        cache_principal(user_in_db)
+
+        token = AuthService().create_access_token_for_user(user=user_in_db, stateless=True)
+        payload = AuthService().get_payload_from_token(token=token, secret_key=str(SECRET_KEY))
+        assert await AuthService().get_user_from_claims(payload, db) is not None
+
+        await UserService(db).activate_user(
+            user_in_db.id, UserActivate(is_active=False), current_user=user_in_db
+        )
+        assert await AuthService().get_user_from_claims(payload, db) is None
+
+        # a worker that starts now, or whose caches were evicted, knows the
+        # role version but has no memory of the change
+        principal_cache.clear()
+        await user_token_cache.discard_all()
+        set_role_version(user_in_db.role_id, user_in_db.role_version)
+        assert await AuthService().get_user_from_claims(payload, db) is None
+
+        await UserService(db).delete_user(user_in_db.id)
+        await user_token_cache.discard_all()
+        assert await AuthService().get_user_from_claims(payload, db) is None
+
+
 class TestUserLogin:
     async def test_user_can_login_successfully_and_receives_valid_token(
         self, app: FastAPI, client: AsyncClient, new_user: UserInDB
@@ -390,6 +544,68 @@ class TestUserLogin:
         assert res.json().get("token_type") == "bearer"
 
 
+class TestPasswordHasher:
+    async def test_hashing_does_not_block_event_loop(self) -> None:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker_task = asyncio.create_task(ticker())
+        user_password = await AuthService().create_salt_and_hashedpassword_async(
+            plaintext_password="psw_super_secreto"
+        )
+        ticker_task.cancel()
+
+        assert ticks > 1
+        assert await AuthService().verify_password_async(
+            password="psw_super_secreto",
+            salt=user_password.salt,
+            hashed_pw=user_password.password,
+        )
+
+    async def test_concurrent_calls_drain_the_queue(self) -> None:
+        service = AuthService()
+        results = await asyncio.gather(
+            *[
+                service.create_salt_and_hashedpassword_async(plaintext_password=f"psw_{i}")
+                for i in range(password_hasher.max_concurrency + 2)
+            ]
+        )
+
+        assert len({result.salt for result in results}) == len(results)
+        stats = password_hasher.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["running"] == 0
+
+    async def test_cancelled_call_keeps_its_permit_until_the_thread_ends(self) -> None:
+        hasher = PasswordHasher(max_workers=2, max_concurrency=1)
+        release = threading.Event()
+
+        try:
+            task = asyncio.create_task(hasher.run(release.wait))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # the thread still runs, the next call must wait for it
+            waiting = asyncio.create_task(hasher.run(lambda: "hecho"))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+            assert hasher.stats()["running"] == 1
+
+            release.set()
+            assert await asyncio.wait_for(waiting, timeout=5) == "hecho"
+            assert hasher.stats()["running"] == 0
+        finally:
+            release.set()
+            hasher.shutdown()
+
+
 class TestGetUsers:
     async def test_get_users_list(
         self, app: FastAPI, authorized_client: AsyncClient
@@ -402,6 +618,69 @@ class TestGetUsers:
         result = res.json()
         assert len(result) > 0
 
+    async def test_get_users_list_pages_are_limited_in_db(
+        self, app: FastAPI, authorized_client: AsyncClient, otro_test_user: UserInDB
+    ) -> None:
+        client = await authorized_client
+        await otro_test_user
+        url = app.url_path_for("users:users_list")
+
+        res = await client.get(url, params={"page_number": 1, "page_size": 1})
+        assert res.status_code == status.HTTP_200_OK
+        first_page = res.json()
+        assert len(first_page["data"]) == 1
+        assert first_page["total"] >= 2
+        assert first_page["pages"] == first_page["total"]
+        assert first_page["pagination"]["next"] is not None
+
+        res = await client.get(url, params={"page_number": 2, "page_size": 1})
+        second_page = res.json()
+        assert second_page["total"] == first_page["total"]
+        assert second_page["data"][0]["id"] != first_page["data"][0]["id"]
+
+        res = await client.get(url, params={"page_number": 1000, "page_size": 1})
+        past_the_end = res.json()
+        assert past_the_end["data"] == []
+        assert past_the_end["total"] == first_page["total"]
+
+    async def test_pages_sorted_by_a_repeated_value_do_not_overlap(
+        self, app: FastAPI, authorized_client: AsyncClient, otro_test_user: UserInDB
+    ) -> None:
+        client = await authorized_client
+        await otro_test_user
+        url = app.url_path_for("users:users_list")
+
+        # every user has the same status, only the id tells them apart
+        res = await client.get(url, params={"order": "status", "page_size": 1})
+        total = res.json()["total"]
+        ids = []
+        for page_number in range(1, total + 1):
+            res = await client.get(url, params={"order": "status", "page_number": page_number, "page_size": 1})
+            ids += [user["id"] for user in res.json()["data"]]
+
+        assert len(ids) == total
+        assert len(set(ids)) == total
+
+    async def test_get_users_list_with_fields(
+        self, app: FastAPI, authorized_client: AsyncClient, otro_test_user: UserInDB
+    ) -> None:
+        client = await authorized_client
+        user_test = await otro_test_user
+        url = app.url_path_for("users:users_list")
+
+        res = await client.get(url, params={"fields": "username,role", "search": user_test.username})
+        assert res.status_code == status.HTTP_200_OK
+        data = res.json()["data"]
+        assert data[0] == {"id": str(user_test.id), "username": user_test.username, "role": user_test.role}
+
+        res = await client.get(
+            app.url_path_for("users:get-user-by-id", id=user_test.id), params={"fields": "email"}
+        )
+        assert res.json() == {"id": str(user_test.id), "email": user_test.email}
+
+        res = await client.get(url, params={"fields": "password"})
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
     # @pytest.mark.parametrize(
     #     "search,page_number, page_size, order, direction, status_code",
     #     (
@@ -475,6 +754,21 @@ class TestGetUsers:
         assert res.status_code == status_code
 
 
+class TestExportUsers:
+    async def test_export_users_has_no_credentials(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+
+        res = await client.get(app.url_path_for("users:export-users"), params={"format": "ndjson"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.headers["content-type"].startswith("application/x-ndjson")
+        users = [json.loads(line) for line in res.text.splitlines()]
+        assert users
+        assert all("password" not in user and "salt" not in user for user in users)
+
+
 class TestUsersAuth:
     async def test_authenticated_user_can_view_permissions(
         self,
@@ -491,6 +785,65 @@ class TestUsersAuth:
         result = [PermissionsOut(**item) for item in res.json()]
         assert result
 
+    async def test_authorization_is_a_mask_bit_test(
+        self, client: AsyncClient, db: Database, otro_test_user: UserInDB
+    ) -> None:
+        user_in_db = await otro_test_user
+        user = await UserRepository(db).get_user_by_id(id=user_in_db.id)
+
+        registry = get_permission_registry()
+        assert user.permissions_mask == registry.mask_for(user.permissions)
+        assert is_authorized(user.copy(update={"is_superadmin": False}), "roles:create-role")
+
+        user = user.copy(
+            update={"is_superadmin": False, "permissions_mask": registry.bits["orders:create-orders"]}
+        )
+        assert is_authorized(user, "orders:create-orders")
+        assert not is_authorized(user, "roles:create-role")
+
+    async def test_mask_of_another_catalog_is_not_used(
+        self, client: AsyncClient, db: Database, otro_test_user: UserInDB
+    ) -> None:
+        user_in_db = await otro_test_user
+        user = await UserRepository(db).get_user_by_id(id=user_in_db.id)
+        assert user.permissions_catalog == get_permission_registry().fingerprint
+
+        # written by a release whose routes got other bits
+        user = user.copy(
+            update={"is_superadmin": False, "permissions_mask": (1 << 63) - 1, "permissions_catalog": "otro"}
+        )
+        assert is_authorized(user, "roles:create-role")
+        assert not is_authorized(user, "orders:create-orders")
+
+
+class TestPrincipalCache:
+    async def test_repeated_requests_hit_principal_cache(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        client = await authorized_client
+
+        await client.get(app.url_path_for("users:users_list"))
+        hits = principal_cache.hits
+        res = await client.get(app.url_path_for("users:users_list"))
+
+        assert res.status_code == status.HTTP_200_OK
+        assert principal_cache.hits == hits + 1
+
+    async def test_update_user_evicts_cached_principal(
+        self, app: FastAPI, authorized_client: AsyncClient, otro_test_user: UserInDB
+    ) -> None:
+        client = await authorized_client
+        user_in_db = await otro_test_user
+        cache_principal(user_in_db)
+
+        res = await client.put(
+            app.url_path_for("users:activate-user-by-id", id=user_in_db.id),
+            json={"user_update": {"is_active": True}},
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert principal_cache.get(user_in_db.username) is None
+
 
 class TestUpdateUser:
     @pytest.mark.parametrize(